@@ -1,2 +1,9 @@
 from .dependencies import logger
-from .loader import bot
+from .loader import get_bot
+
+
+def __getattr__(name):
+    # `from bot import bot` создает бота лениво, при первом обращении
+    if name == "bot":
+        return get_bot()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,251 @@
+import asyncio
+import itertools
+import time
+
+from telebot.asyncio_handler_backends import BaseMiddleware, CancelUpdate
+from telebot.types import CallbackQuery
+
+from bot.dependencies import logger
+from bot.loader import get_bot
+from config.settings import settings
+from messages import messages
+
+# атрибут апдейта с решением о допуске, принятым до middleware (см. ShardedTeleBot):
+# класс апдейта - слот занят, None - апдейт отклонен
+ADMITTED_ATTR = "_admission_class"
+
+# классы апдейтов в порядке приоритета: запись бронирований, просмотр, админка
+WRITE, BROWSE, ADMIN = "write", "browse", "admin"
+PRIORITIES = {WRITE: 0, BROWSE: 1, ADMIN: 2}
+
+WRITE_CALLBACK_PREFIXES = (
+    "book_date_seat: ",
+    "book_wo_seat: ",
+    "guest_date_seat: ",
+    "booking_id_delete:",
+    "cnfm_reg:",
+    "watch_date: ",
+    "lottery_join: ",
+    "lottery_leave: ",
+)
+ADMIN_CALLBACK_PREFIXES = (
+    "admin_options",
+    "users_w_tg_id_page:",
+    "untie_warn: ",
+    "untie_make: ",
+    "delete_user_page: ",
+    "delete_warn: ",
+    "delete_make: ",
+    "add_user",
+    "import_users",
+    "export_users",
+    "see_all_bookings",
+    "lottery_admin",
+    "lottery_toggle: ",
+    "jobs_admin",
+)
+
+
+def classify(update) -> str:
+    """Класс апдейта для допуска к обработке."""
+    if isinstance(update, CallbackQuery):
+        data = update.data or ""
+        if data.startswith(WRITE_CALLBACK_PREFIXES):
+            return WRITE
+        if data.startswith(ADMIN_CALLBACK_PREFIXES):
+            return ADMIN
+        return BROWSE
+
+    # сообщения: ответы на запросы ФИО гостя создают бронирование,
+    # ответы на запросы админки (ФИО сотрудника, файл со списком) - админские
+    reply_text = (
+        update.reply_to_message.text or update.reply_to_message.caption or ""
+        if update.reply_to_message
+        else ""
+    )
+    if reply_text.startswith("Введите ФИО гостя"):
+        return WRITE
+    if update.content_type == "document" or reply_text.startswith(
+        ("Введите ФИО нового сотрудника", "Отправьте файл со списком сотрудников")
+    ):
+        return ADMIN
+    return BROWSE
+
+
+class Admission:
+    """
+    Допуск апдейтов к обработке: одновременно выполняется не больше
+    settings.ADMISSION_SLOTS обработчиков (каждый держит соединения пула БД),
+    и не больше лимита своего класса (settings.ADMISSION_CLASS_SLOTS).
+    Остальные ждут в очереди, освободившийся слот получает ожидающий с самым
+    высоким приоритетом (запись раньше просмотра, просмотр раньше админки).
+    Кто прождал дольше лимита класса (settings.ADMISSION_QUEUE_SECONDS),
+    получает быстрый ответ "попробуйте еще раз" вместо долгого ожидания.
+    ShardedTeleBot не ждет слот в обработчике, а сам занимает его
+    (try_acquire) при выборе апдейта из очередей чатов: обработчики не
+    простаивают на лимите класса, пока ждущей записи есть свободный слот.
+    """
+
+    _total = 0
+    _in_flight = {name: 0 for name in PRIORITIES}
+    # [приоритет, порядковый номер, класс, future]
+    _waiters: list[list] = []
+    _seq = itertools.count()
+
+    _admitted = {name: 0 for name in PRIORITIES}
+    _queued = {name: 0 for name in PRIORITIES}
+    _shed = {name: 0 for name in PRIORITIES}
+    _max_wait_ms = {name: 0.0 for name in PRIORITIES}
+
+    @classmethod
+    def _can_admit(cls, name: str) -> bool:
+        return cls._total < settings.ADMISSION_SLOTS and cls._in_flight[
+            name
+        ] < settings.ADMISSION_CLASS_SLOTS.get(name, settings.ADMISSION_SLOTS)
+
+    @classmethod
+    def _take(cls, name: str) -> None:
+        cls._total += 1
+        cls._in_flight[name] += 1
+        cls._admitted[name] += 1
+
+    @classmethod
+    def _wake(cls) -> None:
+        """Отдать свободные слоты ожидающим по приоритету, а внутри класса - по очереди."""
+        cls._waiters.sort(key=lambda waiter: waiter[:2])
+        for waiter in list(cls._waiters):
+            future = waiter[3]
+            if future.done():
+                cls._waiters.remove(waiter)
+            elif cls._can_admit(waiter[2]):
+                cls._take(waiter[2])
+                future.set_result(True)
+                cls._waiters.remove(waiter)
+            if cls._total >= settings.ADMISSION_SLOTS:
+                break
+
+    @classmethod
+    def _record_wait(cls, name: str, started: float) -> None:
+        waited_ms = (time.perf_counter() - started) * 1000
+        cls._max_wait_ms[name] = max(cls._max_wait_ms[name], round(waited_ms, 1))
+
+    @classmethod
+    def wait_left(cls, name: str, arrived_at: float) -> float:
+        """Сколько секунд апдейт класса name, пришедший в arrived_at, еще может ждать слот."""
+        return settings.ADMISSION_QUEUE_SECONDS.get(name, 5) - (
+            time.perf_counter() - arrived_at
+        )
+
+    @classmethod
+    def try_acquire(cls, name: str, arrived_at: float) -> bool:
+        """
+        Занять слот класса name без ожидания (False - слота нет) для апдейта,
+        пришедшего в arrived_at (time.perf_counter). Слот освобождается release.
+        """
+        if not cls._can_admit(name):
+            return False
+        cls._take(name)
+        cls._record_wait(name, arrived_at)
+        return True
+
+    @classmethod
+    def shed(cls, name: str) -> None:
+        """Апдейт отклонен без слота: прождал дольше лимита класса."""
+        cls._shed[name] += 1
+
+    @classmethod
+    async def acquire(cls, name: str) -> bool:
+        """
+        Занять слот класса name. False - слот не освободился за время ожидания
+        (запрос нужно отклонить). Ожидающие, которым можно было отдать слот,
+        уже получили его в _wake, поэтому свободный слот можно сразу занять.
+        """
+        if cls._can_admit(name):
+            cls._take(name)
+            return True
+
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        cls._waiters.append([PRIORITIES[name], next(cls._seq), name, future])
+        cls._queued[name] += 1
+        await asyncio.wait(
+            {future}, timeout=settings.ADMISSION_QUEUE_SECONDS.get(name, 5)
+        )
+        cls._record_wait(name, started)
+
+        if future.done():
+            return True
+        # ожидание истекло: слот этому запросу уже не отдается (см. _wake)
+        future.cancel()
+        cls.shed(name)
+        return False
+
+    @classmethod
+    def release(cls, name: str) -> None:
+        cls._total -= 1
+        cls._in_flight[name] -= 1
+        cls._wake()
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики допуска для отчета о готовности."""
+        return {
+            "slots": settings.ADMISSION_SLOTS,
+            "in_flight": cls._total,
+            "classes": {
+                name: {
+                    "in_flight": cls._in_flight[name],
+                    "waiting": sum(
+                        1
+                        for waiter in cls._waiters
+                        if waiter[2] == name and not waiter[3].done()
+                    ),
+                    "admitted": cls._admitted[name],
+                    "queued": cls._queued[name],
+                    "shed": cls._shed[name],
+                    "max_wait_ms": cls._max_wait_ms[name],
+                }
+                for name in PRIORITIES
+            },
+        }
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    """
+    Middleware допуска (см. Admission). Должна подключаться последней из
+    middleware, которые могут отменить апдейт: после отмены post_process
+    не вызывается, и занятый слот не освободился бы.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.update_types = ["message", "callback_query"]
+
+    async def pre_process(self, update, data):
+        if hasattr(update, ADMITTED_ATTR):
+            # допуск решен при выборе из очереди чата, слот держит ShardedTeleBot
+            if getattr(update, ADMITTED_ATTR) is not None:
+                return None
+            name = classify(update)
+        else:
+            name = classify(update)
+            if await Admission.acquire(name):
+                data["admission_class"] = name
+                return None
+
+        logger.info(f"Admission: {name} update shed after queue timeout")
+        try:
+            if isinstance(update, CallbackQuery):
+                await get_bot().answer_callback_query(
+                    update.id, text=messages.overloaded_text
+                )
+            else:
+                await get_bot().send_message(update.chat.id, messages.overloaded_text)
+        except Exception:
+            pass
+        return CancelUpdate()
+
+    async def post_process(self, update, data, exception):
+        name = data.get("admission_class")
+        if name is not None:
+            Admission.release(name)
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from telebot.asyncio_helper import ApiTelegramException
+from telebot.types import InlineKeyboardMarkup
+
+from bot.dependencies import logger
+from bot.health import register_queue
+from bot.loader import get_bot
+from config.settings import settings
+
+# сколько раз повторять отправку после 429 Too Many Requests
+MAX_RETRIES = 3
+
+
+class Broadcaster:
+    """
+    Рассылка сообщений многим пользователям (утренняя сводка и т.п.) через одну
+    очередь: сообщения отправляются по одному не чаще settings.BROADCAST_RATE
+    в секунду (0 - без паузы между сообщениями), чтобы рассылка не упиралась в лимиты Bot API и не отнимала
+    их у ответов на нажатия кнопок. При 429 отправка ждет retry_after и
+    повторяется, при 403 (бот заблокирован) вызывается on_forbidden
+    отправителя (например, отмена подписки).
+    """
+
+    _queue: asyncio.Queue | None = None
+    _worker: asyncio.Task | None = None
+
+    _sent = 0
+    _retried = 0
+    _failed = 0
+
+    @classmethod
+    def enqueue(
+        cls,
+        chat_id: int,
+        text: str,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        on_forbidden: Callable[[], Awaitable] | None = None,
+    ) -> None:
+        """Поставить сообщение в очередь рассылки (обработчик запускается при первом вызове)."""
+        if cls._queue is None:
+            cls._queue = asyncio.Queue()
+        cls._queue.put_nowait((chat_id, text, reply_markup, on_forbidden, 0))
+        if cls._worker is None or cls._worker.done():
+            cls._worker = asyncio.create_task(cls._run())
+
+    @classmethod
+    async def _send(cls, item: tuple) -> None:
+        chat_id, text, reply_markup, on_forbidden, attempt = item
+        try:
+            await get_bot().send_message(chat_id, text, reply_markup=reply_markup)
+            cls._sent += 1
+        except ApiTelegramException as e:
+            if e.error_code == 429 and attempt < MAX_RETRIES:
+                retry_after = e.result_json.get("parameters", {}).get("retry_after", 1)
+                cls._retried += 1
+                # пауза задерживает всю очередь: лимит общий для бота
+                await asyncio.sleep(retry_after)
+                cls._queue.put_nowait(
+                    (chat_id, text, reply_markup, on_forbidden, attempt + 1)
+                )
+                return
+            cls._failed += 1
+            if e.error_code == 403 and on_forbidden is not None:
+                await on_forbidden()
+            else:
+                logger.error(f"Broadcast to {chat_id} failed: {e.description}")
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            item = await cls._queue.get()
+            try:
+                await cls._send(item)
+            except Exception:
+                cls._failed += 1
+                logger.error("Broadcast item failed", exc_info=True)
+            finally:
+                cls._queue.task_done()
+            if settings.BROADCAST_RATE > 0:
+                await asyncio.sleep(1 / settings.BROADCAST_RATE)
+
+    @classmethod
+    def depth(cls) -> int:
+        """Сообщений в очереди рассылки."""
+        return cls._queue.qsize() if cls._queue is not None else 0
+
+    @classmethod
+    async def join(cls) -> None:
+        """Дождаться отправки всех сообщений из очереди."""
+        if cls._queue is not None:
+            await cls._queue.join()
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики рассылки."""
+        return {
+            "depth": cls.depth(),
+            "sent": cls._sent,
+            "retried": cls._retried,
+            "failed": cls._failed,
+        }
+
+
+register_queue("broadcast", Broadcaster.depth)
@@ -0,0 +1,53 @@
+import datetime
+import functools
+
+import keyboards
+import messages
+import utils
+from bot.broadcast import Broadcaster
+from services import BookingService, CalendarService, DigestService
+
+
+def _render_digest_text(book_date_obj: datetime.date, visitors: list[dict]) -> str:
+    """Текст утренней сводки: кто придет в офис в дату."""
+    digest_text = messages.digest_header_text.format(
+        book_date=utils.format_booking_date(book_date_obj)
+    )
+    for visitor in visitors:
+        seat_number = visitor["seat_number"] if visitor["seat_number"] else "XX"
+        booking_type = utils.get_booking_type_name(visitor["type"])
+        digest_text += messages.see_colleagues_bookings_on_date_text_item.format(
+            full_name=visitor["full_name"],
+            seat_number=seat_number,
+            booking_type=booking_type,
+        )
+    return digest_text
+
+
+async def send_digest(send_hour: int) -> int:
+    """
+    Разослать сводку на сегодня подписчикам часа send_hour, вернуть число адресатов.
+    Текст отрисовывается один раз на дату (список посетителей - один запрос
+    с JOIN, текст хранится в VisitorsCache), отправка идет через очередь
+    Broadcaster; заблокировавшие бота подписчики отписываются.
+    """
+    subscribers = await DigestService.get_subscribers(send_hour)
+    if not subscribers:
+        return 0
+
+    today = CalendarService.today()
+    # в дни, когда в офисе никого не будет (выходные, праздники), сводка не нужна
+    if not await BookingService.get_visitors_by_date(today):
+        return 0
+    digest_text = await BookingService.get_visitors_text(today, _render_digest_text)
+
+    for subscriber in subscribers:
+        Broadcaster.enqueue(
+            subscriber["chat_id"],
+            digest_text,
+            reply_markup=keyboards.digest_markup,
+            on_forbidden=functools.partial(
+                DigestService.unsubscribe_user, subscriber["user_id"]
+            ),
+        )
+    return len(subscribers)
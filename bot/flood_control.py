@@ -0,0 +1,124 @@
+import time
+from array import array
+
+from telebot.asyncio_handler_backends import BaseMiddleware, CancelUpdate
+from telebot.types import CallbackQuery
+
+from bot.loader import get_bot
+from config.settings import settings
+
+# как часто (секунды) освобождать корзины неактивных пользователей
+SWEEP_INTERVAL_SECONDS = 60
+
+
+class FloodControl:
+    """
+    Ограничение частоты апдейтов от одного пользователя (token bucket по tg_id):
+    корзина вмещает settings.FLOOD_BURST токенов и пополняется со скоростью
+    settings.FLOOD_RATE токенов в секунду, каждый апдейт тратит токен.
+    Корзины хранятся в массивах (array) по слотам, tg_id -> номер слота,
+    пополнение считается лениво при обращении. Корзина, не использовавшаяся
+    дольше времени полного пополнения, ничем не отличается от новой, поэтому
+    ее слот освобождается при периодической очистке: память ограничена
+    числом пользователей, активных за последние минуты, а не всеми,
+    кто когда-либо писал боту.
+    """
+
+    # tg_id -> номер слота
+    _slots: dict[int, int] = {}
+    _tokens = array("d")
+    _updated_at = array("d")
+    _free: list[int] = []
+    _swept_at = time.monotonic()
+
+    _allowed = 0
+    _throttled = 0
+    _evicted = 0
+
+    @classmethod
+    def _sweep(cls, now: float) -> None:
+        """Освободить слоты корзин, которые успели пополниться полностью."""
+        # FLOOD_RATE > 0: при 0 ограничение выключено и middleware не подключается
+        refill_seconds = settings.FLOOD_BURST / settings.FLOOD_RATE
+        for tg_id, slot in list(cls._slots.items()):
+            if now - cls._updated_at[slot] >= refill_seconds:
+                del cls._slots[tg_id]
+                cls._free.append(slot)
+                cls._evicted += 1
+        cls._swept_at = now
+
+    @classmethod
+    def _new_slot(cls, tg_id: int) -> int:
+        if cls._free:
+            slot = cls._free.pop()
+        else:
+            slot = len(cls._tokens)
+            cls._tokens.append(0.0)
+            cls._updated_at.append(0.0)
+        cls._slots[tg_id] = slot
+        cls._tokens[slot] = settings.FLOOD_BURST
+        return slot
+
+    @classmethod
+    def allow(cls, tg_id: int) -> bool:
+        """Списать токен пользователя; False - лимит исчерпан, апдейт не обрабатывается."""
+        now = time.monotonic()
+        if now - cls._swept_at >= SWEEP_INTERVAL_SECONDS:
+            cls._sweep(now)
+
+        slot = cls._slots.get(tg_id)
+        if slot is None:
+            slot = cls._new_slot(tg_id)
+            tokens = cls._tokens[slot]
+        else:
+            tokens = min(
+                settings.FLOOD_BURST,
+                cls._tokens[slot] + (now - cls._updated_at[slot]) * settings.FLOOD_RATE,
+            )
+        cls._updated_at[slot] = now
+
+        if tokens < 1:
+            cls._tokens[slot] = tokens
+            cls._throttled += 1
+            return False
+
+        cls._tokens[slot] = tokens - 1
+        cls._allowed += 1
+        return True
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики ограничения частоты для отчета о готовности."""
+        return {
+            "users": len(cls._slots),
+            "slots": len(cls._tokens),
+            "allowed": cls._allowed,
+            "throttled": cls._throttled,
+            "evicted": cls._evicted,
+        }
+
+
+class FloodControlMiddleware(BaseMiddleware):
+    """
+    Middleware ограничения частоты (см. FloodControl): лишние нажатия кнопок
+    молча подтверждаются (у пользователя пропадают "часики") и не обрабатываются,
+    лишние сообщения отбрасываются.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.update_types = ["message", "callback_query"]
+
+    async def pre_process(self, update, data):
+        if update.from_user is None or FloodControl.allow(update.from_user.id):
+            return None
+
+        if isinstance(update, CallbackQuery):
+            try:
+                await get_bot().answer_callback_query(update.id)
+            except Exception:
+                pass
+        return CancelUpdate()
+
+    async def post_process(self, update, data, exception):
+        pass
@@ -0,0 +1,145 @@
+import asyncio
+import time
+
+from aiohttp import web
+from sqlalchemy import text
+
+from bot.admission import Admission
+from bot.flood_control import FloodControl
+from bot.http_session import session_stats
+from bot.loader import get_bot
+from bot.update_shards import ShardedTeleBot
+from config.settings import settings
+from db.database import get_engine
+from scripts.preload_images import preloaded_images
+from services.lottery_service import LotteryService
+from services.occupancy_map import OccupancyMap
+from services.scheduler import Scheduler
+from services.seat_allocation_service import SeatAllocationService
+from services.seat_watch_service import SeatWatchService
+from services.visitors_cache import VisitorsCache
+from utils.concurrency import SingleFlight
+from utils.screen_tracker import ScreenTracker
+
+# время (time.monotonic) последнего обработанного апдейта
+_last_update_at: float | None = None
+_started_at = time.monotonic()
+
+# функции без аргументов, возвращающие глубину очередей исходящих сообщений
+_queue_probes = {}
+
+_cached_report: dict | None = None
+_cached_at = 0.0
+_collect_lock = asyncio.Lock()
+
+
+def mark_update_processed() -> None:
+    """Отметить, что апдейт обработан (для метрики update lag)."""
+    global _last_update_at
+    _last_update_at = time.monotonic()
+
+
+def register_queue(name: str, depth_probe) -> None:
+    """Зарегистрировать очередь исходящих сообщений для отчета о готовности."""
+    _queue_probes[name] = depth_probe
+
+
+async def _probe_db() -> dict:
+    """Проверка пула БД: round-trip простого запроса."""
+    started = time.perf_counter()
+    try:
+        async with get_engine().connect() as conn:
+            await asyncio.wait_for(conn.execute(text("SELECT 1")), timeout=2)
+        return {"ok": True, "rtt_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        return {"ok": False, "error": type(e).__name__}
+
+
+async def _probe_bot_api() -> dict:
+    """Проверка доступности Bot API: round-trip getMe."""
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(get_bot().get_me(), timeout=3)
+        return {"ok": True, "rtt_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        return {"ok": False, "error": type(e).__name__}
+
+
+async def collect_report() -> dict:
+    """
+    Собрать отчет о готовности. Результат кэшируется на settings.HEALTH_CACHE_SECONDS,
+    поэтому частые пробы docker не создают нагрузку на БД и Bot API.
+    """
+    global _cached_report, _cached_at
+
+    async with _collect_lock:
+        if (
+            _cached_report is not None
+            and time.monotonic() - _cached_at < settings.HEALTH_CACHE_SECONDS
+        ):
+            return _cached_report
+
+        db, bot_api = await asyncio.gather(_probe_db(), _probe_bot_api())
+        now = time.monotonic()
+        report = {
+            "ready": db["ok"] and bot_api["ok"],
+            "uptime_s": round(now - _started_at),
+            "db": db,
+            "bot_api": bot_api,
+            "bot_api_pool": session_stats(),
+            "media_loaded": "office_map" in preloaded_images,
+            "update_lag_s": (
+                round(now - _last_update_at, 1) if _last_update_at is not None else None
+            ),
+            "visitors_cache": VisitorsCache.stats(),
+            "occupancy_map": OccupancyMap.stats(),
+            "screens": ScreenTracker.stats(),
+            "admission": Admission.stats(),
+            "flood_control": FloodControl.stats(),
+            "update_shards": (
+                get_bot().shard_stats()
+                if isinstance(get_bot(), ShardedTeleBot)
+                else None
+            ),
+            "single_flight": SingleFlight.stats(),
+            "seat_watches": SeatWatchService.stats(),
+            "seat_allocation": SeatAllocationService.stats(),
+            "lottery": LotteryService.stats(),
+            "scheduler": Scheduler.stats(),
+            "outbound_queues": {
+                name: depth_probe() for name, depth_probe in _queue_probes.items()
+            },
+        }
+        _cached_report, _cached_at = report, now
+        return report
+
+
+async def _handle_live(request: web.Request) -> web.Response:
+    return web.json_response({"alive": True})
+
+
+async def _handle_ready(request: web.Request) -> web.Response:
+    report = await collect_report()
+    return web.json_response(report, status=200 if report["ready"] else 503)
+
+
+async def start_health_server() -> web.AppRunner | None:
+    """
+    Запустить локальный HTTP-эндпоинт: /health - процесс жив, /ready - отчет о готовности.
+    При HEALTH_PORT=0 эндпоинт не запускается.
+    """
+    if not settings.HEALTH_PORT:
+        return None
+
+    app = web.Application()
+    app.router.add_get("/health", _handle_live)
+    app.router.add_get("/ready", _handle_ready)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, settings.HEALTH_HOST, settings.HEALTH_PORT).start()
+    print(
+        f"Health endpoint: http://{settings.HEALTH_HOST}:{settings.HEALTH_PORT}/ready",
+        flush=True,
+    )
+    return runner
@@ -0,0 +1,146 @@
+import aiohttp
+from telebot import asyncio_helper
+
+from config.settings import settings
+
+# методы Bot API по профилям времени ожидания (settings.BOT_API_TIMEOUTS),
+# остальные методы (кроме getUpdates со своим таймаутом) - профиль default
+TIMEOUT_PROFILE_METHODS = {
+    "fast": {"deleteMessage", "answerCallbackQuery", "editMessageReplyMarkup"},
+    "upload": {"sendPhoto", "sendDocument", "editMessageMedia"},
+}
+# сколько секунд DNS-ответ для api.telegram.org хранится в кэше соединителя
+DNS_CACHE_SECONDS = 300
+# сколько секунд держать простаивающее соединение открытым для повторного использования
+KEEPALIVE_SECONDS = 30
+
+
+class BotSessionManager(asyncio_helper.SessionManager):
+    """
+    Общая HTTP-сессия всех запросов к Bot API (бот, рассылки, скрипты):
+    пул keep-alive соединений размером settings.BOT_API_POOL_SIZE, кэш DNS
+    и счетчики соединений через trace-хуки aiohttp, чтобы повторное
+    использование соединений было видно в /ready.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests = 0
+        self.in_flight = 0
+        self.failed = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context, params):
+            self.requests += 1
+            self.in_flight += 1
+
+        async def on_request_end(session, context, params):
+            self.in_flight -= 1
+
+        async def on_request_exception(session, context, params):
+            self.in_flight -= 1
+            self.failed += 1
+
+        async def on_connection_create_end(session, context, params):
+            self.connections_created += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, context, params):
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, context, params):
+            self.dns_cache_misses += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    async def create_session(self) -> aiohttp.ClientSession:
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=settings.BOT_API_POOL_SIZE,
+                ttl_dns_cache=DNS_CACHE_SECONDS,
+                keepalive_timeout=KEEPALIVE_SECONDS,
+                ssl=self.ssl_context,
+            ),
+            trace_configs=[self._trace_config()],
+        )
+        return self.session
+
+    def stats(self) -> dict:
+        """Метрики пула соединений для отчета о готовности."""
+        opened = self.connections_created + self.connections_reused
+        return {
+            "pool_size": settings.BOT_API_POOL_SIZE,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "failed": self.failed,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_ratio": (
+                round(self.connections_reused / opened, 3) if opened else None
+            ),
+            "dns_cache_hits": self.dns_cache_hits,
+            "dns_cache_misses": self.dns_cache_misses,
+        }
+
+
+def timeout_for(api_method: str) -> float:
+    """Время ожидания ответа на вызов метода Bot API по его профилю."""
+    for profile, api_methods in TIMEOUT_PROFILE_METHODS.items():
+        if api_method in api_methods:
+            return settings.BOT_API_TIMEOUTS[profile]
+    return settings.BOT_API_TIMEOUTS["default"]
+
+
+def install_session_manager() -> BotSessionManager:
+    """
+    Подключает общую сессию к telebot (все экземпляры AsyncTeleBot берут сессию
+    из asyncio_helper.session_manager) и профили времени ожидания: вызовы без
+    явного timeout получают время ожидания своего метода вместо общих 300 секунд.
+    Повторный вызов возвращает уже подключенную сессию.
+    """
+    if isinstance(asyncio_helper.session_manager, BotSessionManager):
+        return asyncio_helper.session_manager
+
+    process_request = asyncio_helper._process_request
+
+    async def _process_request_with_profile(
+        token, url, method="get", params=None, files=None, **kwargs
+    ):
+        # getUpdates передает request_timeout сам, явный timeout вызова сохраняется
+        if "request_timeout" not in kwargs and not (params and params.get("timeout")):
+            kwargs["request_timeout"] = timeout_for(url)
+        return await process_request(token, url, method, params, files, **kwargs)
+
+    asyncio_helper._process_request = _process_request_with_profile
+    asyncio_helper.session_manager = BotSessionManager()
+    return asyncio_helper.session_manager
+
+
+async def close_session() -> None:
+    """Закрыть общую сессию Bot API, если она открыта (завершение скриптов)."""
+    session = asyncio_helper.session_manager.session
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def session_stats() -> dict | None:
+    """Метрики общей сессии Bot API (None - сессия не подключена)."""
+    session_manager = asyncio_helper.session_manager
+    if isinstance(session_manager, BotSessionManager):
+        return session_manager.stats()
+    return None
@@ -0,0 +1,40 @@
+import datetime
+
+from bot.digest import send_digest
+from bot.scripts.clean_up_bookings import clean_up_bookings
+from bot.scripts.send_error_digest import send_error_digest
+from config.settings import settings
+from services import LotteryService, Scheduler
+
+
+async def _send_morning_digest(scheduled_for: datetime.datetime) -> str:
+    sent = await send_digest(scheduled_for.hour)
+    return f"Сводка поставлена в очередь для {sent} подписчиков"
+
+
+async def _draw_lotteries(scheduled_for: datetime.datetime) -> str:
+    drawn = await LotteryService.draw_due()
+    return f"Проведено жеребьевок: {drawn}"
+
+
+async def _refresh_lotteries(scheduled_for: datetime.datetime) -> None:
+    # жеребьевку могла объявить или провести другая реплика
+    await LotteryService.load()
+
+
+def register_jobs() -> None:
+    """
+    Регистрирует фоновые задачи в планировщике (расписания по московскому
+    времени, см. Scheduler).
+    """
+    Scheduler.add_job("clean_up_bookings", "0 3 * * *", clean_up_bookings, 300)
+    Scheduler.add_job("send_error_digest", "0 6 * * *", send_error_digest, 60)
+    Scheduler.add_job(
+        "morning_digest",
+        f"0 {','.join(map(str, settings.DIGEST_SEND_HOURS))} * * *",
+        _send_morning_digest,
+    )
+    Scheduler.add_job("lottery_draw", "*/5 * * * *", _draw_lotteries, 30)
+    Scheduler.add_job(
+        "lottery_refresh", "*/5 * * * *", _refresh_lotteries, 30, exclusive=False
+    )
@@ -1,9 +1,38 @@
-from telebot.async_telebot import AsyncTeleBot
-from telebot.asyncio_storage import StateMemoryStorage
+from functools import lru_cache
 
 from config.settings import settings
 
-# Используем StateMemoryStorage, в будущем можно перейти на Redis
-storage = StateMemoryStorage()
 
-bot = AsyncTeleBot(settings.BOT_TOKEN, state_storage=storage, parse_mode="HTML")
+@lru_cache(maxsize=1)
+def get_bot():
+    """
+    Фабрика бота: AsyncTeleBot (и сам telebot) создается при первом обращении,
+    поэтому скрипты обслуживания, которым бот не нужен, его не импортируют.
+    Запросы идут через общую HTTP-сессию Bot API (см. bot.http_session).
+    """
+    from telebot.async_telebot import AsyncTeleBot
+    from telebot.asyncio_storage import StateMemoryStorage
+
+    from bot.http_session import install_session_manager
+
+    # все экземпляры бота и скрипты ходят в Bot API через одну настроенную сессию
+    install_session_manager()
+
+    # Используем StateMemoryStorage, в будущем можно перейти на Redis
+    storage = StateMemoryStorage()
+
+    # апдейты одного чата - по очереди, разных чатов - параллельно (см. ShardedTeleBot)
+    bot_class = AsyncTeleBot
+    if settings.UPDATE_WORKERS:
+        from bot.update_shards import ShardedTeleBot
+
+        bot_class = ShardedTeleBot
+
+    return bot_class(settings.BOT_TOKEN, state_storage=storage, parse_mode="HTML")
+
+
+def __getattr__(name):
+    # `from bot.loader import bot` создает бота лениво
+    if name == "bot":
+        return get_bot()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
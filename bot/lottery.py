@@ -0,0 +1,36 @@
+import datetime
+
+import keyboards
+import messages
+import utils
+from bot.broadcast import Broadcaster
+
+
+async def notify_lottery_results(
+    booking_date: datetime.date, winners: list[dict], losers: list[dict]
+) -> None:
+    """
+    Уведомить участников о результатах жеребьевки мест на дату
+    (см. LotteryService): уведомления ставятся в очередь рассылки одной пачкой.
+    """
+    book_date = utils.format_booking_date(booking_date)
+    for request in winners:
+        Broadcaster.enqueue(
+            request["chat_id"],
+            messages.lottery_won_text.format(
+                book_date=book_date, seat=request["seat_number"]
+            ),
+            reply_markup=keyboards.lottery_result_markup,
+        )
+    for request in losers:
+        if request["position"] is None:
+            text = messages.lottery_lost_unqueued_text.format(book_date=book_date)
+        else:
+            text = messages.lottery_lost_text.format(
+                book_date=book_date, position=request["position"]
+            )
+        Broadcaster.enqueue(
+            request["chat_id"],
+            text,
+            reply_markup=keyboards.lottery_result_markup,
+        )
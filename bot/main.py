@@ -1,15 +1,90 @@
 import asyncio
 
-import handlers
 from bot.dependencies import logger
-from bot.loader import bot
-from scripts.preload_images import preload_images
+from bot.loader import get_bot
+from config.settings import settings
+
+# ссылки на фоновые задачи процесса, чтобы их не собрал GC
+_background_tasks: set = set()
+
+
+def _on_background_task_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(
+            f"Background task {task.get_name()} failed", exc_info=task.exception()
+        )
+
+
+def spawn_background(coroutine, name: str) -> asyncio.Task:
+    """Запустить фоновую задачу процесса; ее сбой пишется в лог."""
+    task = asyncio.create_task(coroutine, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_background_task_done)
+    return task
+
+
+def register_handlers() -> None:
+    """Регистрирует хэндлеры бота (импорт модулей хэндлеров вешает их на бота)."""
+    import handlers
+
+
+def register_middlewares() -> None:
+    """
+    Подключает middleware бота: ограничение частоты апдейтов от пользователя,
+    затем допуск к обработке по приоритету (лишние апдейты не занимают очередь).
+    """
+    from bot.admission import AdmissionMiddleware
+    from bot.flood_control import FloodControlMiddleware
+
+    if settings.FLOOD_BURST and settings.FLOOD_RATE:
+        get_bot().setup_middleware(FloodControlMiddleware())
+    if settings.ADMISSION_SLOTS:
+        get_bot().setup_middleware(AdmissionMiddleware())
 
 
 async def main():
-    await preload_images()
+    # сервисы, БД и health-сервер импортируются при запуске, а не при импорте модуля
+    from bot.health import start_health_server
+    from bot.jobs import register_jobs
+    from bot.lottery import notify_lottery_results
+    from bot.seat_allocation import notify_seat_allocation
+    from bot.seat_watch import notify_seat_freed
+    from scripts.preload_images import preload_images
+    from services import (
+        CalendarService,
+        LotteryService,
+        Scheduler,
+        SeatAllocationService,
+        SeatRegistry,
+        SeatWatchService,
+    )
+
+    print(settings.describe(), flush=True)
+    register_handlers()
+    register_middlewares()
+    await SeatRegistry.load()
+    # освободившиеся места предлагаются ожидающим уведомлением в чат
+    SeatWatchService.set_notifier(notify_seat_freed)
+    # результаты распределения мест по предпочтениям при смене суток
+    SeatAllocationService.set_notifier(notify_seat_allocation)
+    # жеребьевки мест: непроведенные загружаются, результаты рассылаются участникам
+    await LotteryService.load()
+    LotteryService.set_notifier(notify_lottery_results)
+    # карта офиса догружается в фоне: до ее загрузки фото отправляется файлом
+    spawn_background(preload_images(), "preload_images")
+    # смена окна планирования в полночь по Москве
+    spawn_background(CalendarService.run_rollover_loop(), "calendar_rollover")
+    # очистка, сводки и жеребьевки по расписанию внутри процесса (вместо cron)
+    register_jobs()
+    Scheduler.start()
+    health_runner = await start_health_server()
     print("Бот запущен...", flush=True)
-    await bot.infinity_polling()
+    try:
+        await get_bot().infinity_polling()
+    finally:
+        if health_runner is not None:
+            await health_runner.cleanup()
 
 
 if __name__ == "__main__":
@@ -1,18 +1,27 @@
 import asyncio
+import datetime
 
 from bot.dependencies import logger
 from services.booking_service import BookingService
+from services.scheduler import Scheduler
 
+# сколько дней хранятся бронирования и история запусков фоновых задач
+RETENTION_DAYS = 90
 
-async def main():
-    deleted, cutoff_date = await BookingService.cleanup_old_bookings(days=90)
-    logger.info(
-        f"Система удалила {str(deleted)} бронирований с датой раньше чем {str(cutoff_date)}"
-    )
-    print(
-        f"Система удалила {str(deleted)} бронирований с датой раньше чем {str(cutoff_date)}",
-        flush=True,
+
+async def clean_up_bookings(scheduled_for: datetime.datetime | None = None) -> str:
+    """Задача планировщика: удалить старые бронирования и историю запусков задач."""
+    deleted, cutoff_date = await BookingService.cleanup_old_bookings(
+        days=RETENTION_DAYS
     )
+    await Scheduler.purge_history(RETENTION_DAYS)
+    result = f"Система удалила {str(deleted)} бронирований с датой раньше чем {str(cutoff_date)}"
+    logger.info(result)
+    return result
+
+
+async def main():
+    print(await clean_up_bookings(), flush=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,50 @@
+import asyncio
+import datetime
+
+from bot.dependencies import logger
+from bot.http_session import close_session
+from bot.loader import get_bot
+from config.settings import settings
+from messages import messages
+from services.calendar_service import CalendarService
+from services.error_digest import ErrorDigest
+
+# Telegram принимает от бота документы до 50 МБ, в файл сводки кладем хвост лога
+MAX_EXCERPT_SIZE = 20 * 1024 * 1024
+
+
+async def send_error_digest(scheduled_for: datetime.datetime | None = None) -> str:
+    """Задача планировщика: отправить администраторам сводку новых ошибок из лога."""
+    data, checkpoint = ErrorDigest.read_new()
+    groups = ErrorDigest.group(ErrorDigest.parse_records(data))
+
+    if groups:
+        bot = get_bot()
+        await bot.send_message(
+            settings.ADMIN_CHAT_ID, messages.prepare_error_digest(groups)
+        )
+        await bot.send_document(
+            settings.ADMIN_CHAT_ID,
+            document=data[-MAX_EXCERPT_SIZE:],
+            visible_file_name=f"errors_{CalendarService.today().isoformat()}.log",
+        )
+
+    # чекпоинт сохраняется только после отправки: при сбое ошибки уйдут в следующей сводке
+    if checkpoint is not None:
+        ErrorDigest.save_checkpoint(checkpoint)
+
+    count = sum(group["count"] for group in groups)
+    result = f"Сводка ошибок: {count} ошибок, {len(groups)} видов"
+    logger.info(result)
+    return result
+
+
+async def main():
+    try:
+        print(await send_error_digest(), flush=True)
+    finally:
+        await close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
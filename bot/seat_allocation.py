@@ -0,0 +1,35 @@
+import datetime
+
+import keyboards
+import messages
+import utils
+from bot.broadcast import Broadcaster
+
+
+async def notify_seat_allocation(
+    booking_date: datetime.date, allocated: list[dict], missed: list[dict]
+) -> None:
+    """
+    Уведомить сотрудников о результатах распределения мест на дату
+    (см. SeatAllocationService): все уведомления ставятся в очередь рассылки
+    одной пачкой и уходят с ограничением частоты.
+    """
+    book_date = utils.format_booking_date(booking_date)
+    for preference in allocated:
+        Broadcaster.enqueue(
+            preference["chat_id"],
+            messages.seat_allocated_text.format(
+                book_date=book_date, seat=preference["seat_number"]
+            ),
+            reply_markup=keyboards.seat_allocated_markup,
+        )
+    for preference in missed:
+        Broadcaster.enqueue(
+            preference["chat_id"],
+            messages.seat_allocation_missed_text.format(
+                book_date=book_date, seats=", ".join(preference["seat_numbers"])
+            ),
+            reply_markup=keyboards.seat_allocation_missed_markup(
+                booking_date.isoformat()
+            ),
+        )
@@ -0,0 +1,33 @@
+import datetime
+import math
+
+import keyboards
+import messages
+import utils
+from bot.dependencies import logger
+from bot.loader import get_bot
+from config.settings import settings
+
+
+async def notify_seat_freed(
+    chat_id: int, booking_date: datetime.date, seat_number: str
+) -> None:
+    """
+    Уведомить ожидающего об освободившемся и закрепленном за ним месте
+    (см. SeatWatchService). Отправляется сразу, а не через очередь рассылок:
+    время закрепления ограничено.
+    """
+    try:
+        await get_bot().send_message(
+            chat_id,
+            messages.seat_freed_text.format(
+                seat=seat_number,
+                book_date=utils.format_booking_date(booking_date),
+                hold_minutes=math.ceil(settings.SEAT_HOLD_SECONDS / 60),
+            ),
+            reply_markup=keyboards.seat_freed_markup(
+                booking_date.isoformat(), seat_number
+            ),
+        )
+    except Exception as e:
+        logger.info(f"Seat freed notification to {chat_id} failed: {e}")
@@ -0,0 +1,183 @@
+import asyncio
+import time
+from collections import deque
+
+from telebot import logger as telebot_logger
+from telebot.async_telebot import AsyncTeleBot
+from telebot.types import Update
+
+from bot.admission import ADMITTED_ATTR, BROWSE, PRIORITIES, Admission, classify
+from bot.dependencies import logger
+from config.settings import settings
+
+
+def shard_key(update: Update) -> int:
+    """
+    Ключ очереди апдейта: id чата (сообщения, нажатия кнопок, изменения участников),
+    иначе id пользователя; апдейты без чата и пользователя не упорядочиваются.
+    """
+    message = update.message or update.edited_message
+    if message is None and update.callback_query is not None:
+        message = update.callback_query.message
+    if message is not None:
+        return message.chat.id
+
+    for event in (update.my_chat_member, update.chat_member, update.chat_join_request):
+        if event is not None:
+            return event.chat.id
+    for event in (update.callback_query, update.inline_query, update.poll_answer):
+        user = getattr(event, "from_user", None) or getattr(event, "user", None)
+        if user is not None:
+            return user.id
+    return -update.update_id
+
+
+def update_class(update: Update) -> str:
+    """Класс допуска апдейта (см. bot.admission.classify)."""
+    event = update.message or update.callback_query
+    return classify(event) if event is not None else BROWSE
+
+
+class ShardedTeleBot(AsyncTeleBot):
+    """
+    Бот, который обрабатывает апдейты одного чата строго по очереди, а разных
+    чатов - параллельно: у каждого чата своя очередь (шард), и апдейты из нее
+    выполняет не больше одного обработчика за раз, поэтому двойное нажатие
+    или быстрые "Назад/Вперед" не правят один экран вперемешку. Всего апдейты
+    выполняют settings.UPDATE_WORKERS обработчиков; очередь чата удаляется,
+    как только опустела, поэтому память занимают только чаты с апдейтами
+    в обработке.
+    С допуском (settings.ADMISSION_SLOTS) обработчик берет чат, только если
+    классу его очередного апдейта есть слот (Admission.try_acquire), и держит
+    слот до конца обработки: чаты выбираются по приоритету класса (запись
+    раньше просмотра, просмотр раньше админки), и апдейты, упершиеся в лимит
+    своего класса, ждут в очереди, не занимая обработчиков. Апдейт, прождавший
+    с прихода дольше лимита класса, отклоняется (см. AdmissionMiddleware).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # ключ -> (апдейт, время прихода) чата, ожидающие обработки (первый - в обработке)
+        self._shards: dict[int, deque] = {}
+        # класс допуска -> ключи чатов, которые можно брать в обработку (по порядку)
+        self._ready: dict[str, deque] = {name: deque() for name in PRIORITIES}
+        # выставляется, когда появился готовый чат или освободился слот
+        self._changed: asyncio.Event | None = None
+        self._workers: list[asyncio.Task] = []
+        self._busy = 0
+        self._processed = 0
+        self._max_depth = 0
+
+    def _start_workers(self) -> None:
+        self._changed = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._run_worker())
+            for _ in range(settings.UPDATE_WORKERS)
+        ]
+
+    def _put_ready(self, key: int) -> None:
+        update, _ = self._shards[key][0]
+        self._ready[update_class(update)].append(key)
+        self._changed.set()
+
+    async def process_new_updates(self, updates: list[Update]) -> None:
+        """Разложить апдейты по очередям чатов (обработка - в обработчиках шардов)."""
+        telebot_logger.info(f"Received {len(updates)} new updates")
+        if self._changed is None:
+            self._start_workers()
+        arrived_at = time.perf_counter()
+        for update in updates:
+            key = shard_key(update)
+            shard = self._shards.get(key)
+            if shard is None:
+                self._shards[key] = deque([(update, arrived_at)])
+                self._put_ready(key)
+            else:
+                # чат уже в очереди или в обработке: апдейт дождется предыдущих
+                shard.append((update, arrived_at))
+                self._max_depth = max(self._max_depth, len(shard))
+
+    def _take_ready(self) -> tuple[int, str | None] | None:
+        """
+        Готовый чат с самым приоритетным апдейтом, которому есть слот (или
+        который уже прождал лимит и будет отклонен), и класс занятого слота;
+        None - брать нечего. Слот занимается здесь же, без await, поэтому
+        обработчики не делят один слот.
+        """
+        for name, ready in self._ready.items():
+            if not ready:
+                continue
+            _, arrived_at = self._shards[ready[0]][0]
+            if not settings.ADMISSION_SLOTS or Admission.try_acquire(name, arrived_at):
+                return ready.popleft(), name
+            if Admission.wait_left(name, arrived_at) <= 0:
+                Admission.shed(name)
+                return ready.popleft(), None
+        return None
+
+    def _next_timeout(self) -> float | None:
+        """Через сколько секунд истечет ожидание первого из готовых апдейтов."""
+        timeouts = [
+            Admission.wait_left(name, self._shards[ready[0]][0][1])
+            for name, ready in self._ready.items()
+            if ready
+        ]
+        return max(min(timeouts), 0) if timeouts else None
+
+    async def _process_update(self, update: Update, admitted: str | None) -> None:
+        # сообщения и нажатия кнопок передаются обработчикам напрямую, без
+        # process_new_updates, который пишет в лог о каждом пакете
+        if update.message is not None:
+            event, process = update.message, self.process_new_messages
+        elif update.callback_query is not None:
+            event, process = update.callback_query, self.process_new_callback_query
+        else:
+            await super().process_new_updates([update])
+            return
+        if settings.ADMISSION_SLOTS:
+            # решение о допуске для AdmissionMiddleware: слот уже занят (или нет)
+            setattr(event, ADMITTED_ATTR, admitted)
+        await process([event])
+
+    async def _run_worker(self) -> None:
+        while True:
+            taken = self._take_ready()
+            if taken is None:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._changed.wait(), timeout=self._next_timeout()
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            key, admitted = taken
+            shard = self._shards[key]
+            self._busy += 1
+            try:
+                await self._process_update(shard[0][0], admitted)
+            except Exception:
+                logger.error("Update processing failed", exc_info=True)
+            finally:
+                if settings.ADMISSION_SLOTS and admitted is not None:
+                    Admission.release(admitted)
+                    self._changed.set()
+                self._busy -= 1
+                self._processed += 1
+                shard.popleft()
+                if shard:
+                    self._put_ready(key)
+                else:
+                    del self._shards[key]
+
+    def shard_stats(self) -> dict:
+        """Метрики очередей чатов для отчета о готовности."""
+        return {
+            "workers": len(self._workers),
+            "busy": self._busy,
+            "shards": len(self._shards),
+            "queued": sum(len(shard) for shard in self._shards.values()) - self._busy,
+            "processed": self._processed,
+            "max_depth": self._max_depth,
+        }
@@ -8,7 +8,6 @@ from zoneinfo import ZoneInfo
 from . import settings
 
 LOG_DIR = Path("logs")
-LOG_DIR.mkdir(exist_ok=True)
 
 
 class OnlyInfoFilter(logging.Filter):
@@ -32,6 +31,7 @@ def setup_logging():
         return logger
 
     logger.setLevel(logging.INFO)
+    LOG_DIR.mkdir(exist_ok=True)
 
     formatter = MoscowFormatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
 
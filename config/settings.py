@@ -1,67 +1,201 @@
 import os
+from functools import lru_cache
 from pathlib import Path
 
-from dotenv import load_dotenv
 
-# Определяем среду выполнения (по умолчанию 'dev')
-APP_ENV = os.getenv("APP_ENV", "dev")
-print("Среда запуска: ", APP_ENV)
+@lru_cache(maxsize=1)
+def load_environment() -> Path | None:
+    """
+    Загружает переменные окружения из файла .env.{APP_ENV} (APP_ENV по умолчанию 'dev').
+    Выполняется один раз, возвращает путь к загруженному файлу (None - файла среды нет).
+    """
+    from dotenv import load_dotenv
 
-# Выбираем файл .env в зависимости от среды
-env_file = f".env.{APP_ENV}"
-env_path = Path(".") / env_file
-print("Файл переменных окружения: ", env_path)
+    # Выбираем файл .env в зависимости от среды
+    env_path = Path(".") / f".env.{os.getenv('APP_ENV', 'dev')}"
+
+    if env_path.exists():
+        load_dotenv(dotenv_path=env_path, override=True)
+        return env_path
 
-if env_path.exists():
-    load_dotenv(dotenv_path=env_path, override=True)
-else:
     # Для Docker контейнера используем переменные окружения напрямую
     load_dotenv(override=True)
+    return None
 
 
 class Settings:
-    # бот всегда берет токен из переменной BOT_TOKEN,
-    # значение которой зависит от загруженного .env файла
-    BOT_TOKEN = os.getenv("BOT_TOKEN")
-
-    # Настройки БД
-    DB_HOST = os.getenv("DB_HOST", "localhost")
-    DB_PORT = os.getenv("DB_PORT", "5432")
-    DB_NAME = os.getenv("DB_NAME", "seatbook_bot_dev")
-    DB_USER = os.getenv("DB_USER", "postgres")
-    DB_PASS = os.getenv("DB_PASS", "password")
-    DATABASE_URL = (
-        f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    )
-    # список юзернеймов которым доступна панель администратора
-    ADMIN_USERNAMES_LIST = [
-        u.strip().lower().lstrip("@")
-        for u in os.getenv("ADMIN_USERNAMES", "").split(",")
-        if u.strip()
-    ]
-    # основной админ, в чей чат предзаливаются png/jpeg для получения file_id
-    ADMIN_CHAT_ID = int(os.getenv("ADMIN_CHAT_ID", 0))
-    OFFICE_MAP_PATH = os.getenv("OFFICE_MAP_PATH", "static/office_map.png")
-    raw_users = os.getenv("USERS_LIST", "")
-    USERS_LIST = [u.strip() for u in raw_users.splitlines() if u.strip()]
-    # USERS_LIST = (
-    #     list(map(str, os.getenv("USERS_LIST", "").split(",")))
-    #     if os.getenv("USERS_LIST")
-    #     else []
-    # )
-    EXISTING_SEATS_LIST = (
-        list(map(str, os.getenv("EXISTING_SEATS_LIST", "").split(",")))
-        if os.getenv("EXISTING_SEATS_LIST")
-        else []
-    )
-
-    PLANNING_DAYS = int(os.getenv("PLANNING_DAYS", 14))
-
-
-print("DB_HOST from env:", os.getenv("DB_HOST"))
-print("DB_PORT from env:", os.getenv("DB_PORT"))
-print("DB_NAME from env:", os.getenv("DB_NAME"))
-print("DB_USER from env:", os.getenv("DB_USER"))
-
-
-settings = Settings()
+    def __init__(self):
+        load_environment()
+
+        # Определяем среду выполнения (по умолчанию 'dev')
+        self.APP_ENV = os.getenv("APP_ENV", "dev")
+
+        # бот всегда берет токен из переменной BOT_TOKEN,
+        # значение которой зависит от загруженного .env файла
+        self.BOT_TOKEN = os.getenv("BOT_TOKEN")
+
+        # Настройки БД
+        self.DB_HOST = os.getenv("DB_HOST", "localhost")
+        self.DB_PORT = os.getenv("DB_PORT", "5432")
+        self.DB_NAME = os.getenv("DB_NAME", "seatbook_bot_dev")
+        self.DB_USER = os.getenv("DB_USER", "postgres")
+        self.DB_PASS = os.getenv("DB_PASS", "password")
+        self.DATABASE_URL = (
+            f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}"
+            f"@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        )
+        # Реплика для чтения (необязательно): без DB_READ_HOST все запросы идут в основную БД
+        self.DB_READ_HOST = os.getenv("DB_READ_HOST")
+        self.DB_READ_PORT = os.getenv("DB_READ_PORT", self.DB_PORT)
+        self.DATABASE_READ_URL = (
+            f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASS}"
+            f"@{self.DB_READ_HOST}:{self.DB_READ_PORT}/{self.DB_NAME}"
+            if self.DB_READ_HOST
+            else None
+        )
+        # сколько секунд после записи чтения пользователя идут в основную БД
+        self.DB_READ_STICKY_SECONDS = float(os.getenv("DB_READ_STICKY_SECONDS", 5))
+        # список юзернеймов которым доступна панель администратора
+        self.ADMIN_USERNAMES_LIST = [
+            u.strip().lower().lstrip("@")
+            for u in os.getenv("ADMIN_USERNAMES", "").split(",")
+            if u.strip()
+        ]
+        # основной админ, в чей чат предзаливаются png/jpeg для получения file_id
+        self.ADMIN_CHAT_ID = int(os.getenv("ADMIN_CHAT_ID", 0))
+        self.OFFICE_MAP_PATH = os.getenv("OFFICE_MAP_PATH", "static/office_map.png")
+        raw_users = os.getenv("USERS_LIST", "")
+        self.USERS_LIST = [u.strip() for u in raw_users.splitlines() if u.strip()]
+        self.EXISTING_SEATS_LIST = (
+            list(map(str, os.getenv("EXISTING_SEATS_LIST", "").split(",")))
+            if os.getenv("EXISTING_SEATS_LIST")
+            else []
+        )
+        # зоны мест для реестра seats, формат: "Зона А:1,2,3|Зона Б:4,5"
+        self.SEAT_ZONES = {
+            seat.strip(): zone.strip()
+            for zone_spec in os.getenv("SEAT_ZONES", "").split("|")
+            if ":" in zone_spec
+            for zone, seats in [zone_spec.split(":", 1)]
+            for seat in seats.split(",")
+            if seat.strip()
+        }
+
+        # хранилище данных сервисов: sql (PostgreSQL) или memory (для бенчмарков)
+        self.STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sql")
+
+        # координаты мест на карте офиса (пиксели OFFICE_MAP_PATH), формат: "1:120,340|2:180,340"
+        self.SEAT_COORDINATES = {
+            seat.strip(): {"x": int(x), "y": int(y)}
+            for seat_spec in os.getenv("SEAT_COORDINATES", "").split("|")
+            if ":" in seat_spec
+            for seat, point in [seat_spec.split(":", 1)]
+            for x, y in [point.split(",", 1)]
+        }
+        # карта занятости: радиус маркера места и сколько состояний помнить (file_id)
+        self.OCCUPANCY_MARKER_RADIUS = int(os.getenv("OCCUPANCY_MARKER_RADIUS", 14))
+        self.OCCUPANCY_MAP_CACHE_SIZE = int(os.getenv("OCCUPANCY_MAP_CACHE_SIZE", 256))
+
+        self.PLANNING_DAYS = int(os.getenv("PLANNING_DAYS", 14))
+        # сколько дат держит кэш "кто придет в офис" (окно планирования + запас)
+        self.VISITORS_CACHE_SIZE = int(os.getenv("VISITORS_CACHE_SIZE", 32))
+
+        # ограничение частоты апдейтов от пользователя: размер всплеска и токенов в секунду
+        # (FLOOD_BURST=0 или FLOOD_RATE=0 - без ограничения)
+        self.FLOOD_BURST = float(os.getenv("FLOOD_BURST", 6))
+        self.FLOOD_RATE = float(os.getenv("FLOOD_RATE", 2))
+
+        # допуск апдейтов к обработке: всего одновременных обработчиков (0 - без ограничения),
+        # лимиты и время ожидания в очереди по классам, формат: "write:12,browse:8,admin:2"
+        self.ADMISSION_SLOTS = int(os.getenv("ADMISSION_SLOTS", 12))
+        self.ADMISSION_CLASS_SLOTS = {
+            name.strip(): int(value)
+            for item in os.getenv(
+                "ADMISSION_CLASS_SLOTS", "write:12,browse:8,admin:2"
+            ).split(",")
+            if ":" in item
+            for name, value in [item.split(":", 1)]
+        }
+        self.ADMISSION_QUEUE_SECONDS = {
+            name.strip(): float(value)
+            for item in os.getenv(
+                "ADMISSION_QUEUE_SECONDS", "write:10,browse:3,admin:5"
+            ).split(",")
+            if ":" in item
+            for name, value in [item.split(":", 1)]
+        }
+
+        # апдейты одного чата обрабатываются по очереди, разных чатов - параллельно
+        # не больше чем UPDATE_WORKERS обработчиками (0 - без очередей по чатам);
+        # по умолчанию - по числу слотов допуска: обработчик берет апдейт, только когда
+        # его классу есть слот, поэтому лишние обработчики простаивали бы
+        self.UPDATE_WORKERS = int(
+            os.getenv("UPDATE_WORKERS", self.ADMISSION_SLOTS or 32)
+        )
+
+        # режим постоянного экрана: в чате одно сообщение бота, которое всегда правится
+        self.DASHBOARD_MODE = os.getenv("DASHBOARD_MODE", "false").lower() == "true"
+        # для скольких чатов помнить текущий экран бота
+        self.SCREEN_TRACKER_SIZE = int(os.getenv("SCREEN_TRACKER_SIZE", 10000))
+
+        # утренняя сводка "кто сегодня в офисе": часы отправки на выбор (по Москве)
+        self.DIGEST_SEND_HOURS = [
+            int(hour) for hour in os.getenv("DIGEST_SEND_HOURS", "8,9,10").split(",")
+        ]
+        # на сколько секунд освободившееся место закрепляется за первым ожидающим
+        self.SEAT_HOLD_SECONDS = float(os.getenv("SEAT_HOLD_SECONDS", 120))
+        # жеребьевка мест: прием заявок до этого часа (по Москве) накануне даты,
+        # вес заявки тем больше, чем реже сотрудник был в офисе за столько дней
+        self.LOTTERY_CUTOFF_HOUR = int(os.getenv("LOTTERY_CUTOFF_HOUR", 18))
+        self.LOTTERY_LOOKBACK_DAYS = int(os.getenv("LOTTERY_LOOKBACK_DAYS", 28))
+        # рассылки (сводка и т.п.): не больше сообщений в секунду (0 - без ограничения)
+        self.BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 20))
+
+        # общая HTTP-сессия Bot API: размер пула соединений и время ожидания ответа
+        # в секундах по профилям методов, формат: "default:15,fast:2,upload:60"
+        self.BOT_API_POOL_SIZE = int(os.getenv("BOT_API_POOL_SIZE", 32))
+        self.BOT_API_TIMEOUTS = {
+            "default": 15,
+            "fast": 2,
+            "upload": 60,
+            **{
+                name.strip(): float(value)
+                for item in os.getenv("BOT_API_TIMEOUTS", "").split(",")
+                if ":" in item
+                for name, value in [item.split(":", 1)]
+            },
+        }
+
+        # локальный эндпоинт готовности (HEALTH_PORT=0 - выключен)
+        self.HEALTH_HOST = os.getenv("HEALTH_HOST", "127.0.0.1")
+        self.HEALTH_PORT = int(os.getenv("HEALTH_PORT", 8080))
+        self.HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", 5))
+
+    def describe(self) -> str:
+        """Краткое описание среды запуска для вывода при старте (без паролей)."""
+        return (
+            f"Среда запуска: {self.APP_ENV}, "
+            f"файл переменных окружения: {load_environment()}, "
+            f"БД: {self.DB_USER}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+            + (
+                f", реплика: {self.DB_READ_HOST}:{self.DB_READ_PORT}"
+                if self.DB_READ_HOST
+                else ""
+            )
+        )
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Фабрика настроек: окружение читается при первом обращении, а не при импорте."""
+    return Settings()
+
+
+class _LazySettings:
+    """Прокси к get_settings(), чтобы `from config.settings import settings` ничего не загружал."""
+
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
+
+
+settings = _LazySettings()
@@ -1,23 +1,106 @@
 import logging
+import time
+from contextvars import ContextVar
+from functools import lru_cache
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from config.settings import settings
 
-# Создаем движок и фабрику сессий
-engine = create_async_engine(settings.DATABASE_URL, echo=False, future=True)
-print("DB URL in use: ", settings.DATABASE_URL)
+Base = declarative_base()
 
-logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+# пользователь (tg_id), в контексте апдейта которого выполняются запросы
+current_actor: ContextVar[int | None] = ContextVar("current_actor", default=None)
 
-AsyncSessionLocal = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+# время (time.monotonic) последней записи в основную БД по пользователям
+_last_write_at: dict[int, float] = {}
+
+
+class PrimarySession(Session):
+    """Сессия основной БД: после коммита пользователь "прилипает" к ней на время."""
+
+
+@event.listens_for(PrimarySession, "after_commit")
+def _remember_write(session: Session) -> None:
+    actor = current_actor.get()
+    if actor is None or not settings.DATABASE_READ_URL:
+        return
+
+    now = time.monotonic()
+    _last_write_at[actor] = now
+    # чистим устаревшие отметки, чтобы словарь не рос бесконечно
+    if len(_last_write_at) > 1024:
+        expired_before = now - settings.DB_READ_STICKY_SECONDS
+        for expired_actor in [
+            a for a, t in _last_write_at.items() if t < expired_before
+        ]:
+            del _last_write_at[expired_actor]
+
+
+def set_current_actor(actor: int | None) -> None:
+    """Запомнить пользователя текущего апдейта (для привязки чтений после записи)."""
+    current_actor.set(actor)
+
+
+def _is_sticky_to_primary() -> bool:
+    """Недавно ли текущий пользователь писал в основную БД (реплика могла отстать)."""
+    last_write_at = _last_write_at.get(current_actor.get())
+    return (
+        last_write_at is not None
+        and time.monotonic() - last_write_at < settings.DB_READ_STICKY_SECONDS
+    )
 
-Base = declarative_base()
+
+def reads_from_primary() -> bool:
+    """Идут ли чтения текущего пользователя в основную БД (реплики нет или он недавно писал)."""
+    return not settings.DATABASE_READ_URL or _is_sticky_to_primary()
+
+
+@lru_cache(maxsize=1)
+def get_engine() -> AsyncEngine:
+    """Фабрика движка БД: движок создается при первом обращении, а не при импорте."""
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    return create_async_engine(settings.DATABASE_URL, echo=False, future=True)
+
+
+@lru_cache(maxsize=1)
+def get_read_engine() -> AsyncEngine:
+    """Движок реплики для чтения; без DATABASE_READ_URL - движок основной БД."""
+    if not settings.DATABASE_READ_URL:
+        return get_engine()
+    return create_async_engine(settings.DATABASE_READ_URL, echo=False, future=True)
+
+
+@lru_cache(maxsize=1)
+def get_sessionmaker() -> sessionmaker:
+    """Фабрика сессий БД поверх get_engine()."""
+    return sessionmaker(
+        get_engine(),
+        expire_on_commit=False,
+        class_=AsyncSession,
+        sync_session_class=PrimarySession,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_read_sessionmaker() -> sessionmaker:
+    """Фабрика сессий реплики поверх get_read_engine()."""
+    return sessionmaker(get_read_engine(), expire_on_commit=False, class_=AsyncSession)
 
 
 # Функция для получения сессии (будет использоваться в сервисах)
-async def get_db_session():
-    """Асинхронный контекстный менеджер для работы с сессией БД."""
-    async with AsyncSessionLocal() as session:
+async def get_db_session(read_only: bool = False):
+    """
+    Асинхронный контекстный менеджер для работы с сессией БД.
+    read_only=True - сессия реплики (если она настроена), кроме случаев,
+    когда текущий пользователь только что писал в основную БД.
+    """
+    if read_only and not reads_from_primary():
+        session_factory = get_read_sessionmaker()
+    else:
+        session_factory = get_sessionmaker()
+
+    async with session_factory() as session:
         yield session
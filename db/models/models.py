@@ -1,5 +1,6 @@
 from sqlalchemy import (
     BigInteger,
+    Boolean,
     CheckConstraint,
     Column,
     Date,
@@ -7,10 +8,12 @@ from sqlalchemy import (
     ForeignKey,
     Index,
     Integer,
+    SmallInteger,
     String,
     func,
     text,
 )
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import relationship
 
 from db.database import Base
@@ -70,3 +73,131 @@ class Booking(Base):
     )
 
     user = relationship("User", backref="bookings")
+
+
+class Seat(Base):
+    __tablename__ = "seats"
+    __table_args__ = {"schema": "seatbook"}
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # стабильный индекс места = номер бита в маске занятости, не переиспользуется
+    seat_index = Column(Integer, unique=True, nullable=False)
+    seat_number = Column(String, unique=True, nullable=False)
+    zone = Column(String, nullable=True)
+    floor = Column(Integer, nullable=True)
+    attributes = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    is_active = Column(Boolean, nullable=False, server_default=text("true"))
+
+
+class DigestSubscription(Base):
+    __tablename__ = "digest_subscriptions"
+    __table_args__ = (
+        # рассылка выбирает подписчиков по часу отправки
+        Index("ix_digest_subscriptions_send_hour", "send_hour"),
+        {"schema": "seatbook"},
+    )
+
+    user_id = Column(
+        Integer, ForeignKey("seatbook.users.id", ondelete="CASCADE"), primary_key=True
+    )
+    # час отправки утренней сводки по Москве
+    send_hour = Column(SmallInteger, nullable=False)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class SeatWatch(Base):
+    __tablename__ = "seat_watches"
+    __table_args__ = (
+        # одно ожидание на сотрудника в дату; ожидающие выбираются по дате
+        Index("uq_seat_watch_date_user", "booking_date", "user_id", unique=True),
+        {"schema": "seatbook"},
+    )
+
+    # порядок постановки в очередь ожидания (FIFO)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    booking_date = Column(Date, nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("seatbook.users.id", ondelete="CASCADE"), nullable=False
+    )
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class SeatPreference(Base):
+    __tablename__ = "seat_preferences"
+    __table_args__ = {"schema": "seatbook"}
+
+    user_id = Column(
+        Integer, ForeignKey("seatbook.users.id", ondelete="CASCADE"), primary_key=True
+    )
+    # номера мест по убыванию предпочтения
+    seat_numbers = Column(ARRAY(String), nullable=False)
+    # дни недели битовой маской (пн - бит 0), по умолчанию пн-пт
+    weekdays = Column(SmallInteger, nullable=False, server_default=text("31"))
+    # дата последнего места, полученного при распределении (очередность при спросе)
+    last_allocated_on = Column(Date, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class LotteryDate(Base):
+    __tablename__ = "lottery_dates"
+    __table_args__ = {"schema": "seatbook"}
+
+    booking_date = Column(Date, primary_key=True)
+    # окончание приема заявок: после него проводится жеребьевка
+    cutoff_at = Column(DateTime(timezone=True), nullable=False)
+    # зерно жеребьевки: по нему и заявкам результат воспроизводим
+    seed = Column(BigInteger, nullable=False)
+    # время проведения жеребьевки (NULL - заявки еще принимаются)
+    drawn_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class LotteryRequest(Base):
+    __tablename__ = "lottery_requests"
+    __table_args__ = {"schema": "seatbook"}
+
+    # одна заявка на сотрудника в дату
+    booking_date = Column(
+        Date,
+        ForeignKey("seatbook.lottery_dates.booking_date", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    user_id = Column(
+        Integer, ForeignKey("seatbook.users.id", ondelete="CASCADE"), primary_key=True
+    )
+    # место в порядке жеребьевки (NULL - жеребьевка еще не проводилась)
+    draw_position = Column(SmallInteger, nullable=True)
+    created_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+
+
+class JobRun(Base):
+    __tablename__ = "job_runs"
+    __table_args__ = (
+        # один запуск задачи на срабатывание расписания на все реплики
+        Index("uq_job_runs_name_scheduled", "job_name", "scheduled_for", unique=True),
+        {"schema": "seatbook"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_name = Column(String, nullable=False)
+    # срабатывание расписания, по которому выполнялась задача
+    scheduled_for = Column(DateTime(timezone=True), nullable=False)
+    started_at = Column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    # running | ok | error
+    status = Column(String, nullable=False, server_default=text("'running'"))
+    # итог выполнения или текст ошибки
+    detail = Column(String, nullable=True)
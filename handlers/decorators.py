@@ -3,8 +3,9 @@ from functools import wraps
 import keyboards
 import messages
 import utils
-from bot import bot, logger
+from bot import bot, health, logger
 from config.settings import settings
+from db.database import set_current_actor
 from services.errors import BookingConflictError
 
 
@@ -14,6 +15,8 @@ def error_command_handler(func):
     @wraps(func)
     async def wrap_function(message):
         result = None
+        # чтения пользователя после его записи идут в основную БД (см. get_db_session)
+        set_current_actor(message.from_user.id)
         try:
             result = await func(message)
         except Exception as e:
@@ -38,6 +41,8 @@ def error_command_handler(func):
                 new_reply_markup=keyboards.to_start_markup,
             )
             print("Ошибка: ", type(e).__name__, e)
+        finally:
+            health.mark_update_processed()
 
         return result
 
@@ -50,6 +55,8 @@ def error_query_handler(func):
     @wraps(func)
     async def wrap_function(query):
         result = None
+        # чтения пользователя после его записи идут в основную БД (см. get_db_session)
+        set_current_actor(query.from_user.id)
         try:
             result = await func(query)
         except Exception as e:
@@ -75,6 +82,8 @@ def error_query_handler(func):
                 new_reply_markup=keyboards.to_start_markup,
             )
             print("Ошибка: ", type(e).__name__, e)
+        finally:
+            health.mark_update_processed()
 
         return result
 
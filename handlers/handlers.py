@@ -8,12 +8,59 @@ import utils
 from bot import bot, logger
 from config.settings import settings
 from scripts.preload_images import preloaded_images
-from services import BookingService, UserService
+from services import (
+    MAX_PREFERRED_SEATS,
+    BookingService,
+    CalendarService,
+    DigestService,
+    LotteryService,
+    OccupancyMap,
+    SeatAllocationService,
+    SeatRegistry,
+    SeatWatchService,
+    UserService,
+)
 from services.errors import *
 
 from . import decorators
 
 
+async def _get_available_seats_or_none(book_date: str) -> list[str] | None:
+    """
+    Свободные места на дату для параллельного запроса вместе с проверкой даты:
+    None, если мест нет (дата тогда не пройдет проверку доступности).
+    """
+    try:
+        return await BookingService.get_available_seats(book_date=book_date)
+    except ValueError:
+        return None
+
+
+async def _replace_with_seat_map(
+    query: CallbackQuery, available_seats: list[str], selection_keyboard
+) -> None:
+    """
+    Показать выбор места на карте офиса с отметками свободных и занятых мест
+    (без карты занятости - на обычной карте офиса).
+    """
+    layout = SeatRegistry.layout()
+    occupied_mask = layout.active_mask & ~layout.mask_of(available_seats)
+    photo = await OccupancyMap.get_photo(layout, occupied_mask)
+
+    sent_message = None
+    try:
+        sent_message = await utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.MEDIA,
+            new_text=messages.choose_seat_text,
+            new_reply_markup=selection_keyboard,
+            new_photo_file_id=photo,
+        )
+    finally:
+        if photo is not None:
+            OccupancyMap.remember(layout, occupied_mask, sent_message)
+
+
 @bot.message_handler(commands=["start"])
 @decorators.error_command_handler
 async def start_command_handler(message: Message) -> None:
@@ -67,8 +114,10 @@ async def start_command_handler(message: Message) -> None:
 @decorators.error_query_handler
 async def handle_to_start_query(query: CallbackQuery) -> None:
     """Обработчик коллбека возврата в начало (to_start)"""
-    await bot.answer_callback_query(callback_query_id=query.id)
-    user = await UserService.get_user_by_tg_id(tg_id=query.from_user.id)
+    _, user = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_tg_id(tg_id=query.from_user.id),
+    )
     keyboard = (
         keyboards.start_markup_admin
         if query.from_user.username in settings.ADMIN_USERNAMES_LIST
@@ -119,12 +168,14 @@ async def handle_users_page_query(query: CallbackQuery) -> None:
     Обработчик коллбека получения ФИО свободных пользователей
     (с указанием  номера страницы)  (users_page: page)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     # Получаем пользователей для запрошенной страницы
     required_page = int(
         query.data.split(":")[1].strip()
     )  # Получаем номер требуемой страницы из callback_data
-    free_users = await UserService.get_users_wo_tg_id(page=required_page)
+    _, free_users = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_users_wo_tg_id(page=required_page),
+    )
     if not free_users["users"]:
         await utils.safely_replace_message(
             query,
@@ -154,12 +205,14 @@ async def handle_register_query(query: CallbackQuery) -> None:
     Обработчик коллбека регистрации пользователя
     с выбранным ФИО (reg: user_id)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     # Проверяем точно ли пользовтаель не перепутал имя (т.е. это точно его ФИО)
     user_id = int(
         query.data.split(":")[1].strip()
     )  # Получаем id записи users из callback_data
-    user_data = await UserService.get_user_by_user_id(user_id)
+    _, user_data = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_user_id(user_id),
+    )
     full_name = user_data.full_name
     await utils.safely_replace_message(
         query,
@@ -178,8 +231,9 @@ async def handle_confirm_reg_query(query: CallbackQuery) -> None:
     Обработчик коллбека подтверждения регистрации
     пользователя с выбранным ФИО (cnfm_reg: user_id)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-    # Регистрируем пользователя с выбранным именем
+    # Регистрируем пользователя с выбранным именем (запись - отдельно от ответа
+    # на коллбек, чтобы сбой ответа не отменил ее посреди транзакции)
+    await utils.safely_answer_query(query)
     user = await UserService.update_user(
         user_id=int(query.data.split(":")[1].strip()),
         username=query.from_user.username,
@@ -209,9 +263,9 @@ async def handle_choose_booking_date_query(query: CallbackQuery) -> None:
     Обработчик коллбека запроса дат доступных для
     персонального бронирования (make_booking_choose_date)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-    available_dates = await BookingService.get_dates_wo_user_bookings(
-        query.from_user.id
+    _, available_dates = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        BookingService.get_dates_wo_user_bookings(query.from_user.id),
     )
     if not available_dates:
         await utils.safely_replace_message(
@@ -222,7 +276,9 @@ async def handle_choose_booking_date_query(query: CallbackQuery) -> None:
         )
     else:
         # Создаем клавиатуру со свободными датами
-        selection_keyboard = keyboards.date_selection_markup(available_dates)
+        selection_keyboard = keyboards.date_selection_markup(
+            available_dates, LotteryService.pending_dates()
+        )
         await utils.safely_replace_message(
             query,
             new_message_type=utils.MessageContentType.TEXT,
@@ -231,6 +287,20 @@ async def handle_choose_booking_date_query(query: CallbackQuery) -> None:
         )
 
 
+async def _replace_with_lottery(query: CallbackQuery, book_date_obj) -> None:
+    """Показать жеребьевку мест на дату с окончанием приема заявок."""
+    cutoff_at = LotteryService.cutoff_of(book_date_obj)
+    await utils.safely_replace_message(
+        query,
+        new_message_type=utils.MessageContentType.TEXT,
+        new_text=messages.lottery_text.format(
+            book_date=utils.format_booking_date(book_date_obj),
+            cutoff=f"{utils.format_booking_date(cutoff_at.date())}, {cutoff_at:%H:%M}",
+        ),
+        new_reply_markup=keyboards.lottery_markup(book_date_obj.isoformat()),
+    )
+
+
 @bot.callback_query_handler(
     lambda query: query.data and query.data.startswith("seats_on: ")
 )
@@ -240,10 +310,23 @@ async def handle_seats_on_date_query(query: CallbackQuery) -> None:
     Обработчик коллбека запроса мест доступных
     на выбранную дату (seats_on: date)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     book_date = query.data.split(":")[1].strip()
-    # проверяем что переданная дата есть в списке дат доступных для бронирования для пользователя
-    available_dates = await BookingService.get_available_dates(query.from_user.id)
+    # места на дату разыгрываются - вместо выбора места показываем жеребьевку
+    window_date = CalendarService.get_date(book_date)
+    if window_date and LotteryService.is_pending(window_date["date_obj"]):
+        await utils.run_concurrently(
+            utils.safely_answer_query(query),
+            _replace_with_lottery(query, window_date["date_obj"]),
+        )
+        return
+
+    # проверяем что переданная дата есть в списке дат доступных для бронирования для пользователя,
+    # места на дату запрашиваются параллельно с проверкой
+    _, available_dates, available_seats = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        BookingService.get_available_dates(query.from_user.id),
+        _get_available_seats_or_none(book_date),
+    )
     if book_date not in [date["timestamp"] for date in available_dates]:
         await utils.safely_replace_message(
             query,
@@ -254,16 +337,76 @@ async def handle_seats_on_date_query(query: CallbackQuery) -> None:
         return
 
     # Создаем клавиатуру со свободными местами
-    available_seats = await BookingService.get_available_seats(book_date=book_date)
-    selection_keyboard = keyboards.seat_selection_markup(available_seats, book_date)
-    await utils.safely_replace_message(
+    if available_seats is None:
+        available_seats = await BookingService.get_available_seats(book_date=book_date)
+    selection_keyboard = keyboards.seat_selection_markup(
+        SeatRegistry.layout().group_by_zone(available_seats), book_date
+    )
+    await _replace_with_seat_map(query, available_seats, selection_keyboard)
+
+
+@bot.callback_query_handler(
+    lambda query: query.data and query.data.startswith("watch_date: ")
+)
+@decorators.error_query_handler
+async def handle_watch_date_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека ожидания свободного места
+    на занятую дату (watch_date: date)
+    """
+    book_date = query.data.split(":")[1].strip()
+    book_date_obj = datetime.datetime.strptime(book_date, "%Y-%m-%d").date()
+    added = await SeatWatchService.watch(query.from_user.id, book_date_obj)
+    text = messages.seat_watch_added_text if added else messages.seat_watch_exists_text
+    await utils.safely_answer_query(
         query,
-        new_message_type=utils.MessageContentType.MEDIA,
-        new_text=messages.choose_seat_text,
-        new_reply_markup=selection_keyboard,
+        text=text.format(book_date=utils.format_booking_date(book_date_obj)),
+    )
+
+
+@bot.callback_query_handler(
+    lambda query: query.data
+    and query.data.startswith(("lottery_join: ", "lottery_leave: "))
+)
+@decorators.error_query_handler
+async def handle_lottery_request_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбеков подачи и отзыва заявки на жеребьевку мест
+    (lottery_join: date, lottery_leave: date)
+    """
+    action, book_date = (part.strip() for part in query.data.split(":"))
+    book_date_obj = datetime.datetime.strptime(book_date, "%Y-%m-%d").date()
+    try:
+        if action == "lottery_join":
+            joined = await LotteryService.join(query.from_user.id, book_date_obj)
+            text = (
+                messages.lottery_joined_text
+                if joined
+                else messages.lottery_already_joined_text
+            )
+        else:
+            left = await LotteryService.leave(query.from_user.id, book_date_obj)
+            text = (
+                messages.lottery_left_text if left else messages.lottery_not_joined_text
+            )
+    except ValueError:
+        text = messages.lottery_closed_text
+    await utils.safely_answer_query(
+        query,
+        text=text.format(book_date=utils.format_booking_date(book_date_obj)),
     )
 
 
+@bot.callback_query_handler(lambda query: query.data == "ignore")
+@decorators.error_query_handler
+async def handle_ignore_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека кнопок-заголовков (например, названия зоны
+    в списке мест), которые не выполняют действий (ignore)
+    """
+    await utils.safely_answer_query(query)
+
+
 @bot.callback_query_handler(
     lambda query: query.data and query.data.startswith("book_date_seat: ")
 )
@@ -274,12 +417,14 @@ async def handle_book_date_seat_query(query: CallbackQuery) -> None:
     (book_date_seat: book_date|seat)
     """
     try:
-        await bot.answer_callback_query(callback_query_id=query.id)
         booking_params = query.data.split(":")[1].strip().split("|")
         book_date, seat_number = booking_params[0], booking_params[1]
         book_date_obj = datetime.datetime.strptime(book_date, "%Y-%m-%d").date()
         # Создаем бронирование
-        user_data = await UserService.get_user_by_tg_id(tg_id=query.from_user.id)
+        _, user_data = await utils.run_concurrently(
+            utils.safely_answer_query(query),
+            UserService.get_user_by_tg_id(tg_id=query.from_user.id),
+        )
         user_id, full_name = user_data.id, user_data.full_name
         booking = await BookingService.create_booking(
             booking_date=book_date_obj,
@@ -323,11 +468,13 @@ async def handle_book_wo_seat_query(query: CallbackQuery) -> None:
     без места на выбранную дату (book_wo_seat: book_date)
     """
     try:
-        await bot.answer_callback_query(callback_query_id=query.id)
         book_date = query.data.split(":")[1].strip()
         book_date_obj = datetime.datetime.strptime(book_date, "%Y-%m-%d").date()
         # Создаем посещение без места
-        user_data = await UserService.get_user_by_tg_id(tg_id=query.from_user.id)
+        _, user_data = await utils.run_concurrently(
+            utils.safely_answer_query(query),
+            UserService.get_user_by_tg_id(tg_id=query.from_user.id),
+        )
         user_id, full_name = user_data.id, user_data.full_name
         booking = await BookingService.create_booking(
             booking_date=book_date_obj,
@@ -366,8 +513,10 @@ async def handle_manage_my_bookings_query(query: CallbackQuery) -> None:
     Обработчик коллбека просмотра всех
     бронирований пользователя (manage_my_bookings)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-    user = await UserService.get_user_by_tg_id(tg_id=query.from_user.id)
+    _, user = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_tg_id(tg_id=query.from_user.id),
+    )
     user_id, full_name = user.id, user.full_name
     users_bookings = await BookingService.get_user_future_bookings(user_id)
     # Создаем текст с данными всех будущих бронирований пользователя
@@ -402,8 +551,10 @@ async def handle_delete_booking_query(query: CallbackQuery) -> None:
     Обработчик коллбека запроса списка бронирований
     пользователя для удаления (delete_booking)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-    user = await UserService.get_user_by_tg_id(tg_id=query.from_user.id)
+    _, user = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_tg_id(tg_id=query.from_user.id),
+    )
     user_id, full_name = user.id, user.full_name
     users_bookings = await BookingService.get_user_future_bookings(user_id)
     # Создаем текст с данными всех будущих бронирований пользователя
@@ -444,8 +595,10 @@ async def handle_booking_id_delete_query(query: CallbackQuery) -> None:
     Обработчик коллбека удаления бронирования по
     его id (booking_id_delete: booking_id)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-    user = await UserService.get_user_by_tg_id(tg_id=query.from_user.id)
+    _, user = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_tg_id(tg_id=query.from_user.id),
+    )
     full_name = user.full_name
     booking_id_to_delete = int(query.data.split(":")[1].strip())
     # тут можно добавить проверка на админ или что бронь автора запроса
@@ -477,8 +630,10 @@ async def handle_see_colleagues_bookings_query(query: CallbackQuery) -> None:
     Обработчик коллбека запроса дат с хотя бы одним
     посетителем (see_colleagues_bookings_choose_date)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-    dates_with_visitors = await BookingService.get_dates_with_visitors()
+    _, dates_with_visitors = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        BookingService.get_dates_with_visitors(),
+    )
     if not dates_with_visitors:
         await utils.safely_replace_message(
             query,
@@ -499,6 +654,25 @@ async def handle_see_colleagues_bookings_query(query: CallbackQuery) -> None:
         )
 
 
+def _render_visitors_text(book_date_obj: datetime.date, visitors: list[dict]) -> str:
+    """Текст с данными всех бронирований коллег на дату."""
+    if not visitors:
+        return messages.no_visitors_text
+
+    bookings_text = messages.see_colleagues_bookings_on_date_text_header.format(
+        book_date=utils.format_booking_date(book_date_obj)
+    )
+    for visitor in visitors:
+        seat_number = visitor["seat_number"] if visitor["seat_number"] else "XX"
+        booking_type = utils.get_booking_type_name(visitor["type"])
+        bookings_text += messages.see_colleagues_bookings_on_date_text_item.format(
+            full_name=visitor["full_name"],
+            seat_number=seat_number,
+            booking_type=booking_type,
+        )
+    return bookings_text
+
+
 @bot.callback_query_handler(
     lambda query: query.data and query.data.startswith("see_colleagues_on: ")
 )
@@ -508,26 +682,13 @@ async def handle_see_colleagues_on_query(query: CallbackQuery) -> None:
     Обработчик коллбека просмотра бронирований коллег
     на выбранную дату (see_colleagues_on: date)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     book_date = query.data.split(":")[1].strip()
     book_date_obj = datetime.datetime.strptime(book_date, "%Y-%m-%d").date()
-    # получаем посетителей на дату
-    visitors = await BookingService.get_visitors_by_date(date=book_date_obj)
-    # Создаем текст с данными всех будущих бронирований коллег
-    if visitors:
-        bookings_text = messages.see_colleagues_bookings_on_date_text_header.format(
-            book_date=utils.format_booking_date(book_date_obj)
-        )
-        for visitor in visitors:
-            seat_number = visitor["seat_number"] if visitor["seat_number"] else "XX"
-            booking_type = utils.get_booking_type_name(visitor["type"])
-            bookings_text += messages.see_colleagues_bookings_on_date_text_item.format(
-                full_name=visitor["full_name"],
-                seat_number=seat_number,
-                booking_type=booking_type,
-            )
-    else:
-        bookings_text = messages.no_visitors_text
+    # текст берется из кэша, пока бронирования на дату не менялись
+    _, bookings_text = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        BookingService.get_visitors_text(book_date_obj, _render_visitors_text),
+    )
 
     await utils.safely_replace_message(
         query,
@@ -537,6 +698,177 @@ async def handle_see_colleagues_on_query(query: CallbackQuery) -> None:
     )
 
 
+async def _replace_with_digest_settings(
+    query: CallbackQuery, send_hour: int | None
+) -> None:
+    """Показать настройки утренней сводки с текущим временем отправки."""
+    status = (
+        messages.digest_status_on_text.format(send_hour=send_hour)
+        if send_hour is not None
+        else messages.digest_status_off_text
+    )
+    await utils.safely_replace_message(
+        query,
+        new_message_type=utils.MessageContentType.TEXT,
+        new_text=messages.digest_settings_text.format(status=status),
+        new_reply_markup=keyboards.digest_settings_markup(
+            settings.DIGEST_SEND_HOURS, send_hour
+        ),
+    )
+
+
+@bot.callback_query_handler(lambda query: query.data == "digest_settings")
+@decorators.error_query_handler
+async def handle_digest_settings_query(query: CallbackQuery) -> None:
+    """Обработчик коллбека настроек утренней сводки (digest_settings)"""
+    _, send_hour = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        DigestService.get_send_hour(tg_id=query.from_user.id),
+    )
+    await _replace_with_digest_settings(query, send_hour)
+
+
+@bot.callback_query_handler(
+    lambda query: query.data and query.data.startswith("digest_hour: ")
+)
+@decorators.error_query_handler
+async def handle_digest_hour_query(query: CallbackQuery) -> None:
+    """Обработчик коллбека подписки на утреннюю сводку в выбранный час"""
+    send_hour = int(query.data.split(": ")[1])
+    await DigestService.subscribe(tg_id=query.from_user.id, send_hour=send_hour)
+    await utils.run_concurrently(
+        utils.safely_answer_query(
+            query,
+            text=messages.digest_subscribed_text.format(send_hour=send_hour),
+        ),
+        _replace_with_digest_settings(query, send_hour),
+    )
+
+
+@bot.callback_query_handler(lambda query: query.data == "digest_off")
+@decorators.error_query_handler
+async def handle_digest_off_query(query: CallbackQuery) -> None:
+    """Обработчик коллбека отключения утренней сводки (digest_off)"""
+    await DigestService.unsubscribe(tg_id=query.from_user.id)
+    await utils.run_concurrently(
+        utils.safely_answer_query(query, text=messages.digest_unsubscribed_text),
+        _replace_with_digest_settings(query, None),
+    )
+
+
+async def _replace_with_seat_prefs(
+    query_or_message: CallbackQuery | Message, preference: dict | None
+) -> None:
+    """Показать настройки постоянного места с текущими предпочтениями."""
+    if preference is None:
+        status = messages.seat_prefs_empty_text
+    else:
+        status = messages.seat_prefs_status_text.format(
+            seats=", ".join(preference["seat_numbers"]),
+            weekdays=utils.format_weekdays(preference["weekdays"])
+            or messages.seat_prefs_no_weekdays_text,
+        )
+    await utils.safely_replace_message(
+        query_or_message,
+        new_message_type=utils.MessageContentType.TEXT,
+        new_text=messages.seat_prefs_text.format(status=status),
+        new_reply_markup=keyboards.seat_prefs_markup(
+            preference["weekdays"] if preference else None
+        ),
+    )
+
+
+@bot.callback_query_handler(lambda query: query.data == "seat_prefs")
+@decorators.error_query_handler
+async def handle_seat_prefs_query(query: CallbackQuery) -> None:
+    """Обработчик коллбека настроек постоянного места (seat_prefs)"""
+    _, preference = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        SeatAllocationService.get_preference(tg_id=query.from_user.id),
+    )
+    await _replace_with_seat_prefs(query, preference)
+
+
+@bot.callback_query_handler(
+    lambda query: query.data and query.data.startswith("pref_day: ")
+)
+@decorators.error_query_handler
+async def handle_pref_day_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека включения/выключения дня недели
+    в настройках постоянного места (pref_day: weekday)
+    """
+    weekday = int(query.data.split(":")[1].strip())
+    await utils.safely_answer_query(query)
+    preference = await SeatAllocationService.toggle_weekday(
+        tg_id=query.from_user.id, weekday=weekday
+    )
+    await _replace_with_seat_prefs(query, preference)
+
+
+@bot.callback_query_handler(lambda query: query.data == "pref_off")
+@decorators.error_query_handler
+async def handle_pref_off_query(query: CallbackQuery) -> None:
+    """Обработчик коллбека отключения постоянного места (pref_off)"""
+    await utils.safely_answer_query(query)
+    await SeatAllocationService.delete_preference(tg_id=query.from_user.id)
+    await _replace_with_seat_prefs(query, None)
+
+
+@bot.callback_query_handler(lambda query: query.data == "pref_seats")
+@decorators.error_query_handler
+async def handle_pref_seats_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека запроса интерфейса ввода
+    списка постоянных мест (pref_seats)
+    """
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.seat_prefs_forcereply_text.format(
+                max_seats=MAX_PREFERRED_SEATS
+            ),
+            new_reply_markup=keyboards.seat_prefs_forcereply_markup,
+        ),
+    )
+
+
+@bot.message_handler(
+    func=lambda message: message.reply_to_message
+    and message.reply_to_message.text
+    and message.reply_to_message.text.startswith("Введите номера мест")
+)
+@decorators.error_command_handler
+async def handle_pref_seats_input(message: Message) -> None:
+    """
+    Обработчик сообщения со списком постоянных мест
+    (удаляет запрос ввода и показывает настройки постоянного места)
+    """
+    if message.reply_to_message:
+        await utils.safely_delete_message(
+            message.chat.id, message.reply_to_message.message_id
+        )
+    try:
+        seat_numbers = SeatAllocationService.parse_seats(message.text or "")
+    except ValueError:
+        await utils.safely_replace_message(
+            message,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.seat_prefs_invalid_text.format(
+                max_seats=MAX_PREFERRED_SEATS
+            ),
+            new_reply_markup=keyboards.seat_prefs_retry_markup,
+        )
+        return
+
+    preference = await SeatAllocationService.save_seats(
+        tg_id=message.from_user.id, seat_numbers=seat_numbers
+    )
+    await _replace_with_seat_prefs(message, preference)
+
+
 @bot.callback_query_handler(lambda query: query.data == "make_guest_choose_date")
 @decorators.error_query_handler
 async def handle_make_guest_choose_date_query(query: CallbackQuery) -> None:
@@ -544,16 +876,17 @@ async def handle_make_guest_choose_date_query(query: CallbackQuery) -> None:
     Обработчик коллбека запроса дат доступных
     для гостевого бронирования (make_guest_choose_date)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-
-    available_dates = await utils.generate_upcoming_dates()
+    available_dates = CalendarService.upcoming_dates()
     selection_keyboard = keyboards.guest_date_selection_markup(available_dates)
 
-    await utils.safely_replace_message(
-        query,
-        new_message_type=utils.MessageContentType.TEXT,
-        new_text=messages.choose_date_text,
-        new_reply_markup=selection_keyboard,
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.choose_date_text,
+            new_reply_markup=selection_keyboard,
+        ),
     )
 
 
@@ -566,10 +899,14 @@ async def handle_guest_seats_on_query(query: CallbackQuery) -> None:
     Обработчик коллбека запроса мест доступных для гостевого
     бронирования на выбранную дату (guest_seats_on: date)
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     book_date = query.data.split(":")[1].strip()
-    # проверяем что переданная дата есть в списке дат доступных для бронирования для гостевого бронирования
-    available_dates = await BookingService.get_guest_available_dates()
+    # проверяем что переданная дата есть в списке дат доступных для бронирования для гостевого бронирования,
+    # места на дату запрашиваются параллельно с проверкой
+    _, available_dates, available_seats = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        BookingService.get_guest_available_dates(),
+        _get_available_seats_or_none(book_date),
+    )
     if book_date not in [date["timestamp"] for date in available_dates]:
 
         await utils.safely_replace_message(
@@ -581,18 +918,12 @@ async def handle_guest_seats_on_query(query: CallbackQuery) -> None:
         return
 
     # Создаем клавиатуру со свободными местами
-    # file_id = preloaded_images.get("office_map")
-    available_seats = await BookingService.get_available_seats(book_date=book_date)
+    if available_seats is None:
+        available_seats = await BookingService.get_available_seats(book_date=book_date)
     selection_keyboard = keyboards.guest_seat_selection_markup(
-        available_seats, book_date
-    )
-
-    await utils.safely_replace_message(
-        query,
-        new_message_type=utils.MessageContentType.MEDIA,
-        new_text=messages.choose_seat_text,
-        new_reply_markup=selection_keyboard,
+        SeatRegistry.layout().group_by_zone(available_seats), book_date
     )
+    await _replace_with_seat_map(query, available_seats, selection_keyboard)
 
 
 @bot.callback_query_handler(
@@ -605,19 +936,21 @@ async def handle_guest_date_seat_query(query: CallbackQuery) -> None:
     ФИО гостя (нажатие номера места)
     ("guest_date_seat: book_date|seat")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     booking_params = query.data.split(":")[1].strip().split("|")
     book_date, seat_number = booking_params[0], (
         booking_params[1] if booking_params[1] != "no_seat" else None
     )
     # Предлагаем ввести ФИО
 
-    await utils.safely_replace_message(
-        query,
-        new_message_type=utils.MessageContentType.TEXT,
-        new_text=messages.enter_full_name_text,
-        new_reply_markup=keyboards.enter_guest_full_name_markup(
-            book_date, seat_number if seat_number else "no_seat"
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.enter_full_name_text,
+            new_reply_markup=keyboards.enter_guest_full_name_markup(
+                book_date, seat_number if seat_number else "no_seat"
+            ),
         ),
     )
 
@@ -632,7 +965,6 @@ async def handle_write_guest_name_query(query: CallbackQuery) -> None:
     ФИО гостя, создает "техническое сообщение" в чате с номером места и датой
     ("guest_date_seat: book_date|seat")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     booking_params = query.data.split(":")[1].strip().split("|")
     book_date, seat_number = booking_params[0], (
         booking_params[1] if booking_params[1] != "no_seat" else None
@@ -640,14 +972,17 @@ async def handle_write_guest_name_query(query: CallbackQuery) -> None:
 
     # Предлагаем ввести ФИО
 
-    await utils.safely_replace_message(
-        query,
-        new_message_type=utils.MessageContentType.TEXT,
-        new_text=messages.name_forcereply_text.format(
-            book_date=book_date,
-            seat_number=seat_number if seat_number else "no_seat",
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.name_forcereply_text.format(
+                book_date=book_date,
+                seat_number=seat_number if seat_number else "no_seat",
+            ),
+            new_reply_markup=keyboards.name_forcereply_markup,
         ),
-        new_reply_markup=keyboards.name_forcereply_markup,
     )
 
 
@@ -1,10 +1,19 @@
+import datetime
+
 from telebot.types import CallbackQuery, Message
 
 import keyboards
 import messages
 import utils
 from bot import bot, logger
-from services import BookingService, UserService
+from config.settings import settings
+from services import (
+    BookingService,
+    CalendarService,
+    LotteryService,
+    Scheduler,
+    UserService,
+)
 
 from . import decorators
 
@@ -16,13 +25,14 @@ async def handle_admin_options_query(query: CallbackQuery) -> None:
     """
     Обработчик коллбека панели администратора ("admin_options")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-
-    await utils.safely_replace_message(
-        query,
-        new_message_type=utils.MessageContentType.TEXT,
-        new_text=messages.admin_options_text,
-        new_reply_markup=keyboards.admin_options_markup,
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.admin_options_text,
+            new_reply_markup=keyboards.admin_options_markup,
+        ),
     )
 
 
@@ -37,11 +47,13 @@ async def handle_users_w_tg_id_page_query(query: CallbackQuery) -> None:
     с привязанным tg_id, т.е. ФИО зарегистрированных сотрудников
     ("users_w_tg_id_page: page")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     required_page = int(
         query.data.split(":")[1].strip()
     )  # Получаем номер требуемой страницы из callback_data
-    users_w_tg_id = await UserService.get_users_w_tg_id(page=required_page)
+    _, users_w_tg_id = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_users_w_tg_id(page=required_page),
+    )
     selection_keyboard = keyboards.name_w_tg_id_selection_markup(
         users_w_tg_id["users"], users_w_tg_id["page"], users_w_tg_id["total_pages"]
     )
@@ -65,9 +77,11 @@ async def handle_untie_warn_query(query: CallbackQuery) -> None:
     возвращает предупрежедение, не выполняет отвязку
     ("untie_warn: user_id")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     user_id = int(query.data.split(":")[1].strip())
-    user_data = await UserService.get_user_by_user_id(user_id)
+    _, user_data = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_user_id(user_id),
+    )
     full_name = user_data.full_name
 
     await utils.safely_replace_message(
@@ -89,9 +103,11 @@ async def handle_untie_make_query(query: CallbackQuery) -> None:
     удаляет все бронирования пользователя и обнуляет tg_id, chat_id, username в таблице users
     ("untie_make: user_id")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     user_id = int(query.data.split(":")[1].strip())
-    user = await UserService.get_user_by_user_id(user_id)
+    _, user = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_user_id(user_id),
+    )
     full_name = user.full_name
 
     # Отвязываем пользователя
@@ -116,11 +132,13 @@ async def handle_delete_user_page_query(query: CallbackQuery) -> None:
     Обработчик коллбека запроса списка ФИО сотрудников для удаления из системы
     ("delete_user_page: page")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     required_page = int(
         query.data.split(":")[1].strip()
     )  # Получаем номер требуемой страницы из callback_data
-    all_fullnames = await UserService.get_all_fullnames(page=required_page)
+    _, all_fullnames = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_all_fullnames(page=required_page),
+    )
     selection_keyboard = keyboards.fullnames_selection_markup(
         all_fullnames["users"], all_fullnames["page"], all_fullnames["total_pages"]
     )
@@ -144,9 +162,11 @@ async def handle_delete_warn_query(query: CallbackQuery) -> None:
     возвращает предупреждение, не выполняет удаление
     ("delete_warn: user_id")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     user_id = int(query.data.split(":")[1].strip())
-    user_data = await UserService.get_user_by_user_id(user_id)
+    _, user_data = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_user_id(user_id),
+    )
     full_name = user_data.full_name
 
     await utils.safely_replace_message(
@@ -168,9 +188,11 @@ async def handle_delete_make_query(query: CallbackQuery) -> None:
     удаляет все бронирования пользователя и удаляет запись из таблицы users
     ("delete_make: user_id")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
     user_id = int(query.data.split(":")[1].strip())
-    user = await UserService.get_user_by_user_id(user_id)
+    _, user = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        UserService.get_user_by_user_id(user_id),
+    )
     full_name, username = user.full_name, user.username
 
     # Удаляем пользователя
@@ -200,13 +222,14 @@ async def handle_add_user_query(query: CallbackQuery) -> None:
     Обработчик коллбека запроса интерфейса ввода ФИО нового сотрудника
     ("add_user")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-
-    await utils.safely_replace_message(
-        query,
-        new_message_type=utils.MessageContentType.TEXT,
-        new_text=messages.new_user_name_forcereply_text,
-        new_reply_markup=keyboards.name_forcereply_markup,
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.new_user_name_forcereply_text,
+            new_reply_markup=keyboards.name_forcereply_markup,
+        ),
     )
 
 
@@ -249,6 +272,146 @@ async def handle_new_user_input(message: Message) -> None:
     )
 
 
+# максимальный размер загружаемого файла со списком сотрудников
+MAX_ROSTER_FILE_SIZE = 1024 * 1024
+ROSTER_FILE_EXTENSIONS = (".csv", ".txt")
+
+
+@bot.callback_query_handler(lambda query: query.data == "import_users")
+@decorators.error_query_handler
+@decorators.admin_required
+async def handle_import_users_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека загрузки списка сотрудников файлом,
+    предлагает выбрать режим применения списка ("import_users")
+    """
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.import_users_mode_text,
+            new_reply_markup=keyboards.import_users_mode_markup,
+        ),
+    )
+
+
+@bot.callback_query_handler(
+    lambda query: query.data and query.data.startswith("import_users_mode: ")
+)
+@decorators.error_query_handler
+@decorators.admin_required
+async def handle_import_users_mode_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека выбора режима загрузки списка сотрудников,
+    просит прислать файл ответом на сообщение ("import_users_mode: add|sync")
+    """
+    mode = query.data.split(":")[1].strip()
+
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.import_users_forcereply_text.format(mode=mode),
+            new_reply_markup=keyboards.name_forcereply_markup,
+        ),
+    )
+
+
+@bot.message_handler(
+    content_types=["document"],
+    func=lambda message: message.reply_to_message
+    and message.reply_to_message.text
+    and message.reply_to_message.text.startswith(
+        "Отправьте файл со списком сотрудников"
+    ),
+)
+@decorators.error_query_handler
+@decorators.admin_required
+async def handle_import_users_document(message: Message) -> None:
+    """
+    Обработчик файла со списком сотрудников: разбирает файл построчно,
+    применяет изменения одним набором запросов и отвечает отчетом
+    (удаляет сообщение с запросом файла)
+    """
+    mode = message.reply_to_message.text.split("|")[-1].strip()
+    document = message.document
+    file_name = (document.file_name or "").lower()
+
+    if (
+        not file_name.endswith(ROSTER_FILE_EXTENSIONS)
+        or (document.file_size or 0) > MAX_ROSTER_FILE_SIZE
+    ):
+        await utils.safely_replace_message(
+            message,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.import_users_bad_file_text.format(
+                max_size_kb=MAX_ROSTER_FILE_SIZE // 1024
+            ),
+            new_reply_markup=keyboards.to_start_markup,
+        )
+        return
+
+    file_info = await bot.get_file(document.file_id)
+    parsed = utils.parse_roster_file(await bot.download_file(file_info.file_path))
+
+    # пустой файл в режиме синхронизации удалил бы всех сотрудников
+    if not parsed["full_names"]:
+        await utils.safely_replace_message(
+            message,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.import_users_no_names_text,
+            new_reply_markup=keyboards.to_start_markup,
+        )
+        return
+
+    report = await UserService.sync_full_names(
+        parsed["full_names"], prune=mode == "sync"
+    )
+    logger.info(
+        "%s загрузил список сотрудников (%s): добавлено %s, удалено %s",
+        message.from_user.username,
+        mode,
+        len(report["added"]),
+        len(report["removed"]),
+    )
+
+    await utils.run_concurrently(
+        utils.safely_delete_message(
+            message.chat.id, message.reply_to_message.message_id
+        ),
+        utils.safely_replace_message(
+            message,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.prepare_import_report(report, parsed),
+            new_reply_markup=keyboards.to_start_markup,
+        ),
+    )
+
+
+@bot.callback_query_handler(lambda query: query.data == "export_users")
+@decorators.error_query_handler
+@decorators.admin_required
+async def handle_export_users_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека выгрузки списка сотрудников CSV-файлом ("export_users")
+    """
+    _, roster = await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.render_roster_csv(UserService.stream_all_users()),
+    )
+
+    await bot.send_document(
+        query.message.chat.id,
+        document=roster,
+        visible_file_name="users.csv",
+        caption=messages.export_users_caption_text,
+        reply_markup=keyboards.to_start_markup,
+    )
+    await utils.safely_delete_message(query.message.chat.id, query.message.message_id)
+
+
 @bot.callback_query_handler(
     lambda query: query.data and query.data.startswith("see_all_bookings")
 )
@@ -258,50 +421,126 @@ async def handle_see_all_bookings_query(query: CallbackQuery) -> None:
     """
     Обработчик коллбека "посмотреть все будущие бронирования" ("see_all_bookings")
     """
-    await bot.answer_callback_query(callback_query_id=query.id)
-
-    bookings = await BookingService.get_all_future_bookings()
-    if bookings:
-        bookings_text = messages.future_bookings_list_header
-        for booking in bookings:
-            booking_date = utils.format_booking_date(booking["booking_date"])
-            booking_type = utils.get_booking_type_name(booking["type"])
-            seat_number = booking["seat_number"] if booking["seat_number"] else "XX"
-            full_name = (
-                booking["full_name"]
-                if booking["full_name"]
-                else booking["guest_full_name"]
-            )
-            booking_id = booking["booking_id"]
-            bookings_text += messages.future_bookings_list_item.format(
-                booking_id=booking_id,
-                booking_date=booking_date,
-                seat=seat_number,
-                booking_type=booking_type,
-                full_name=full_name,
+    await utils.safely_answer_query(query)
+
+    async def render_bookings():
+        async for booking in BookingService.stream_all_future_bookings():
+            yield booking["booking_id"], messages.future_bookings_list_item.format(
+                booking_id=booking["booking_id"],
+                booking_date=utils.format_booking_date(booking["booking_date"]),
+                seat=booking["seat_number"] if booking["seat_number"] else "XX",
+                booking_type=utils.get_booking_type_name(booking["type"]),
+                full_name=booking["full_name"],
             )
-    else:
-        bookings_text = messages.no_future_booking_text
 
-    text_chunks = utils.split_bookings_html_by_b_tags(
-        bookings_text,
-        bookings_ids=(
-            [booking["booking_id"] for booking in bookings] if bookings else []
-        ),
-    )
-    for text in text_chunks:
+    # Каждый чанк отправляется сразу после заполнения, не дожидаясь остальных
+    chunks_sent = 0
+    async for chunk in utils.chunk_bookings_html(
+        render_bookings(), header=messages.future_bookings_list_header
+    ):
         await bot.send_message(
             query.message.chat.id,
-            text=text["text_part"],
-            reply_markup=(
-                keyboards.delete_booking_by_id_markup(text["bookings_ids"])
-                if bookings
-                else keyboards.to_start_markup
-            ),
+            text=chunk["text_part"],
+            reply_markup=keyboards.delete_booking_by_id_markup(chunk["bookings_ids"]),
+        )
+        chunks_sent += 1
+
+    if not chunks_sent:
+        await bot.send_message(
+            query.message.chat.id,
+            text=messages.no_future_booking_text,
+            reply_markup=keyboards.to_start_markup,
         )
     await utils.safely_delete_message(query.message.chat.id, query.message.message_id)
 
 
+async def _replace_with_lottery_admin(query: CallbackQuery) -> None:
+    """Показать даты окна для объявления и отмены жеребьевки с числом заявок."""
+    pending = await LotteryService.load()
+    # на сегодня прием заявок закончился еще вчера
+    dates = CalendarService.upcoming_dates()[1:]
+    await utils.safely_replace_message(
+        query,
+        new_message_type=utils.MessageContentType.TEXT,
+        new_text=messages.lottery_admin_text.format(
+            cutoff_hour=settings.LOTTERY_CUTOFF_HOUR
+        ),
+        new_reply_markup=keyboards.lottery_admin_markup(
+            dates,
+            {
+                lottery["booking_date"].isoformat(): lottery["requests"]
+                for lottery in pending
+            },
+        ),
+    )
+
+
+@bot.callback_query_handler(lambda query: query.data == "lottery_admin")
+@decorators.error_query_handler
+@decorators.admin_required
+async def handle_lottery_admin_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека управления жеребьевками мест ("lottery_admin")
+    """
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        _replace_with_lottery_admin(query),
+    )
+
+
+@bot.callback_query_handler(
+    lambda query: query.data and query.data.startswith("lottery_toggle: ")
+)
+@decorators.error_query_handler
+@decorators.admin_required
+async def handle_lottery_toggle_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека объявления или отмены жеребьевки мест на дату
+    ("lottery_toggle: date")
+    """
+    book_date = query.data.split(":")[1].strip()
+    book_date_obj = datetime.datetime.strptime(book_date, "%Y-%m-%d").date()
+    try:
+        opened = await LotteryService.toggle(book_date_obj)
+        text = (
+            messages.lottery_opened_text if opened else messages.lottery_cancelled_text
+        )
+        logger.info(
+            "%s %s жеребьевку на %s",
+            query.from_user.username,
+            "объявил" if opened else "отменил",
+            book_date,
+        )
+    except ValueError:
+        text = messages.lottery_closed_text
+    await utils.run_concurrently(
+        utils.safely_answer_query(
+            query,
+            text=text.format(book_date=utils.format_booking_date(book_date_obj)),
+        ),
+        _replace_with_lottery_admin(query),
+    )
+
+
+@bot.callback_query_handler(lambda query: query.data == "jobs_admin")
+@decorators.error_query_handler
+@decorators.admin_required
+async def handle_jobs_admin_query(query: CallbackQuery) -> None:
+    """
+    Обработчик коллбека просмотра фоновых задач с последним запуском ("jobs_admin")
+    """
+    jobs = await Scheduler.get_overview()
+    await utils.run_concurrently(
+        utils.safely_answer_query(query),
+        utils.safely_replace_message(
+            query,
+            new_message_type=utils.MessageContentType.TEXT,
+            new_text=messages.prepare_jobs_overview(jobs),
+            new_reply_markup=keyboards.jobs_admin_markup,
+        ),
+    )
+
+
 @bot.callback_query_handler(func=lambda query: True)
 @decorators.error_query_handler
 async def handle_unknown_query(query: CallbackQuery) -> None:
@@ -2,6 +2,7 @@ from telebot import util
 from telebot.types import ForceReply, InlineKeyboardButton, InlineKeyboardMarkup
 
 from db.models import User
+from utils.dates import weekdays_short_ru
 
 
 def name_selection_markup(
@@ -55,6 +56,8 @@ start_markup = util.quick_markup(
             "callback_data": "see_colleagues_bookings_choose_date"
         },
         "🚶‍➡️ Оформить гостя": {"callback_data": "make_guest_choose_date"},
+        "📌 Постоянное место": {"callback_data": "seat_prefs"},
+        "☀️ Утренняя сводка": {"callback_data": "digest_settings"},
     },
     row_width=1,
 )
@@ -67,6 +70,8 @@ start_markup_admin = util.quick_markup(
             "callback_data": "see_colleagues_bookings_choose_date"
         },
         "🚶‍➡️ Оформить гостя": {"callback_data": "make_guest_choose_date"},
+        "📌 Постоянное место": {"callback_data": "seat_prefs"},
+        "☀️ Утренняя сводка": {"callback_data": "digest_settings"},
         "🧑‍💻 Панель администратора": {"callback_data": "admin_options"},
     },
     row_width=1,
@@ -78,11 +83,44 @@ to_start_markup = util.quick_markup(
 )
 
 
-def date_selection_markup(available_dates: list[dict]) -> InlineKeyboardMarkup:
+def digest_settings_markup(
+    send_hours: list[int], current_hour: int | None
+) -> InlineKeyboardMarkup:
+    """Сформировать клавиатуру выбора времени утренней сводки (текущее отмечено)"""
+    keyboard = InlineKeyboardMarkup()
+    keyboard.row(
+        *(
+            InlineKeyboardButton(
+                f"✅ {hour}:00" if hour == current_hour else f"{hour}:00",
+                callback_data=f"digest_hour: {hour}",
+            )
+            for hour in send_hours
+        )
+    )
+    if current_hour is not None:
+        keyboard.row(
+            InlineKeyboardButton("🔕 Отключить сводку", callback_data="digest_off")
+        )
+    keyboard.row(InlineKeyboardButton("⏪ В начало", callback_data="to_start"))
+
+    return keyboard
+
+
+digest_markup = util.quick_markup(
+    {"⚙️ Настроить сводку": {"callback_data": "digest_settings"}}, row_width=1
+)
+
+
+def date_selection_markup(
+    available_dates: list[dict], lottery_dates: frozenset = frozenset()
+) -> InlineKeyboardMarkup:
     """Сформировать клавиатуру под список  дат для просмотра мест доступных для бронирования на дату"""
     buttons = {}
     for date in available_dates:
         date_name = date["formatted"]
+        # места на дату разыгрываются в жеребьевке
+        if date["date_obj"] in lottery_dates:
+            date_name = f"🎲 {date_name}"
         button = {"callback_data": f"seats_on: {date['timestamp']}"}
         buttons[date_name] = button
 
@@ -119,12 +157,114 @@ def no_seats_markup(book_date) -> InlineKeyboardMarkup:
             "👀 Кто идёт в эту дату": {
                 "callback_data": f"see_colleagues_on: {book_date}"
             },
+            "🔔 Сообщить, когда освободится место": {
+                "callback_data": f"watch_date: {book_date}"
+            },
+            "⏪ В начало": {"callback_data": "to_start"},
+        },
+        row_width=1,
+    )
+
+
+def seat_freed_markup(book_date, seat_number) -> InlineKeyboardMarkup:
+    """Сформировать клавиатуру под уведомление об освободившемся месте"""
+    return util.quick_markup(
+        {
+            f"🪑 Забронировать место {seat_number}": {
+                "callback_data": f"book_date_seat: {book_date}|{seat_number}"
+            },
+            "⏪ В начало": {"callback_data": "to_start"},
+        },
+        row_width=1,
+    )
+
+
+seat_allocated_markup = util.quick_markup(
+    {
+        "⚙️ Управлять моими бронированиями": {"callback_data": "manage_my_bookings"},
+        "📌 Постоянное место": {"callback_data": "seat_prefs"},
+    },
+    row_width=1,
+)
+
+
+def seat_allocation_missed_markup(book_date) -> InlineKeyboardMarkup:
+    """Сформировать клавиатуру под ситуацию когда постоянные места на дату заняты"""
+    return util.quick_markup(
+        {
+            "🪑 Выбрать другое место": {"callback_data": f"seats_on: {book_date}"},
+            "🔔 Сообщить, когда освободится место": {
+                "callback_data": f"watch_date: {book_date}"
+            },
+            "⏪ В начало": {"callback_data": "to_start"},
+        },
+        row_width=1,
+    )
+
+
+def seat_prefs_markup(weekdays: int | None) -> InlineKeyboardMarkup:
+    """
+    Сформировать клавиатуру настроек постоянного места: дни недели
+    (выбранные отмечены) и изменение списка мест (weekdays=None - места не выбраны)
+    """
+    keyboard = InlineKeyboardMarkup()
+    if weekdays is not None:
+        day_buttons = [
+            InlineKeyboardButton(
+                f"✅ {name}" if weekdays & (1 << i) else name,
+                callback_data=f"pref_day: {i}",
+            )
+            for i, name in enumerate(weekdays_short_ru)
+        ]
+        keyboard.row(*day_buttons[:5])
+        keyboard.row(*day_buttons[5:])
+        keyboard.row(
+            InlineKeyboardButton("✏️ Изменить места", callback_data="pref_seats")
+        )
+        keyboard.row(InlineKeyboardButton("🗑 Отключить", callback_data="pref_off"))
+    else:
+        keyboard.row(
+            InlineKeyboardButton("✏️ Выбрать места", callback_data="pref_seats")
+        )
+    keyboard.row(InlineKeyboardButton("⏪ В начало", callback_data="to_start"))
+
+    return keyboard
+
+
+seat_prefs_forcereply_markup = ForceReply(input_field_placeholder="12, 14, 3")
+
+seat_prefs_retry_markup = util.quick_markup(
+    {
+        "✏️ Ввести еще раз": {"callback_data": "pref_seats"},
+        "⏪ В начало": {"callback_data": "to_start"},
+    },
+    row_width=1,
+)
+
+
+def lottery_markup(book_date) -> InlineKeyboardMarkup:
+    """Сформировать клавиатуру под жеребьевку мест на дату"""
+    return util.quick_markup(
+        {
+            "🎲 Участвовать в жеребьевке": {
+                "callback_data": f"lottery_join: {book_date}"
+            },
+            "🚫 Отозвать заявку": {"callback_data": f"lottery_leave: {book_date}"},
             "⏪ В начало": {"callback_data": "to_start"},
         },
         row_width=1,
     )
 
 
+lottery_result_markup = util.quick_markup(
+    {
+        "⚙️ Управлять моими бронированиями": {"callback_data": "manage_my_bookings"},
+        "⏪ В начало": {"callback_data": "to_start"},
+    },
+    row_width=1,
+)
+
+
 def seat_is_occupied_markup(book_date) -> InlineKeyboardMarkup:
     """Сформировать клавиатуру под ситуацию когда бронироавшееся место уже занято"""
     return util.quick_markup(
@@ -142,18 +282,37 @@ def seat_is_occupied_markup(book_date) -> InlineKeyboardMarkup:
     )
 
 
-def seat_selection_markup(
-    available_seats: list[str], book_date: str
+def _seat_buttons_by_zone(
+    seat_groups: dict[str | None, list[str]], callback_prefix: str
 ) -> InlineKeyboardMarkup:
     """
-    Сформировать клавиатуру под список мест для бронирования на дату
+    Сформировать клавиатуру с местами, сгруппированными по зонам:
+    если зон больше одной, перед местами каждой зоны идет строка-заголовок
     """
-    buttons = {}
-    for seat in available_seats:
-        button = {"callback_data": f"book_date_seat: {book_date}|{seat}"}
-        buttons[seat] = button
+    keyboard = InlineKeyboardMarkup(row_width=3)
+    show_zones = len(seat_groups) > 1 or None not in seat_groups
+    for zone, seats in seat_groups.items():
+        if show_zones:
+            keyboard.row(
+                InlineKeyboardButton(f"📍 {zone or 'Без зоны'}", callback_data="ignore")
+            )
+        keyboard.add(
+            *[
+                InlineKeyboardButton(seat, callback_data=f"{callback_prefix}{seat}")
+                for seat in seats
+            ]
+        )
 
-    keyboard = util.quick_markup(buttons, row_width=3)
+    return keyboard
+
+
+def seat_selection_markup(
+    seat_groups: dict[str | None, list[str]], book_date: str
+) -> InlineKeyboardMarkup:
+    """
+    Сформировать клавиатуру под сгруппированный по зонам список мест для бронирования на дату
+    """
+    keyboard = _seat_buttons_by_zone(seat_groups, f"book_date_seat: {book_date}|")
     keyboard.row(InlineKeyboardButton("⬅️ В начало", callback_data="to_start"))
 
     return keyboard
@@ -245,17 +404,12 @@ def no_guest_seats_markup(book_date) -> InlineKeyboardMarkup:
 
 
 def guest_seat_selection_markup(
-    available_seats: list[str], book_date: str
+    seat_groups: dict[str | None, list[str]], book_date: str
 ) -> InlineKeyboardMarkup:
     """
-    Сформировать клавиатуру под список мест для гостевого бронирования на дату
+    Сформировать клавиатуру под сгруппированный по зонам список мест для гостевого бронирования на дату
     """
-    buttons = {}
-    for seat in available_seats:
-        button = {"callback_data": f"guest_date_seat: {book_date}|{seat}"}
-        buttons[seat] = button
-
-    keyboard = util.quick_markup(buttons, row_width=3)
+    keyboard = _seat_buttons_by_zone(seat_groups, f"guest_date_seat: {book_date}|")
     keyboard.row(InlineKeyboardButton("⬅️ В начало", callback_data="to_start"))
 
     return keyboard
@@ -283,13 +437,46 @@ admin_options_markup = util.quick_markup(
         "Отвязать ФИО сотрудника от tg_id": {"callback_data": "users_w_tg_id_page: 0"},
         "Удалить сотрудника": {"callback_data": "delete_user_page: 0"},
         "Добавить сотрудника": {"callback_data": "add_user"},
+        "Загрузить список сотрудников": {"callback_data": "import_users"},
+        "Выгрузить список сотрудников": {"callback_data": "export_users"},
         "Удалить бронирование": {"callback_data": "see_all_bookings"},
+        "🎲 Жеребьевка мест": {"callback_data": "lottery_admin"},
+        "🕒 Фоновые задачи": {"callback_data": "jobs_admin"},
         "⏪ В начало": {"callback_data": "to_start"},
     },
     row_width=1,
 )
 
 
+def lottery_admin_markup(
+    dates: list[dict], pending: dict[str, int]
+) -> InlineKeyboardMarkup:
+    """
+    Сформировать клавиатуру дат для объявления и отмены жеребьевки
+    (pending - число заявок по датам с непроведенной жеребьевкой)
+    """
+    buttons = {}
+    for date in dates:
+        date_name = date["formatted"]
+        if date["timestamp"] in pending:
+            date_name = f"🎲 {date_name} ({pending[date['timestamp']]})"
+        buttons[date_name] = {"callback_data": f"lottery_toggle: {date['timestamp']}"}
+
+    keyboard = util.quick_markup(buttons, row_width=2)
+    keyboard.row(InlineKeyboardButton("⏪ Назад", callback_data="admin_options"))
+
+    return keyboard
+
+
+jobs_admin_markup = util.quick_markup(
+    {
+        "🔄 Обновить": {"callback_data": "jobs_admin"},
+        "⏪ Назад": {"callback_data": "admin_options"},
+    },
+    row_width=1,
+)
+
+
 def name_w_tg_id_selection_markup(
     users_w_tg_id: list[User], page: int = 0, total_pages: int = 0
 ) -> InlineKeyboardMarkup:
@@ -384,3 +571,13 @@ def delete_warn_markup(user_id) -> InlineKeyboardMarkup:
         },
         row_width=1,
     )
+
+
+import_users_mode_markup = util.quick_markup(
+    {
+        "➕ Только добавить новых": {"callback_data": "import_users_mode: add"},
+        "🔄 Синхронизировать со списком": {"callback_data": "import_users_mode: sync"},
+        "⏪ Назад": {"callback_data": "admin_options"},
+    },
+    row_width=1,
+)
@@ -44,6 +44,123 @@ no_seats_text = formatting.format_text(
     separator="",
 )
 
+seat_watch_added_text = "🔔 Сообщим, как только на {book_date} освободится место"
+
+seat_watch_exists_text = "🔔 Вы уже ждете место на {book_date}"
+
+seat_freed_text = formatting.format_text(
+    "🎉 Освободилось место ",
+    formatting.hbold("{seat}"),
+    " на ",
+    formatting.hbold("{book_date}"),
+    "!\n\n",
+    "Оно закреплено за вами на {hold_minutes} мин., ",
+    "потом его предложат следующему в очереди.",
+    separator="",
+)
+
+seat_allocated_text = formatting.format_text(
+    "📌 По вашим постоянным предпочтениям на ",
+    formatting.hbold("{book_date}"),
+    " забронировано место ",
+    formatting.hbold("{seat}"),
+    ".",
+    separator="",
+)
+
+seat_allocation_missed_text = formatting.format_text(
+    "😕 На ",
+    formatting.hbold("{book_date}"),
+    " все ваши постоянные места (",
+    "{seats}",
+    ") уже заняты.\n\n",
+    "Можно выбрать другое место или дождаться, пока освободится одно из них.",
+    separator="",
+)
+
+seat_prefs_text = formatting.format_text(
+    "📌 Постоянное место\n\n",
+    "Когда открывается запись на новую дату, бот сам бронирует первое свободное ",
+    "место из вашего списка в выбранные дни. Если место нужно нескольким ",
+    "сотрудникам, первым его получает тот, кто дольше его не получал.\n\n",
+    "{status}",
+    separator="",
+)
+
+seat_prefs_status_text = formatting.format_text(
+    "Места: ",
+    formatting.hbold("{seats}"),
+    "\nДни: ",
+    formatting.hbold("{weekdays}"),
+    separator="",
+)
+
+seat_prefs_empty_text = "Места пока не выбраны."
+
+seat_prefs_no_weekdays_text = "не выбраны"
+
+seat_prefs_forcereply_text = formatting.format_text(
+    "Введите номера мест через запятую в порядке предпочтения ",
+    "(не больше {max_seats}).\n\n",
+    "Пример: ",
+    formatting.hbold("12, 14, 3"),
+    separator="",
+)
+
+seat_prefs_invalid_text = (
+    "Таких мест нет или их больше {max_seats}. Проверьте номера и попробуйте еще раз."
+)
+
+lottery_text = formatting.format_text(
+    "🎲 Места на ",
+    formatting.hbold("{book_date}"),
+    " разыгрываются\n\n",
+    "Заявки принимаются до ",
+    formatting.hbold("{cutoff}"),
+    ". После этого бот проведет жеребьевку: чем реже вы были в офисе ",
+    "в последние недели, тем выше шансы. Получившие место узнают его номер, ",
+    "остальные будут записаны в офис без места и встанут в очередь ожидания ",
+    "места в порядке жеребьевки.",
+    separator="",
+)
+
+lottery_joined_text = "🎲 Заявка на {book_date} принята"
+
+lottery_already_joined_text = "🎲 Вы уже участвуете в жеребьевке на {book_date}"
+
+lottery_left_text = "Заявка на {book_date} отозвана"
+
+lottery_not_joined_text = "У вас нет заявки на {book_date}"
+
+lottery_closed_text = "Прием заявок на {book_date} закончен"
+
+lottery_won_text = formatting.format_text(
+    "🎉 По итогам жеребьевки на ",
+    formatting.hbold("{book_date}"),
+    " вам досталось место ",
+    formatting.hbold("{seat}"),
+    ".",
+    separator="",
+)
+
+lottery_lost_text = formatting.format_text(
+    "🎲 По итогам жеребьевки на ",
+    formatting.hbold("{book_date}"),
+    " место не досталось.\n\n",
+    "Вы записаны в офис без места и стоите ",
+    formatting.hbold("{position}-м"),
+    " в очереди ожидания: если место освободится, бот предложит его.",
+    separator="",
+)
+
+lottery_lost_unqueued_text = formatting.format_text(
+    "🎲 По итогам жеребьевки на ",
+    formatting.hbold("{book_date}"),
+    " место не досталось.\n\n",
+    "Вы записаны в офис без места.",
+    separator="",
+)
+
 seat_is_occupied_text = formatting.format_text(
     "⛔ Это место только что заняли.\n\n",
     "Выберите другое место или приходите без бронирования.",
@@ -122,6 +239,56 @@ def prepare_error_caption(e: Exception) -> str:
     )
 
 
+error_digest_header_text = formatting.format_text(
+    formatting.hbold("⛔ Сводка ошибок"),
+    "\n\nОшибок: {count}, видов: {kinds}\n",
+    "🕒 {first_seen} — {last_seen}",
+    separator="",
+)
+
+error_digest_item_text = formatting.format_text(
+    formatting.hbold("{count}×"),
+    " {exception_type}\n",
+    "📍 {location}\n",
+    "💬 {message}\n",
+    "🕒 {first_seen} — {last_seen}",
+    separator="",
+)
+
+# сколько групп ошибок максимум перечислять в сводке (остальные - в файле)
+error_digest_list_limit = 10
+error_digest_message_limit = 200
+
+
+def prepare_error_digest(groups: list[dict]) -> str:
+    """Генерирует сводку ошибок, сгруппированных по отпечатку (см. ErrorDigest)."""
+    text = error_digest_header_text.format(
+        count=sum(group["count"] for group in groups),
+        kinds=len(groups),
+        first_seen=min(group["first_seen"] for group in groups),
+        last_seen=max(group["last_seen"] for group in groups),
+    )
+
+    shown = groups[:error_digest_list_limit]
+    for group in shown:
+        text += "\n\n" + error_digest_item_text.format(
+            count=group["count"],
+            exception_type=formatting.escape_html(group["exception_type"]),
+            location=formatting.escape_html(group["location"]),
+            message=formatting.escape_html(
+                group["message"][:error_digest_message_limit]
+            ),
+            first_seen=group["first_seen"],
+            last_seen=group["last_seen"],
+        )
+    if len(groups) > len(shown):
+        text += f"\n\n... и еще {len(groups) - len(shown)} видов, подробности в файле"
+
+    return text
+
+
+overloaded_text = "⏳ Сейчас много запросов, попробуйте еще раз через пару секунд."
+
 succesfull_booking_delete_text = "Бронирование было успешно удалено 🤟"
 
 see_colleagues_bookings_choose_date_text = (
@@ -147,6 +314,30 @@ no_visitors_text = "На эту дату нет посетителей. 💭"
 
 no_visitors_at_all_text = "Никто не собирается в офис в ближайшие 2 недели. 💭"
 
+digest_header_text = formatting.format_text(
+    "☀️ Доброе утро! Сегодня (<b>{book_date}</b>) в офисе будут\n\n", separator=""
+)
+
+digest_settings_text = formatting.format_text(
+    "☀️ Утренняя сводка\n\n",
+    "Каждое утро бот пришлет список тех, кто придет в офис сегодня ",
+    "(в дни, когда в офисе никого не будет, сводка не приходит).\n\n",
+    "{status}",
+    separator="",
+)
+
+digest_status_on_text = formatting.format_text(
+    "Сейчас: ", formatting.hbold("каждый день в {send_hour}:00"), separator=""
+)
+
+digest_status_off_text = formatting.format_text(
+    "Сейчас: ", formatting.hbold("выключена"), ". Выберите время:", separator=""
+)
+
+digest_subscribed_text = "🔔 Сводка будет приходить в {send_hour}:00"
+
+digest_unsubscribed_text = "🔕 Сводка отключена"
+
 enter_full_name_text = formatting.format_text(
     "Введите ФИО гостя. \n",
     formatting.hbold("Три слова через пробел c большой буквы. \n\n"),
@@ -176,6 +367,80 @@ no_guest_seats_text = formatting.format_text(
 
 admin_options_text = "🧑‍💻 Панель администратора\n\nВыберите действие:"
 
+lottery_admin_text = formatting.format_text(
+    "🎲 Жеребьевка мест\n\n",
+    "На отмеченные даты места разыгрываются: заявки принимаются ",
+    "до {cutoff_hour}:00 накануне, бронировать места до жеребьевки нельзя. ",
+    "В скобках - число заявок.\n\n",
+    "Нажмите на дату, чтобы объявить или отменить жеребьевку.",
+    separator="",
+)
+
+lottery_opened_text = "🎲 Жеребьевка на {book_date} объявлена"
+
+lottery_cancelled_text = "Жеребьевка на {book_date} отменена"
+
+jobs_admin_header_text = formatting.format_text(
+    "🕒 Фоновые задачи\n\n",
+    "Время московское, задачу выполняет одна из реплик бота.",
+    separator="",
+)
+
+jobs_admin_item_text = formatting.format_text(
+    formatting.hbold("{name}"),
+    " ({spec})\n",
+    "Последний запуск: {started_at}, {duration} — {status}\n",
+    "{detail}",
+    "Следующий запуск: {next_run}",
+    separator="",
+)
+
+jobs_admin_never_run_text = formatting.format_text(
+    formatting.hbold("{name}"),
+    " ({spec})\n",
+    "Еще не запускалась\n",
+    "Следующий запуск: {next_run}",
+    separator="",
+)
+
+job_statuses = {"ok": "✅ успешно", "error": "⛔ ошибка", "running": "⏳ выполняется"}
+
+
+def prepare_jobs_overview(jobs: list[dict]) -> str:
+    """Генерирует список фоновых задач с последним запуском (см. Scheduler)."""
+    moscow_tz = ZoneInfo("Europe/Moscow")
+
+    def format_time(moment: datetime | None) -> str:
+        return (
+            moment.astimezone(moscow_tz).strftime("%d.%m %H:%M:%S") if moment else "—"
+        )
+
+    text = jobs_admin_header_text
+    for job in jobs:
+        last_run = job["last_run"]
+        if last_run is None:
+            text += "\n\n" + jobs_admin_never_run_text.format(
+                name=job["name"],
+                spec=job["spec"],
+                next_run=format_time(job["next_run"]),
+            )
+            continue
+        duration = last_run["duration_ms"]
+        text += "\n\n" + jobs_admin_item_text.format(
+            name=job["name"],
+            spec=job["spec"],
+            started_at=format_time(last_run["started_at"]),
+            duration=f"{duration / 1000:.1f} с" if duration is not None else "—",
+            status=job_statuses.get(last_run["status"], last_run["status"]),
+            detail=(
+                f"💬 {formatting.escape_html(last_run['detail'][:200])}\n"
+                if last_run["detail"]
+                else ""
+            ),
+            next_run=format_time(job["next_run"]),
+        )
+    return text
+
 
 users_w_tg_id_page_selection_text = (
     "Выберите сотрудника которого нужно отвязать от tg_id"
@@ -220,6 +485,81 @@ new_user_success_text = formatting.format_text(
     "Пользователь ", formatting.hbold("{full_name}"), "добавлен в систему"
 )
 
+import_users_mode_text = formatting.format_text(
+    "📄 Загрузка списка сотрудников из CSV/TXT-файла\n\n",
+    formatting.hbold("Только добавить новых"),
+    " - ФИО из файла, которых еще нет в системе, будут добавлены.\n\n",
+    formatting.hbold("Синхронизировать со списком"),
+    " - дополнительно будут удалены сотрудники, которых нет в файле, ",
+    "вместе со всеми их бронированиями.",
+    separator="",
+)
+
+import_users_forcereply_text = formatting.format_text(
+    "Отправьте файл со списком сотрудников ответом на это сообщение.\n\n",
+    "CSV или TXT, по одному ФИО в строке (в CSV - в первой колонке).\n\n",
+    " | ",
+    "{mode}",
+    separator="",
+)
+
+import_users_bad_file_text = (
+    "Файл не подходит: нужен CSV или TXT-файл размером до {max_size_kb} КБ."
+)
+
+import_users_no_names_text = (
+    "В файле не найдено ни одного корректного ФИО, список сотрудников не изменен."
+)
+
+import_users_report_text = formatting.format_text(
+    formatting.hbold("📄 Список сотрудников загружен"),
+    "\n\nФИО в файле: {parsed}\n",
+    "Добавлено: {added}\n",
+    "Удалено: {removed}\n",
+    "Повторов в файле: {duplicates}\n",
+    "Некорректных строк: {invalid}\n",
+    "Всего сотрудников: {total}",
+    separator="",
+)
+
+# сколько ФИО/строк максимум перечислять в отчете об импорте
+import_users_report_list_limit = 30
+
+
+def prepare_import_report(report: dict, parsed: dict) -> str:
+    """Генерирует отчет об импорте списка сотрудников."""
+    text = import_users_report_text.format(
+        parsed=len(parsed["full_names"]),
+        added=len(report["added"]),
+        removed=len(report["removed"]),
+        duplicates=parsed["duplicates"],
+        invalid=len(parsed["invalid"]),
+        total=report["total"],
+    )
+
+    sections = (
+        ("➕ Добавлены", report["added"]),
+        ("➖ Удалены", report["removed"]),
+        (
+            "⚠️ Некорректные строки",
+            [f"{line_no}: {value}" for line_no, value in parsed["invalid"]],
+        ),
+    )
+    for title, items in sections:
+        if not items:
+            continue
+        shown = items[:import_users_report_list_limit]
+        text += f"\n\n{formatting.hbold(title)}:\n" + "\n".join(
+            formatting.escape_html(item) for item in shown
+        )
+        if len(items) > len(shown):
+            text += f"\n... и еще {len(items) - len(shown)}"
+
+    return text
+
+
+export_users_caption_text = "📄 Текущий список сотрудников"
+
 
 future_bookings_list_header = formatting.format_text(
     "Активные бронирования:\n\n", separator=""
@@ -0,0 +1,89 @@
+"""
+Быстрый бенчмарк сервисов на хранилище в памяти, без БД:
+
+    python scripts/bench_services.py 2000     # итераций на сценарий
+
+Контракт хранилищ проверяется тестами: python -m pytest tests/test_storage_contract.py
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Добавляем корневую директорию в путь для импортов
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import BookingConflictError, BookingService, UserService, set_storage
+from services.storage import Storage
+
+
+async def run_bench(storage: Storage, iterations: int, seats: int = 60) -> None:
+    """
+    Замерить основные сценарии сервисов на хранилище, заполненном
+    seats * 2 сотрудниками, каждый из которых бронирует место на часть дат окна.
+    """
+    from services import CalendarService, SeatLayout, SeatRegistry
+
+    set_storage(storage)
+    SeatRegistry._layout = SeatLayout(
+        [{"seat_index": i, "seat_number": str(i + 1)} for i in range(seats)]
+    )
+    dates = CalendarService.upcoming_dates()
+
+    report = await UserService.sync_full_names(
+        [f"Сотрудник Бенчмарк {i}" for i in range(seats * 2)]
+    )
+    user_ids = [u.id for u in (await storage.users.get_page(None, 0, 10**6))[0]]
+    for i, user_id in enumerate(user_ids):
+        await storage.users.update(user_id, f"user_{i}", 10**6 + i, 10**6 + i)
+        for date in dates[i % 2 :: 2]:
+            try:
+                await BookingService.create_booking(
+                    booking_date=date["date_obj"],
+                    user_id=user_id,
+                    seat_number=str(i % seats + 1),
+                    booking_type="personal",
+                    guest_full_name=None,
+                )
+            except BookingConflictError:
+                pass
+
+    scenarios = {
+        "get_available_dates": lambda i: BookingService.get_available_dates(
+            10**6 + i % len(user_ids)
+        ),
+        "get_guest_available_dates": lambda i: BookingService.get_guest_available_dates(),
+        "get_visitors_by_date": lambda i: BookingService.get_visitors_by_date(
+            dates[i % len(dates)]["date_obj"]
+        ),
+        "get_users_wo_tg_id": lambda i: UserService.get_users_wo_tg_id(0),
+    }
+    print(
+        f"{len(report['added'])} users, {seats} seats, "
+        f"{iterations} iterations per scenario"
+    )
+    for name, scenario in scenarios.items():
+        started = time.perf_counter()
+        for i in range(iterations):
+            await scenario(i)
+        elapsed = time.perf_counter() - started
+        print(f"    {name:28} {elapsed / iterations * 1e6:9.1f} us/op")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "iterations", type=int, nargs="?", default=1000, help="итераций на сценарий"
+    )
+    args = parser.parse_args()
+
+    from services.storage.memory import MemoryStorage
+
+    asyncio.run(run_bench(MemoryStorage(), args.iterations))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
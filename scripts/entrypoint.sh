@@ -22,6 +22,10 @@ python /app/scripts/init_tables.py
 # Даем время на завершение создания таблиц
 sleep 2
 
+# Синхронизируем реестр мест с EXISTING_SEATS_LIST
+echo "Initializing seats registry..."
+python /app/scripts/init_seats.py
+
 # Проверяем существование таблицы users перед инициализацией
 echo "Checking if users table exists..."
 if pg_isready -h "${DB_HOST}" -p "${DB_PORT}"; then
@@ -31,7 +35,12 @@ if pg_isready -h "${DB_HOST}" -p "${DB_PORT}"; then
         # Инициализируем пользователей
         if [ "$INIT_USERS" = "true" ]; then
             echo "Initializing users from USERS_LIST..."
-            python /app/scripts/init_users.py
+            # INIT_USERS_PRUNE=true - удалить сотрудников, которых нет в USERS_LIST
+            if [ "$INIT_USERS_PRUNE" = "true" ]; then
+                python /app/scripts/init_users.py --prune
+            else
+                python /app/scripts/init_users.py
+            fi
         fi
     else
         echo "ERROR: Users table does not exist! Skipping user initialization."
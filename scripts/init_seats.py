@@ -0,0 +1,71 @@
+import asyncio
+import os
+import sys
+
+# Добавляем корневую директорию в путь для импортов
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, select
+
+from config.settings import settings
+from db.database import get_sessionmaker
+from db.models import Seat
+
+
+async def init_seats():
+    """
+    Синхронизирует реестр мест (таблица seats) с settings.EXISTING_SEATS_LIST:
+    новые места получают следующий свободный seat_index (индексы не переиспользуются),
+    места, которых нет в списке, помечаются неактивными, зоны берутся из settings.SEAT_ZONES,
+    координаты на карте офиса - из settings.SEAT_COORDINATES (в attributes).
+    """
+    print("Checking and initializing seats from EXISTING_SEATS_LIST...")
+
+    async with get_sessionmaker()() as session:
+        try:
+            result = await session.execute(select(Seat))
+            existing_seats = {seat.seat_number: seat for seat in result.scalars().all()}
+            max_index_result = await session.execute(select(func.max(Seat.seat_index)))
+            # max = 0 (одно место) - занятый индекс, а не пустая таблица
+            max_index = max_index_result.scalar()
+            next_index = 0 if max_index is None else max_index + 1
+
+            for seat_number in settings.EXISTING_SEATS_LIST:
+                zone = settings.SEAT_ZONES.get(seat_number)
+                coordinates = settings.SEAT_COORDINATES.get(seat_number)
+                seat = existing_seats.pop(seat_number, None)
+                if seat is None:
+                    session.add(
+                        Seat(
+                            seat_index=next_index,
+                            seat_number=seat_number,
+                            zone=zone,
+                            attributes=coordinates or {},
+                        )
+                    )
+                    print(f"Adding seat: {seat_number} (index {next_index})")
+                    next_index += 1
+                    continue
+
+                seat.is_active = True
+                if zone is not None:
+                    seat.zone = zone
+                if coordinates is not None:
+                    seat.attributes = {**(seat.attributes or {}), **coordinates}
+
+            for seat in existing_seats.values():
+                if seat.is_active:
+                    seat.is_active = False
+                    print(f"Deactivating seat: {seat.seat_number}")
+
+            await session.commit()
+            print("Seats registry is in sync with EXISTING_SEATS_LIST")
+
+        except Exception as e:
+            print(f"Error initializing seats: {e}")
+            await session.rollback()
+            raise
+
+
+if __name__ == "__main__":
+    asyncio.run(init_seats())
@@ -9,8 +9,18 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy import text
 
-from db.database import Base, engine
-from db.models import Booking, User
+from db.database import Base, get_engine
+from db.models import (
+    Booking,
+    DigestSubscription,
+    JobRun,
+    LotteryDate,
+    LotteryRequest,
+    Seat,
+    SeatPreference,
+    SeatWatch,
+    User,
+)
 
 
 async def init_database():
@@ -19,7 +29,7 @@ async def init_database():
 
     try:
         # Создаем все таблицы
-        async with engine.begin() as conn:
+        async with get_engine().begin() as conn:
             print("Creating tables...")
             whoami = await conn.execute(text("SELECT current_user, session_user"))
             print("Connected as:", list(whoami))
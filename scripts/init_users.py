@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import os
 import sys
@@ -5,57 +6,48 @@ import sys
 # Добавляем корневую директорию в путь для импортов
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import select
-from sqlalchemy.exc import IntegrityError
-
 from config.settings import settings
-from db.database import AsyncSessionLocal, engine
-from db.models import User
+from services.user_service import UserService
 
 
-async def init_users():
-    """Инициализирует пользователей в БД из settings.USERS_LIST"""
+async def init_users(prune: bool = False, dry_run: bool = False):
+    """
+    Синхронизирует пользователей в БД с settings.USERS_LIST одним набором запросов
+    (см. UserService.sync_full_names): новые ФИО добавляются, при prune=True
+    сотрудники, которых нет в списке, удаляются вместе с бронированиями.
+    Повторный запуск ничего не меняет. При dry_run=True только печатает diff.
+    """
     print("Checking and initializing users from USERS_LIST...")
 
-    async with AsyncSessionLocal() as session:
-        try:
-            # Получаем всех существующих пользователей
-            result = await session.execute(select(User.full_name))
-            existing_users = {row[0] for row in result.all()}
-
-            users_to_add = []
-            for full_name in settings.USERS_LIST:
-                if full_name not in existing_users:
-                    new_user = User(
-                        full_name=full_name, username=None, tg_id=None, chat_id=None
-                    )
-                    users_to_add.append(new_user)
-                    print(f"Adding user: {full_name}")
-                else:
-                    print(f"User already exists: {full_name}")
-
-            if users_to_add:
-                # Добавляем всех пользователей и обрабатываем возможные конфликты
-                for user in users_to_add:
-                    try:
-                        session.add(user)
-                        await session.flush()  # Частичный коммит для проверки
-                    except IntegrityError as e:
-                        await session.rollback()
-                        print(f"Duplicate user skipped: {user.full_name}")
-                        # Продолжаем добавлять остальных пользователей
-                        continue
-
-                await session.commit()
-                print(f"Successfully added {len(users_to_add)} new users")
-            else:
-                print("All users from USERS_LIST already exist in database")
-
-        except Exception as e:
-            print(f"Error initializing users: {e}")
-            await session.rollback()
-            raise
+    full_names = list(dict.fromkeys(settings.USERS_LIST))
+    if not full_names:
+        # пустой список с prune удалил бы всех сотрудников
+        print("USERS_LIST is empty, nothing to sync")
+        return
+
+    report = await UserService.sync_full_names(full_names, prune=prune, dry_run=dry_run)
+
+    prefix = "[dry-run] " if dry_run else ""
+    for full_name in report["added"]:
+        print(f"{prefix}+ {full_name}")
+    for full_name in report["removed"]:
+        print(f"{prefix}- {full_name}")
+    print(
+        f"{prefix}{len(report['added'])} added, {len(report['removed'])} removed, "
+        f"{report['total']} users total"
+    )
 
 
 if __name__ == "__main__":
-    asyncio.run(init_users())
+    parser = argparse.ArgumentParser(description="Sync users table with USERS_LIST")
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="удалить сотрудников, которых нет в USERS_LIST (вместе с бронированиями)",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="только показать изменения"
+    )
+    args = parser.parse_args()
+
+    asyncio.run(init_users(prune=args.prune, dry_run=args.dry_run))
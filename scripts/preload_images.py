@@ -1,17 +1,26 @@
-import asyncio
 import os
 
-from telebot.async_telebot import AsyncTeleBot
-
+from bot.loader import get_bot
 from config.settings import settings
 
-# ⚠️ Здесь можно сделать так: бот загружает картинку в твой ADMIN_USERNAMES[0]
-BOT = AsyncTeleBot(settings.BOT_TOKEN)
-
 # Хранилище для file_id
 preloaded_images = {}
 
 
+def get_photo(key: str = "office_map"):
+    """
+    Получить фото для отправки: file_id, если изображение уже предзагружено,
+    иначе сам файл (бот начинает отвечать, не дожидаясь окончания предзагрузки).
+    """
+    file_id = preloaded_images.get(key)
+    if file_id:
+        return file_id
+
+    from telebot.types import InputFile
+
+    return InputFile(settings.OFFICE_MAP_PATH)
+
+
 async def preload_images():
     """
     Загружает изображения при старте и сохраняет их file_id для дальнейшего использования.
@@ -25,11 +34,12 @@ async def preload_images():
     print(f"📤 Uploading office map {office_map_path} to Telegram...")
 
     # Отправляем в личку главному единственному админу (или можно настроить в скрытый служебный канал, нужен именно ID)
-    msg = await BOT.send_photo(
-        settings.ADMIN_CHAT_ID,
-        photo=open(office_map_path, "rb"),
-        caption="Карта мест загружена.",
-    )
+    with open(office_map_path, "rb") as photo:
+        msg = await get_bot().send_photo(
+            settings.ADMIN_CHAT_ID,
+            photo=photo,
+            caption="Карта мест загружена.",
+        )
 
     # Берем file_id самого большого размера фото
     file_id = msg.photo[-1].file_id
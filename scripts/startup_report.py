@@ -0,0 +1,94 @@
+"""
+Отчет о времени старта точек входа на основе `python -X importtime`.
+
+Проверяет, что импорт точек входа не печатает ничего в stdout (нет побочных
+эффектов при импорте), не тянет лишних тяжелых зависимостей и укладывается в бюджет.
+
+    python scripts/startup_report.py --budget-ms 1500 --top 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# точки входа и пакеты, которые они не должны импортировать
+ENTRYPOINTS = {
+    # сервисы, БД и health-сервер бот импортирует при запуске main()
+    "bot.main": ["services", "db.database", "sqlalchemy", "aiohttp", "bot.health"],
+    "bot.scripts.clean_up_bookings": ["telebot", "aiohttp"],
+}
+
+
+def measure_import(module: str) -> dict:
+    """
+    Импортирует модуль в отдельном интерпретаторе с `python -X importtime`
+    и возвращает время импорта по модулям (self, cumulative в мкс) и вывод в stdout.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+
+    return {
+        "returncode": result.returncode,
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+        "timings": timings,
+    }
+
+
+def check_entrypoint(module: str, forbidden: list[str], budget_ms: float, top: int):
+    """Печатает отчет по точке входа и возвращает список найденных проблем."""
+    report = measure_import(module)
+    problems = []
+
+    if report["returncode"] != 0:
+        errors = [l for l in report["stderr"].splitlines() if "import time" not in l]
+        return [f"{module}: import failed\n" + "\n".join(errors[-5:])]
+
+    timings = report["timings"]
+    total_ms = timings.get(module, (0, 0))[1] / 1000
+    print(f"{module}: {total_ms:.1f} ms")
+    heaviest = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (_, cumulative_us) in heaviest[1 : top + 1]:
+        print(f"    {cumulative_us / 1000:8.1f} ms  {name}")
+
+    if report["stdout"]:
+        problems.append(f"{module}: import prints to stdout: {report['stdout']!r}")
+    for package in forbidden:
+        if package in timings:
+            problems.append(f"{module}: imports {package}")
+    if budget_ms and total_ms > budget_ms:
+        problems.append(f"{module}: {total_ms:.1f} ms > budget {budget_ms} ms")
+
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=0, help="0 - без бюджета")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    problems = []
+    for module, forbidden in ENTRYPOINTS.items():
+        problems += check_entrypoint(module, forbidden, args.budget_ms, args.top)
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,14 @@
 from .booking_service import *
+from .calendar_service import *
+from .digest_service import *
+from .error_digest import *
 from .errors import *
+from .lottery_service import *
+from .occupancy_map import *
+from .scheduler import *
+from .seat_allocation_service import *
+from .seat_registry import *
+from .seat_watch_service import *
+from .storage import *
 from .user_service import *
+from .visitors_cache import *
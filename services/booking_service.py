@@ -1,52 +1,58 @@
 import datetime
-from zoneinfo import ZoneInfo
+from typing import AsyncIterator, Callable
 
-from sqlalchemy import delete, func, select
-from sqlalchemy.exc import IntegrityError
-
-import utils
-from config.settings import settings
-from db.database import get_db_session
-from db.models import Booking, User
+from db.database import reads_from_primary
+from db.models import Booking
+from services.calendar_service import CalendarService
 from services.errors import *
+from services.lottery_service import LotteryService
+from services.seat_registry import SeatLayout, SeatRegistry
+from services.seat_watch_service import SeatWatchService
+from services.storage import get_storage
+from services.visitors_cache import VisitorsCache
+from utils.concurrency import SingleFlight, single_flight
 
 
 class BookingService:
 
+    @staticmethod
+    async def _occupied_masks_by_date(
+        layout: SeatLayout, dates: tuple[dict, ...]
+    ) -> dict[datetime.date, int]:
+        """
+        Получить битовые маски занятых мест по датам из диапазона dates
+        (закрепленные за ожидающими места тоже заняты).
+        """
+        occupied_seats = await get_storage().bookings.get_occupied_seats(
+            dates[0]["date_obj"], dates[-1]["date_obj"]
+        )
+        occupied_by_date = {}
+        for booking_date, seat_number in [
+            *occupied_seats,
+            *SeatWatchService.held_seats(),
+        ]:
+            occupied_by_date[booking_date] = occupied_by_date.get(
+                booking_date, 0
+            ) | layout.mask_of((seat_number,))
+        return occupied_by_date
+
     @staticmethod
     async def get_available_dates(tg_id: int) -> list[dict]:
         """
         Получить даты доступные для персонального бронирования места с учетом уже
         созданных бронирований пользователя и заполненности офиса.
         """
-        upcoming_dates = await utils.generate_upcoming_dates()
-        max_bookings_per_day = len(settings.EXISTING_SEATS_LIST)
-
-        user_booked_dates = []
-        bookings_count_by_date = {}
-
-        async for session in get_db_session():
-            try:
-                # 1. Получаем даты, на которые у пользователя уже есть бронирования
-                user_bookings_result = await session.execute(
-                    select(Booking.booking_date)
-                    .join(User, User.id == Booking.user_id)
-                    .where(User.tg_id == tg_id)
-                    .where(Booking.type.in_(["personal"]))
-                )
-                user_booked_dates = [row[0] for row in user_bookings_result.all()]
-                # 2. Получаем общее количество бронирований для каждой даты
-                bookings_count_result = await session.execute(
-                    select(Booking.booking_date, func.count(Booking.id))
-                    .where(Booking.type.in_(["personal", "guest"]))
-                    .group_by(Booking.booking_date)
-                )
-                bookings_count_by_date = {
-                    date: count for date, count in bookings_count_result.all()
-                }
-            except Exception:
-                await session.rollback()
-                raise ValueError
+        upcoming_dates = CalendarService.upcoming_dates()
+        layout = SeatRegistry.layout()
+
+        # 1. Получаем даты, на которые у пользователя уже есть бронирования
+        user_booked_dates = await get_storage().bookings.get_user_booking_dates(
+            tg_id, ("personal",)
+        )
+        # 2. Получаем маски занятых мест для каждой даты
+        occupied_by_date = await BookingService._occupied_masks_by_date(
+            layout, upcoming_dates
+        )
 
         available_dates = []
 
@@ -57,9 +63,8 @@ class BookingService:
             if date_obj in user_booked_dates:
                 continue
 
-            # 2. Отбрасываем даты с "максимальным" количеством бронирований
-            booking_count = bookings_count_by_date.get(date_obj, 0)
-            if booking_count >= max_bookings_per_day:
+            # 2. Отбрасываем даты, на которые заняты все места
+            if layout.is_full(occupied_by_date.get(date_obj, 0)):
                 continue
 
             # Если дата прошла оба фильтра, добавляем в доступные
@@ -73,25 +78,12 @@ class BookingService:
         Получить даты на 14 дней вперед доступные для посещения офиса (не бронирования места)
         с учетом уже созданных персональных бронирований пользователя.
         """
-        upcoming_dates = await utils.generate_upcoming_dates()
+        upcoming_dates = CalendarService.upcoming_dates()
 
         # Получаем даты, на которые у пользователя уже есть персональные бронирования
-        user_booked_dates = []
-
-        async for session in get_db_session():
-            try:
-                stmt = (
-                    select(Booking.booking_date)
-                    .join(User, User.id == Booking.user_id)
-                    .where(User.tg_id == tg_id)
-                    .where(Booking.type.in_(["personal", "personal_candidate"]))
-                )
-                result = await session.execute(stmt)
-                user_booked_dates = [row[0] for row in result.all()]
-
-            except Exception:
-                await session.rollback()
-                raise ValueError
+        user_booked_dates = await get_storage().bookings.get_user_booking_dates(
+            tg_id, ("personal", "personal_candidate")
+        )
 
         available_dates = []
 
@@ -108,40 +100,31 @@ class BookingService:
         return available_dates
 
     @staticmethod
+    @single_flight("bookings", context=reads_from_primary)
     async def get_guest_available_dates() -> list[dict]:
         """
         Получить даты доступные для гостевого бронирования места
-        с учетом только заполненности офиса.
+        с учетом только заполненности офиса (кроме дат с непроведенной жеребьевкой).
         """
-        upcoming_dates = await utils.generate_upcoming_dates()
-        max_bookings_per_day = len(settings.EXISTING_SEATS_LIST)
-
-        # Получаем общее количество бронирований на каждую дату
-        bookings_count_by_date = {}
-
-        async for session in get_db_session():
-            try:
-                # Получаем общее количество бронирований для каждой даты
-                bookings_count_result = await session.execute(
-                    select(Booking.booking_date, func.count(Booking.id))
-                    .where(Booking.type.in_(["personal", "guest"]))
-                    .group_by(Booking.booking_date)
-                )
-                bookings_count_by_date = {
-                    date: count for date, count in bookings_count_result.all()
-                }
-            except Exception:
-                await session.rollback()
-                raise ValueError
+        upcoming_dates = CalendarService.upcoming_dates()
+        layout = SeatRegistry.layout()
+
+        # Получаем маски занятых мест для каждой даты
+        occupied_by_date = await BookingService._occupied_masks_by_date(
+            layout, upcoming_dates
+        )
 
         available_dates = []
 
         for date in upcoming_dates:
             date_obj = date["date_obj"]
 
-            # Отбрасываем даты с максимальным количеством бронирований
-            booking_count = bookings_count_by_date.get(date_obj, 0)
-            if booking_count >= max_bookings_per_day:
+            # Отбрасываем даты, места на которые разыгрываются
+            if LotteryService.is_pending(date_obj):
+                continue
+
+            # Отбрасываем даты, на которые заняты все места
+            if layout.is_full(occupied_by_date.get(date_obj, 0)):
                 continue
 
             # Если дата прошла оба фильтра, добавляем в доступные
@@ -150,34 +133,27 @@ class BookingService:
         return available_dates
 
     @staticmethod
+    @single_flight("bookings", context=reads_from_primary)
     async def get_available_seats(book_date: str) -> list[str]:
         """Получить места доступные для бронирования на дату."""
         book_date_obj = datetime.datetime.strptime(book_date, "%Y-%m-%d").date()
-        async for session in get_db_session():
-            try:
-                # Находим все забронированные места на выбранную дату
-                result = await session.execute(
-                    select(Booking.seat_number).where(
-                        Booking.booking_date == book_date_obj,
-                        Booking.seat_number.isnot(None),
-                    )
-                )
-                occupied_seats = result.scalars().all()
-
-                if len(occupied_seats) == len(settings.EXISTING_SEATS_LIST):
-                    raise ValueError(f"Свободных мест нет на выбранную дату.")
-
-                available_seats = [
-                    seat
-                    for seat in settings.EXISTING_SEATS_LIST
-                    if seat not in occupied_seats
-                ]
-
-                return available_seats
-
-            except Exception:
-                await session.rollback()
-                raise ValueError
+
+        # Находим все забронированные места на выбранную дату
+        occupied_seats = await get_storage().bookings.get_occupied_seats(
+            book_date_obj, book_date_obj
+        )
+        layout = SeatRegistry.layout()
+        occupied_mask = layout.mask_of(seat for _, seat in occupied_seats)
+        occupied_mask |= layout.mask_of(
+            seat
+            for held_date, seat in SeatWatchService.held_seats()
+            if held_date == book_date_obj
+        )
+
+        if layout.is_full(occupied_mask):
+            raise ValueError(f"Свободных мест нет на выбранную дату.")
+
+        return layout.labels_of(layout.free_mask(occupied_mask))
 
     @staticmethod
     async def create_booking(
@@ -188,213 +164,114 @@ class BookingService:
         booking_type: str,
         guest_full_name: str | None,
     ) -> Booking:
-        """Создать бронирование."""
-        async for session in get_db_session():
-            try:
-                if seat_number:
-                    # Проверка, что место на дату еще свободно
-                    existing = await session.execute(
-                        select(Booking.id).where(
-                            Booking.booking_date == booking_date,
-                            Booking.seat_number == seat_number,
-                        )
-                    )
-                    if existing.scalar_one_or_none():
-                        raise BookingConflictError
-
-                booking = Booking(
-                    booking_date=booking_date,
-                    user_id=user_id,
-                    seat_number=seat_number,
-                    type=booking_type,
-                    guest_full_name=guest_full_name,
-                )
-                session.add(booking)
-                await session.commit()
-                await session.refresh(booking)
-
-                return booking
-
-            except IntegrityError:
-                await session.rollback()
-                raise BookingConflictError
+        """
+        Создать бронирование (BookingConflictError, если место уже занято,
+        закреплено за другим ожидающим или разыгрывается в жеребьевке).
+        """
+        if seat_number is not None and LotteryService.is_pending(booking_date):
+            raise BookingConflictError
+        SeatWatchService.check_hold(booking_date, seat_number, user_id)
+        booking = await get_storage().bookings.create(
+            booking_date=booking_date,
+            user_id=user_id,
+            seat_number=seat_number,
+            booking_type=booking_type,
+            guest_full_name=guest_full_name,
+        )
+        SeatWatchService.claim(booking_date, seat_number, user_id)
+        VisitorsCache.bump(booking.booking_date)
+        SingleFlight.invalidate("bookings")
+        return booking
 
     @staticmethod
     async def delete_booking(booking_id: int) -> Booking:
-        """Удалить бронирование."""
-        async for session in get_db_session():
-            try:
-                result = await session.execute(
-                    select(Booking).where(Booking.id == booking_id)
-                )
-                booking = result.scalar_one_or_none()
-
-                # Удаляем объект
-                await session.delete(booking)
-                await session.commit()
-
-                return booking
-
-            except Exception:
-                await session.rollback()
-                raise ValueError
+        """Удалить бронирование; освободившееся место предлагается ожидающим."""
+        booking = await get_storage().bookings.delete(booking_id)
+        VisitorsCache.bump(booking.booking_date)
+        SingleFlight.invalidate("bookings")
+        SeatWatchService.seats_freed([(booking.booking_date, booking.seat_number)])
+        return booking
 
     @staticmethod
     async def get_user_future_bookings(user_id: int) -> list[Booking]:
         """Получить данные всех бронирований пользователя."""
-        current_date_obj = datetime.datetime.strptime(
-            utils.get_current_timestamp().split(" ")[0], "%Y-%m-%d"
-        ).date()
-        async for session in get_db_session():
-            try:
-                result = await session.execute(
-                    select(Booking)
-                    .where(Booking.user_id == user_id)
-                    .where(Booking.booking_date >= current_date_obj)
-                    .order_by(Booking.booking_date)
-                )
-                user_bookings = result.scalars().all()
-
-                return user_bookings
-
-            except Exception:
-                await session.rollback()
-                raise ValueError
+        return await get_storage().bookings.get_user_future(
+            user_id, CalendarService.today()
+        )
 
     @staticmethod
-    async def get_all_future_bookings() -> list[dict]:
-        """Получить данные всех будущих бронирований всех пользователей."""
-        current_date_obj = datetime.datetime.strptime(
-            utils.get_current_timestamp().split(" ")[0], "%Y-%m-%d"
-        ).date()
-        async for session in get_db_session():
-            try:
-                bookings = (
-                    select(
-                        Booking.id,
-                        Booking.booking_date,
-                        Booking.guest_full_name,
-                        User.full_name,
-                        Booking.seat_number,
-                        Booking.type,
-                    )
-                    .join(User, User.id == Booking.user_id)
-                    .where(Booking.booking_date >= current_date_obj)
-                    .order_by(Booking.booking_date)
-                )
-
-                result = await session.execute(bookings)
-                rows = (
-                    result.all()
-                )  # список кортежей (id, seat_number, type, guest_full_name, full_name)
-
-                # Преобразуем в список словарей для удобства
-                # Берем ФИО гостя, если есть, если нет - ФИО владельца брони
-                return [
-                    {
-                        "booking_id": r[0],
-                        "booking_date": r[1],
-                        "full_name": r[2] if r[2] else r[3],
-                        "seat_number": r[4],
-                        "type": r[5],
-                    }
-                    for r in rows
-                ]
-
-            except Exception:
-                await session.rollback()
-                raise ValueError
+    async def stream_all_future_bookings(
+        batch_size: int = 500,
+    ) -> AsyncIterator[dict]:
+        """
+        Построчно отдать данные всех будущих бронирований всех пользователей.
+        Строки читаются из хранилища пачками по batch_size,
+        поэтому в памяти никогда не держится весь список бронирований,
+        а соединение с БД не занято, пока вызывающий отправляет сообщения.
+        """
+        async for booking in get_storage().bookings.stream_future(
+            CalendarService.today(), batch_size
+        ):
+            yield booking
 
     @staticmethod
+    @single_flight("bookings", context=reads_from_primary)
     async def get_dates_with_visitors() -> list[datetime.date]:
         """
         Получить список уникальных дат на которые
         есть хотя бы одно бронирование от любого из сотрудников.
         """
-        async for session in get_db_session():
-            try:
-                # Получаем текущую дату для фильтрации будущих бронирований
-                current_date_obj = datetime.datetime.strptime(
-                    utils.get_current_timestamp().split(" ")[0], "%Y-%m-%d"
-                ).date()
-
-                # Выбираем уникальные даты бронирований, которые сегодня или в будущем
-                result = await session.execute(
-                    select(Booking.booking_date)
-                    .where(Booking.booking_date >= current_date_obj)
-                    .distinct()
-                    .order_by(Booking.booking_date)
-                )
-
-                dates = result.scalars().all()
-
-                return dates
-
-            except Exception:
-                await session.rollback()
-                raise ValueError
+        return await get_storage().bookings.get_dates_with_bookings(
+            CalendarService.today()
+        )
 
     @staticmethod
     async def get_visitors_by_date(date: datetime.date) -> list[dict]:
         """
         Получить данные всех бронирований пользователей на дату:
-        seat_number + full_name + type + guest_full_name.
+        seat_number + full_name + type (ФИО гостя, если есть, иначе владельца брони).
+        Результат берется из VisitorsCache, пока бронирования на дату не менялись,
+        список общий для всех читателей - не изменять.
+        """
+        entry = await BookingService._get_visitors_entry(date)
+        return entry["visitors"]
+
+    @staticmethod
+    @single_flight("bookings", context=reads_from_primary)
+    async def _get_visitors_entry(date: datetime.date) -> dict:
+        """Запись VisitorsCache на дату; при промахе читается из хранилища."""
+        entry = VisitorsCache.get(date)
+        if entry is None:
+            # версия снимается до чтения: изменение во время чтения не попадет в кэш
+            version = VisitorsCache.version(date)
+            visitors = await get_storage().bookings.get_visitors_by_date(date)
+            entry = VisitorsCache.put(date, version, visitors)
+        return entry
+
+    @staticmethod
+    async def get_visitors_text(
+        date: datetime.date, render: Callable[[datetime.date, list[dict]], str]
+    ) -> str:
+        """
+        Текст со списком посетителей на дату, отрисованный render(date, visitors).
+        Отрисованный текст хранится рядом со списком в VisitorsCache.
         """
-        async for session in get_db_session():
-            try:
-                bookings = (
-                    select(
-                        Booking.seat_number,
-                        Booking.type,
-                        Booking.guest_full_name,
-                        User.full_name,
-                    )
-                    .join(User, User.id == Booking.user_id)
-                    .where(Booking.booking_date == date)
-                    .order_by(Booking.seat_number)
-                )
-
-                result = await session.execute(bookings)
-                rows = (
-                    result.all()
-                )  # список кортежей (seat_number, type, guest_full_name, full_name)
-
-                # Преобразуем в список словарей для удобства
-                # Берем ФИО гостя, если есть, если нет - ФИО владельца брони
-                return [
-                    {
-                        "seat_number": r[0],
-                        "type": r[1],
-                        "full_name": r[2] if r[2] else r[3],
-                    }
-                    for r in rows
-                ]
-
-            except Exception:
-                await session.rollback()
-                raise ValueError
+        entry = await BookingService._get_visitors_entry(date)
+        text = entry["rendered"].get(render)
+        if text is None:
+            text = entry["rendered"][render] = render(date, entry["visitors"])
+        return text
 
     @staticmethod
     async def cleanup_old_bookings(days: int = 90) -> int:
         """
-        Удаляет бронирования старше N дней.
+        Удаляет бронирования старше N дней (и жеребьевки на эти даты).
         Возвращает количество удалённых записей.
         """
-        cutoff_date = datetime.datetime.now(
-            ZoneInfo("Europe/Moscow")
-        ).date() - datetime.timedelta(days=days)
-
-        async for session in get_db_session():
-            try:
-                result = await session.execute(
-                    delete(Booking)
-                    .where(Booking.booking_date < cutoff_date)
-                    .returning(Booking.id)
-                )
-                deleted_rows = result.fetchall()
-                await session.commit()
-                return len(deleted_rows), str(cutoff_date)
-
-            except Exception:
-                await session.rollback()
-                raise
+        cutoff_date = CalendarService.today() - datetime.timedelta(days=days)
+        deleted_count = await get_storage().bookings.delete_older_than(cutoff_date)
+        await get_storage().lotteries.delete_older_than(cutoff_date)
+        if deleted_count:
+            VisitorsCache.bump_all()
+            SingleFlight.invalidate("bookings")
+        return deleted_count, str(cutoff_date)
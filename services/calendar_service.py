@@ -0,0 +1,116 @@
+import asyncio
+import datetime
+from zoneinfo import ZoneInfo
+
+import utils
+from bot.dependencies import logger
+from config.settings import settings
+
+MOSCOW_TZ = ZoneInfo("Europe/Moscow")
+
+
+class CalendarService:
+    """
+    Календарь окна планирования. Окно (даты, русские подписи, ISO-ключи,
+    объекты date и их позиции) строится один раз за московские сутки и
+    подменяется целиком одной ссылкой, поэтому читатели никогда не видят
+    "наполовину обновленное" окно.
+    """
+
+    _window: dict | None = None
+    _rollover_hooks: list = []
+
+    @staticmethod
+    def today() -> datetime.date:
+        """Текущая дата по Москве."""
+        return datetime.datetime.now(MOSCOW_TZ).date()
+
+    @staticmethod
+    def _build_window(today: datetime.date) -> dict:
+        """Построить окно планирования на settings.PLANNING_DAYS дней от today."""
+        dates = []
+        for i in range(settings.PLANNING_DAYS):
+            current_date = today + datetime.timedelta(days=i)
+            dates.append(
+                {
+                    "formatted": utils.format_booking_date(current_date),
+                    "timestamp": current_date.isoformat(),  # Формат: YYYY-MM-DD
+                    "date_obj": current_date,
+                }
+            )
+
+        return {
+            "day": today,
+            "dates": tuple(dates),
+            "by_timestamp": {date["timestamp"]: date for date in dates},
+            "index": {date["date_obj"]: i for i, date in enumerate(dates)},
+        }
+
+    @classmethod
+    def get_window(cls) -> dict:
+        """
+        Получить окно планирования на текущие московские сутки.
+        Если плановая смена суток еще не отработала, окно пересобирается на месте.
+        """
+        window = cls._window
+        today = cls.today()
+        if window is None or window["day"] != today:
+            window = cls._build_window(today)
+            cls._window = window
+        return window
+
+    @classmethod
+    def upcoming_dates(cls) -> tuple[dict, ...]:
+        """
+        Даты окна планирования от сегодняшней включительно в формате
+        {"formatted", "timestamp", "date_obj"}. Результат общий для всех, не изменять.
+        """
+        return cls.get_window()["dates"]
+
+    @classmethod
+    def get_date(cls, timestamp: str) -> dict | None:
+        """Найти дату окна по ISO-ключу "YYYY-MM-DD", None если дата вне окна."""
+        return cls.get_window()["by_timestamp"].get(timestamp)
+
+    @classmethod
+    def index_of(cls, date_obj: datetime.date) -> int | None:
+        """Позиция даты в окне планирования, None если дата вне окна."""
+        return cls.get_window()["index"].get(date_obj)
+
+    @classmethod
+    def last_date(cls) -> datetime.date:
+        """Последняя (только что открывшаяся) дата окна планирования."""
+        return cls.get_window()["dates"][-1]["date_obj"]
+
+    @classmethod
+    def add_rollover_hook(cls, hook) -> None:
+        """
+        Зарегистрировать корутину-функцию без аргументов, которая вызывается
+        сразу после смены суток (прогрев зависимых кэшей и т.п.).
+        """
+        cls._rollover_hooks.append(hook)
+
+    @classmethod
+    async def rollover(cls) -> None:
+        """Пересобрать окно на новые сутки и вызвать зарегистрированные хуки."""
+        cls._window = cls._build_window(cls.today())
+        for hook in cls._rollover_hooks:
+            try:
+                await hook()
+            except Exception:
+                logger.error("Rollover hook %s failed", hook.__name__, exc_info=True)
+
+    @classmethod
+    async def run_rollover_loop(cls) -> None:
+        """Фоновая задача: смена окна планирования ровно в полночь по Москве."""
+        cls.get_window()
+        while True:
+            now = datetime.datetime.now(MOSCOW_TZ)
+            next_midnight = datetime.datetime.combine(
+                now.date() + datetime.timedelta(days=1), datetime.time(), MOSCOW_TZ
+            )
+            await asyncio.sleep((next_midnight - now).total_seconds())
+            # таймер мог сработать чуть раньше полуночи - тогда досыпаем
+            if cls.today() < next_midnight.date():
+                continue
+            await cls.rollover()
@@ -0,0 +1,43 @@
+from config.settings import settings
+from services.storage import get_storage
+
+
+class DigestService:
+    """Подписки сотрудников на утреннюю сводку "кто сегодня в офисе"."""
+
+    @staticmethod
+    async def _get_user_id(tg_id: int) -> int:
+        user = await get_storage().users.get_by_tg_id(tg_id)
+        if user is None:
+            raise ValueError("Пользователь не зарегистрирован.")
+        return user.id
+
+    @staticmethod
+    async def get_send_hour(tg_id: int) -> int | None:
+        """Час отправки сводки пользователю с tg_id (None - не подписан)."""
+        user_id = await DigestService._get_user_id(tg_id)
+        return await get_storage().digests.get_send_hour(user_id)
+
+    @staticmethod
+    async def subscribe(tg_id: int, send_hour: int) -> None:
+        """Подписать пользователя на сводку в send_hour по Москве (из settings.DIGEST_SEND_HOURS)."""
+        if send_hour not in settings.DIGEST_SEND_HOURS:
+            raise ValueError(f"Недоступное время сводки: {send_hour}:00.")
+        user_id = await DigestService._get_user_id(tg_id)
+        await get_storage().digests.subscribe(user_id, send_hour)
+
+    @staticmethod
+    async def unsubscribe(tg_id: int) -> None:
+        """Отписать пользователя с tg_id от сводки."""
+        user_id = await DigestService._get_user_id(tg_id)
+        await get_storage().digests.unsubscribe(user_id)
+
+    @staticmethod
+    async def unsubscribe_user(user_id: int) -> None:
+        """Отписать сотрудника по id (например, если он заблокировал бота)."""
+        await get_storage().digests.unsubscribe(user_id)
+
+    @staticmethod
+    async def get_subscribers(send_hour: int) -> list[dict]:
+        """Подписчики часа send_hour: user_id и chat_id для отправки."""
+        return await get_storage().digests.get_subscribers(send_hour)
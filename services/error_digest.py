@@ -0,0 +1,186 @@
+import glob
+import hashlib
+import json
+import os
+import re
+
+from config.logging_config import LOG_DIR
+
+ERRORS_LOG_PATH = LOG_DIR / "errors.log"
+CHECKPOINT_PATH = LOG_DIR / ".error_digest_checkpoint.json"
+
+# первая строка записи лога: "2025-01-01 10:00:00 | ERROR | seatbook | сообщение"
+RECORD_HEADER = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) \| (ERROR|CRITICAL) \| ([^|]+) \| (.*)$"
+)
+TRACEBACK_FRAME = re.compile(r'^\s*File "([^"]+)", line (\d+), in (\S+)')
+# строка исключения в конце traceback: "ValueError: сообщение" (без отступа)
+EXCEPTION_LINE = re.compile(r"^([A-Za-z_][\w.]*)(?::|$)")
+
+
+class ErrorDigest:
+    """
+    Инкрементальная сводка ошибок из logs/errors.log. Позиция чтения (inode файла
+    и смещение в байтах) сохраняется в чекпоинте, поэтому каждая запись лога
+    читается ровно один раз: после ротации (TimedRotatingFileHandler переименовывает
+    файл) сначала дочитывается хвост ротированного файла с тем же inode,
+    затем с начала все ротированные после него и новый файл.
+
+    Читается только локальный каталог logs/: при нескольких репликах в сводку
+    попадают ошибки той реплики, которая выполнила задачу сводки, а ошибки
+    остальных реплик остаются в их логах.
+    """
+
+    @staticmethod
+    def _load_checkpoint() -> dict | None:
+        try:
+            with open(CHECKPOINT_PATH, encoding="utf-8") as checkpoint_file:
+                return json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def save_checkpoint(checkpoint: dict) -> None:
+        """Атомарно сохранить позицию чтения (вызывать после отправки сводки)."""
+        tmp_path = f"{CHECKPOINT_PATH}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(tmp_path, CHECKPOINT_PATH)
+
+    @staticmethod
+    def _read_complete_lines(path: str, offset: int) -> tuple[bytes, int]:
+        """Прочитать файл с offset до последнего перевода строки включительно."""
+        with open(path, "rb") as log_file:
+            log_file.seek(offset)
+            data = log_file.read()
+        complete = data[: data.rfind(b"\n") + 1]
+        return complete, offset + len(complete)
+
+    @staticmethod
+    def _rotated_files() -> list[tuple[str, int]]:
+        """Ротированные файлы лога (errors.log.YYYY-MM-DD) от старых к новым с inode."""
+        rotated = []
+        for path in sorted(glob.glob(f"{ERRORS_LOG_PATH}.*")):
+            try:
+                rotated.append((path, os.stat(path).st_ino))
+            except OSError:
+                continue
+        return rotated
+
+    @staticmethod
+    def read_new() -> tuple[bytes, dict | None]:
+        """
+        Прочитать записи, появившиеся после чекпоинта.
+        Возвращает новые байты лога и чекпоинт, который нужно сохранить после отправки
+        (None - лога нет, сохранять нечего).
+        """
+        try:
+            current = os.stat(ERRORS_LOG_PATH)
+        except OSError:
+            return b"", None
+
+        checkpoint = ErrorDigest._load_checkpoint() or {}
+        chunks = []
+        offset = 0
+
+        if checkpoint.get("inode") == current.st_ino:
+            # тот же файл; если он стал короче смещения - его обрезали
+            offset = (
+                checkpoint["offset"] if current.st_size >= checkpoint["offset"] else 0
+            )
+        elif checkpoint.get("inode") is not None:
+            # файл ротирован, возможно не раз: дочитываем хвост файла чекпоинта
+            # и целиком ротированные после него; если файл чекпоинта уже удален
+            # по backupCount, все оставшиеся ротированные файлы новее него
+            rotated = ErrorDigest._rotated_files()
+            inodes = [inode for path, inode in rotated]
+            start = (
+                inodes.index(checkpoint["inode"])
+                if checkpoint["inode"] in inodes
+                else 0
+            )
+            for path, inode in rotated[start:]:
+                rotated_offset = (
+                    checkpoint["offset"] if inode == checkpoint["inode"] else 0
+                )
+                try:
+                    rotated_data, _ = ErrorDigest._read_complete_lines(
+                        path, rotated_offset
+                    )
+                except OSError:
+                    continue
+                chunks.append(rotated_data)
+
+        new_data, new_offset = ErrorDigest._read_complete_lines(ERRORS_LOG_PATH, offset)
+        chunks.append(new_data)
+
+        return b"".join(chunks), {"inode": current.st_ino, "offset": new_offset}
+
+    @staticmethod
+    def parse_records(data: bytes) -> list[dict]:
+        """Разбить текст лога на записи: время, логгер, сообщение и traceback."""
+        records = []
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            header = RECORD_HEADER.match(line)
+            if header:
+                records.append(
+                    {
+                        "time": header.group(1),
+                        "logger": header.group(3).strip(),
+                        "message": header.group(4),
+                        "traceback": [],
+                    }
+                )
+            elif records:
+                records[-1]["traceback"].append(line)
+        return records
+
+    @staticmethod
+    def _fingerprint(record: dict) -> tuple[str, str, str]:
+        """
+        Отпечаток ошибки: тип исключения и стек вызовов (файл, функция),
+        без номеров строк и текста сообщения, чтобы одинаковые ошибки
+        с разными данными попадали в одну группу.
+        """
+        frames = []
+        exception_type = None
+        for line in record["traceback"]:
+            frame = TRACEBACK_FRAME.match(line)
+            if frame:
+                frames.append(f"{os.path.basename(frame.group(1))}:{frame.group(3)}")
+                continue
+            exception = EXCEPTION_LINE.match(line)
+            if exception and frames:
+                exception_type = exception.group(1)
+
+        if not frames:
+            # записи без traceback группируются по логгеру и сообщению без чисел
+            key = [record["logger"], re.sub(r"\d+", "N", record["message"])]
+            exception_type, location = "без traceback", record["logger"]
+        else:
+            key = [exception_type or "", *frames]
+            location = frames[-1]
+
+        digest = hashlib.sha1("\n".join(key).encode("utf-8")).hexdigest()[:10]
+        return digest, exception_type or "Error", location
+
+    @staticmethod
+    def group(records: list[dict]) -> list[dict]:
+        """Сгруппировать записи по отпечатку: количество, первое и последнее появление."""
+        groups = {}
+        for record in records:
+            fingerprint, exception_type, location = ErrorDigest._fingerprint(record)
+            group = groups.get(fingerprint)
+            if group is None:
+                group = groups[fingerprint] = {
+                    "fingerprint": fingerprint,
+                    "exception_type": exception_type,
+                    "location": location,
+                    "message": record["message"],
+                    "count": 0,
+                    "first_seen": record["time"],
+                }
+            group["count"] += 1
+            group["last_seen"] = record["time"]
+
+        return sorted(groups.values(), key=lambda group: group["count"], reverse=True)
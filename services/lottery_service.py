@@ -0,0 +1,245 @@
+import datetime
+import random
+import secrets
+import time
+from typing import Awaitable, Callable
+
+from bot.dependencies import logger
+from config.settings import settings
+from services.calendar_service import MOSCOW_TZ, CalendarService
+from services.seat_registry import SeatRegistry
+from services.seat_watch_service import SeatWatchService
+from services.storage import get_storage
+from services.visitors_cache import VisitorsCache
+from utils.concurrency import SingleFlight
+
+
+class LotteryService:
+    """
+    Жеребьевка мест на даты с повышенным спросом (общие встречи, дни команды).
+    Администратор объявляет жеребьевку на дату, и до окончания приема заявок
+    (settings.LOTTERY_CUTOFF_HOUR накануне даты) сотрудники подают заявки -
+    одна строка на сотрудника, места не затрагиваются, поэтому гонки за
+    местами нет; бронировать места на дату до жеребьевки нельзя.
+    После окончания приема заявок жеребьевка проводится одной транзакцией:
+    порядок определяется взвешенной выборкой без возвращения
+    (Efraimidis-Spirakis) с зерном, сохраненным при объявлении, поэтому
+    результат воспроизводим. Вес заявки тем больше, чем реже сотрудник был
+    в офисе за settings.LOTTERY_LOOKBACK_DAYS дней. Первые в порядке получают
+    свободные места, остальные - бронирования без места (personal_candidate)
+    и очередь ожидания места в порядке жеребьевки.
+    """
+
+    # дата -> {"cutoff_at", "seed"} непроведенных жеребьевок
+    _pending: dict[datetime.date, dict] = {}
+    # корутина-функция (дата, получившие место, оставшиеся без места) - уведомление
+    _notifier: Callable[[datetime.date, list[dict], list[dict]], Awaitable] | None = (
+        None
+    )
+    _last_draw: dict | None = None
+
+    @classmethod
+    async def load(cls) -> list[dict]:
+        """Загрузить непроведенные жеребьевки из хранилища, вернуть их список."""
+        pending = await get_storage().lotteries.get_pending()
+        cls._pending = {
+            lottery["booking_date"]: {
+                "cutoff_at": lottery["cutoff_at"],
+                "seed": lottery["seed"],
+            }
+            for lottery in pending
+        }
+        return pending
+
+    @classmethod
+    def is_pending(cls, booking_date: datetime.date) -> bool:
+        """Объявлена ли на дату жеребьевка, которая еще не проведена."""
+        return booking_date in cls._pending
+
+    @classmethod
+    def pending_dates(cls) -> frozenset:
+        """Даты с непроведенной жеребьевкой."""
+        return frozenset(cls._pending)
+
+    @classmethod
+    def cutoff_of(cls, booking_date: datetime.date) -> datetime.datetime | None:
+        """Окончание приема заявок на дату (None - жеребьевки нет)."""
+        lottery = cls._pending.get(booking_date)
+        return lottery["cutoff_at"] if lottery else None
+
+    @staticmethod
+    def _cutoff_for(booking_date: datetime.date) -> datetime.datetime:
+        return datetime.datetime.combine(
+            booking_date - datetime.timedelta(days=1),
+            datetime.time(settings.LOTTERY_CUTOFF_HOUR),
+            MOSCOW_TZ,
+        )
+
+    @classmethod
+    async def toggle(cls, booking_date: datetime.date) -> bool:
+        """
+        Объявить жеребьевку на дату или отменить непроведенную вместе с заявками.
+        Возвращает True, если жеребьевка объявлена.
+        """
+        if cls.is_pending(booking_date):
+            await get_storage().lotteries.cancel(booking_date)
+            cls._pending.pop(booking_date, None)
+            SingleFlight.invalidate("bookings")
+            return False
+
+        cutoff_at = cls._cutoff_for(booking_date)
+        if CalendarService.index_of(booking_date) is None:
+            raise ValueError("Дата вне окна планирования.")
+        if cutoff_at <= datetime.datetime.now(MOSCOW_TZ):
+            raise ValueError("Прием заявок на дату уже закончился.")
+
+        seed = secrets.randbits(63)
+        if not await get_storage().lotteries.open(booking_date, cutoff_at, seed):
+            raise ValueError("Жеребьевка на дату уже проведена.")
+        cls._pending[booking_date] = {"cutoff_at": cutoff_at, "seed": seed}
+        SingleFlight.invalidate("bookings")
+        return True
+
+    @classmethod
+    async def _get_user_id(cls, tg_id: int, booking_date: datetime.date) -> int:
+        cutoff_at = cls.cutoff_of(booking_date)
+        if cutoff_at is None or cutoff_at <= datetime.datetime.now(MOSCOW_TZ):
+            raise ValueError("Прием заявок на дату закончен.")
+        user = await get_storage().users.get_by_tg_id(tg_id)
+        if user is None:
+            raise ValueError("Пользователь не зарегистрирован.")
+        return user.id
+
+    @classmethod
+    async def join(cls, tg_id: int, booking_date: datetime.date) -> bool:
+        """Подать заявку на жеребьевку (False - заявка уже подана)."""
+        user_id = await cls._get_user_id(tg_id, booking_date)
+        return await get_storage().lotteries.add_request(booking_date, user_id)
+
+    @classmethod
+    async def leave(cls, tg_id: int, booking_date: datetime.date) -> bool:
+        """Отозвать заявку на жеребьевку (False - заявки не было)."""
+        user_id = await cls._get_user_id(tg_id, booking_date)
+        return await get_storage().lotteries.remove_request(booking_date, user_id)
+
+    @staticmethod
+    def draw_order(requests: list[dict], seed: int) -> list[dict]:
+        """
+        Порядок жеребьевки: взвешенная выборка без возвращения (Efraimidis-Spirakis),
+        ключ заявки u ** (1 / w) при весе w = 1 / (1 + attended), по убыванию ключа.
+        Случайные числа выдаются заявкам по возрастанию user_id, поэтому при том же
+        зерне и тех же заявках порядок тот же.
+        """
+        rng = random.Random(seed)
+        keys = {
+            request["user_id"]: rng.random() ** (1 + request["attended"])
+            for request in sorted(requests, key=lambda r: r["user_id"])
+        }
+        return sorted(requests, key=lambda r: (-keys[r["user_id"]], r["user_id"]))
+
+    @classmethod
+    def set_notifier(
+        cls, notifier: Callable[[datetime.date, list[dict], list[dict]], Awaitable]
+    ) -> None:
+        """Задать уведомление участников о результатах жеребьевки."""
+        cls._notifier = notifier
+
+    @classmethod
+    async def draw(cls, booking_date: datetime.date) -> dict | None:
+        """
+        Провести жеребьевку на дату (занятые и закрепленные места не разыгрываются).
+        Возвращает отчет: date, seed, requests, seats, candidates, elapsed_ms;
+        None - жеребьевки нет или она уже проведена.
+        """
+        lottery = cls._pending.get(booking_date)
+        if lottery is None:
+            return None
+
+        started = time.perf_counter()
+        requests = await get_storage().lotteries.get_requests(
+            booking_date,
+            booking_date - datetime.timedelta(days=settings.LOTTERY_LOOKBACK_DAYS),
+        )
+        order = cls.draw_order(requests, lottery["seed"])
+
+        layout = SeatRegistry.layout()
+        occupied_seats = await get_storage().bookings.get_occupied_seats(
+            booking_date, booking_date
+        )
+        occupied_mask = layout.mask_of(
+            seat
+            for seat_date, seat in [*occupied_seats, *SeatWatchService.held_seats()]
+            if seat_date == booking_date
+        )
+        free_seats = layout.labels_of(layout.free_mask(occupied_mask))
+        results = [
+            (request["user_id"], free_seats[i] if i < len(free_seats) else None)
+            for i, request in enumerate(order)
+        ]
+
+        created = await get_storage().lotteries.draw(booking_date, results)
+        cls._pending.pop(booking_date, None)
+        if created is None:
+            return None
+        VisitorsCache.bump(booking_date)
+        SingleFlight.invalidate("bookings")
+
+        created = dict(created)
+        # места в общей очереди ожидания на дату, где могли уже стоять другие
+        positions = await get_storage().watches.positions(
+            booking_date,
+            [
+                user_id
+                for user_id, seat_number in created.items()
+                if seat_number is None
+            ],
+        )
+        winners, losers = [], []
+        for request in order:
+            if request["user_id"] not in created:
+                continue
+            seat_number = created[request["user_id"]]
+            if seat_number is not None:
+                winners.append({**request, "seat_number": seat_number})
+            else:
+                # None - из очереди уже успели вызвать
+                losers.append(
+                    {**request, "position": positions.get(request["user_id"])}
+                )
+
+        report = {
+            "date": booking_date.isoformat(),
+            "seed": lottery["seed"],
+            "requests": len(requests),
+            "seats": len(winners),
+            "candidates": len(losers),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        cls._last_draw = report
+
+        if cls._notifier is not None and (winners or losers):
+            await cls._notifier(booking_date, winners, losers)
+        return report
+
+    @classmethod
+    async def draw_due(cls) -> int:
+        """
+        Провести жеребьевки с закончившимся приемом заявок, вернуть их число
+        (жеребьевки на прошедшие даты отменяются).
+        """
+        drawn = 0
+        now = datetime.datetime.now(MOSCOW_TZ)
+        for booking_date, lottery in sorted(cls._pending.items()):
+            if booking_date < CalendarService.today():
+                await get_storage().lotteries.cancel(booking_date)
+                cls._pending.pop(booking_date, None)
+            elif lottery["cutoff_at"] <= now:
+                report = await cls.draw(booking_date)
+                logger.info(f"Seat lottery: {report}")
+                drawn += report is not None
+        return drawn
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики жеребьевок для отчета о готовности."""
+        return {"pending": len(cls._pending), "last_draw": cls._last_draw}
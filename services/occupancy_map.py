@@ -0,0 +1,153 @@
+import asyncio
+import io
+import os
+from collections import OrderedDict
+
+from bot.dependencies import logger
+from config.settings import settings
+from services.seat_registry import SeatLayout
+
+FREE_COLOR = (46, 204, 113)
+OCCUPIED_COLOR = (231, 76, 60)
+OUTLINE_COLOR = (255, 255, 255)
+
+
+class OccupancyMap:
+    """
+    Карта офиса с отметками свободных и занятых мест. Картинка зависит только
+    от битовой маски занятых мест, поэтому одинаковая занятость в разные даты
+    и у разных пользователей - это один рендер и одна загрузка в Telegram:
+    дальше фото отправляется по сохраненному file_id.
+    Координаты мест берутся из Seat.attributes ("x", "y" в пикселях карты),
+    без Pillow или без координат используется обычная карта офиса.
+    """
+
+    # маска занятых мест -> file_id загруженной картинки
+    _file_ids: OrderedDict = OrderedDict()
+    # маска -> future с file_id, пока картинка загружается первым запросившим
+    _uploading: dict[int, asyncio.Future] = {}
+    _base_image = None
+
+    _renders = 0
+    _uploads = 0
+    _hits = 0
+
+    @staticmethod
+    def _coordinates(layout: SeatLayout) -> list[tuple[int, int, int]]:
+        """Места с координатами на карте: (индекс места, x, y)."""
+        return [
+            (i, attributes["x"], attributes["y"])
+            for i, attributes in enumerate(layout.attributes)
+            if attributes and "x" in attributes and "y" in attributes
+        ]
+
+    @classmethod
+    def _render(cls, layout: SeatLayout, occupied_mask: int) -> bytes:
+        """Нарисовать отметки мест поверх карты офиса (синхронно, в отдельном потоке)."""
+        from PIL import Image, ImageDraw
+
+        if cls._base_image is None:
+            with Image.open(settings.OFFICE_MAP_PATH) as image:
+                cls._base_image = image.convert("RGB")
+
+        image = cls._base_image.copy()
+        draw = ImageDraw.Draw(image)
+        radius = settings.OCCUPANCY_MARKER_RADIUS
+        for i, x, y in cls._coordinates(layout):
+            if not layout.active_mask >> i & 1:
+                continue
+            color = OCCUPIED_COLOR if occupied_mask >> i & 1 else FREE_COLOR
+            draw.ellipse(
+                (x - radius, y - radius, x + radius, y + radius),
+                fill=color,
+                outline=OUTLINE_COLOR,
+                width=max(radius // 5, 1),
+            )
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=90)
+        return buffer.getvalue()
+
+    @classmethod
+    def enabled(cls, layout: SeatLayout) -> bool:
+        """Можно ли рисовать карту занятости (есть Pillow, карта и координаты мест)."""
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            return False
+        return os.path.exists(settings.OFFICE_MAP_PATH) and bool(
+            cls._coordinates(layout)
+        )
+
+    @classmethod
+    async def get_photo(
+        cls, layout: SeatLayout, occupied_mask: int
+    ) -> str | bytes | None:
+        """
+        Фото карты для маски занятых мест: file_id, если такое состояние уже
+        загружалось, иначе JPEG для загрузки (после отправки вызвать remember).
+        None - карта занятости недоступна, нужно отправить обычную карту офиса.
+        """
+        occupied_mask &= layout.active_mask
+        for _ in range(2):
+            file_id = cls._file_ids.get(occupied_mask)
+            if file_id:
+                cls._file_ids.move_to_end(occupied_mask)
+                cls._hits += 1
+                return file_id
+
+            uploading = cls._uploading.get(occupied_mask)
+            if uploading is None:
+                break
+            # такую же картинку прямо сейчас загружает другой запрос - ждем его file_id
+            try:
+                await asyncio.wait_for(asyncio.shield(uploading), timeout=10)
+            except Exception:
+                break
+
+        if not cls.enabled(layout):
+            return None
+
+        # следующие запросы с той же маской дождутся file_id этой загрузки
+        uploading = asyncio.get_running_loop().create_future()
+        cls._uploading[occupied_mask] = uploading
+        try:
+            photo = await asyncio.to_thread(cls._render, layout, occupied_mask)
+        except Exception:
+            logger.error("Occupancy map render failed", exc_info=True)
+            cls.remember(layout, occupied_mask, None)
+            return None
+
+        cls._renders += 1
+        return photo
+
+    @classmethod
+    def remember(cls, layout: SeatLayout, occupied_mask: int, message) -> None:
+        """
+        Запомнить file_id отправленной картинки (message - результат отправки/правки
+        сообщения, None при неудаче) и разбудить ожидающие запросы.
+        """
+        occupied_mask &= layout.active_mask
+        file_id = None
+        if message is not None and getattr(message, "photo", None):
+            file_id = message.photo[-1].file_id
+            if occupied_mask not in cls._file_ids:
+                cls._uploads += 1
+            cls._file_ids[occupied_mask] = file_id
+            cls._file_ids.move_to_end(occupied_mask)
+            while len(cls._file_ids) > settings.OCCUPANCY_MAP_CACHE_SIZE:
+                cls._file_ids.popitem(last=False)
+
+        uploading = cls._uploading.pop(occupied_mask, None)
+        if uploading is not None and not uploading.done():
+            uploading.set_result(file_id)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики карты занятости для отчета о готовности."""
+        return {
+            "states": len(cls._file_ids),
+            "renders": cls._renders,
+            "uploads": cls._uploads,
+            "hits": cls._hits,
+        }
@@ -0,0 +1,242 @@
+import asyncio
+import datetime
+import random
+import time
+from typing import Awaitable, Callable
+
+from bot.dependencies import logger
+from services.calendar_service import MOSCOW_TZ
+from services.storage import get_storage
+
+# (минимум, максимум) полей cron: минуты, часы, дни месяца, месяцы, дни недели (0 и 7 - вс)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+
+class CronSpec:
+    """
+    Расписание в формате cron "минуты часы дни_месяца месяцы дни_недели"
+    по московскому времени: *, списки через запятую, диапазоны a-b и шаг /n
+    (день недели 0 или 7 - воскресенье). Если заданы и дни месяца, и дни недели,
+    подходит любой из них, как в cron.
+    """
+
+    def __init__(self, spec: str):
+        fields = spec.split()
+        if len(fields) != len(CRON_FIELDS):
+            raise ValueError(f"Неверное расписание cron: {spec!r}")
+        self.spec = spec
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse_field(field, low, high)
+            for field, (low, high) in zip(fields, CRON_FIELDS)
+        )
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> frozenset[int]:
+        values = set()
+        for part in field.split(","):
+            range_part, _, step = part.partition("/")
+            if range_part == "*":
+                start, end = low, high
+            elif "-" in range_part:
+                start, end = map(int, range_part.split("-", 1))
+            else:
+                start = end = int(range_part)
+                if step:
+                    end = high
+            if start < low or end > high or start > end:
+                raise ValueError(f"Неверное поле cron: {field!r}")
+            values.update(range(start, end + 1, int(step) if step else 1))
+        # в днях недели 7 - тоже воскресенье
+        if high == 7 and 7 in values:
+            values = (values - {7}) | {0}
+        return frozenset(values)
+
+    def _day_matches(self, moment: datetime.datetime) -> bool:
+        in_days = moment.day in self.days
+        # weekday() считает с понедельника, cron - с воскресенья
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, moment: datetime.datetime) -> datetime.datetime:
+        """Ближайшее срабатывание строго после moment (по московскому времени)."""
+        candidate = moment.astimezone(MOSCOW_TZ).replace(
+            second=0, microsecond=0
+        ) + datetime.timedelta(minutes=1)
+        # поля, которые не подходят, пропускаются целиком: месяц, день, час
+        for _ in range(100000):
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(
+                    year=candidate.year + year,
+                    month=month + 1,
+                    day=1,
+                    hour=0,
+                    minute=0,
+                )
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + datetime.timedelta(
+                    days=1
+                )
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + datetime.timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += datetime.timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Расписание cron не срабатывает: {self.spec!r}")
+
+
+class Scheduler:
+    """
+    Планировщик фоновых задач внутри процесса бота (очистка бронирований,
+    сводки, жеребьевки): задачи работают на общем прогретом пуле БД и боте
+    вместо запуска отдельного интерпретатора по cron. У каждой задачи
+    расписание cron и случайная задержка запуска до jitter_seconds (чтобы
+    задачи и реплики не стартовали в одну секунду). Пока задача выполняется,
+    ее следующие срабатывания пропускаются; на все реплики задачу выполняет
+    одна - та, что взяла блокировку (advisory lock) и первой записала запуск
+    по этому срабатыванию в историю (job_runs). Задачи с exclusive=False
+    (обновление локальных кэшей) выполняются на каждой реплике без блокировки
+    и истории.
+    """
+
+    # имя -> параметры задачи (spec, func, ...) и ее состояние (running, next_run, skipped)
+    _jobs: dict[str, dict] = {}
+    # ссылки на циклы и запуски задач, чтобы их не собрал GC
+    _tasks: set = set()
+
+    @classmethod
+    def add_job(
+        cls,
+        name: str,
+        spec: str,
+        func: Callable[[datetime.datetime], Awaitable[str | None]],
+        jitter_seconds: float = 0,
+        exclusive: bool = True,
+    ) -> None:
+        """
+        Зарегистрировать задачу: корутина-функция func получает срабатывание
+        расписания и возвращает краткий итог для истории запусков.
+        """
+        cls._jobs[name] = {
+            "spec": CronSpec(spec),
+            "func": func,
+            "jitter_seconds": jitter_seconds,
+            "exclusive": exclusive,
+            "running": False,
+            "next_run": None,
+            "skipped": 0,
+        }
+
+    @classmethod
+    def _spawn(cls, coroutine: Awaitable) -> None:
+        task = asyncio.ensure_future(coroutine)
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    def start(cls) -> None:
+        """Запустить циклы всех зарегистрированных задач."""
+        for name in cls._jobs:
+            cls._spawn(cls._run_loop(name))
+
+    @classmethod
+    async def _run_loop(cls, name: str) -> None:
+        job = cls._jobs[name]
+        while True:
+            now = datetime.datetime.now(MOSCOW_TZ)
+            scheduled_for = job["spec"].next_after(now)
+            job["next_run"] = scheduled_for
+            delay = (scheduled_for - now).total_seconds()
+            await asyncio.sleep(delay + random.uniform(0, job["jitter_seconds"]))
+            # таймер мог сработать чуть раньше срабатывания - тогда досыпаем
+            if datetime.datetime.now(MOSCOW_TZ) < scheduled_for:
+                continue
+            if job["running"]:
+                job["skipped"] += 1
+                logger.warning(f"Job {name} is still running, {scheduled_for} skipped")
+                continue
+            cls._spawn(cls.run(name, scheduled_for))
+
+    @classmethod
+    async def run(cls, name: str, scheduled_for: datetime.datetime) -> str | None:
+        """
+        Выполнить задачу по срабатыванию расписания под блокировкой с записью
+        в историю; None - задачу выполняет другая реплика или она уже выполнена.
+        """
+        job = cls._jobs[name]
+        job["running"] = True
+        try:
+            if not job["exclusive"]:
+                return await job["func"](scheduled_for)
+
+            async with get_storage().jobs.lock(name) as acquired:
+                if not acquired:
+                    return None
+                run_id = await get_storage().jobs.start_run(name, scheduled_for)
+                if run_id is None:
+                    return None
+
+                started = time.perf_counter()
+                try:
+                    detail, status = await job["func"](scheduled_for), "ok"
+                except Exception as e:
+                    logger.error(f"Job {name} failed", exc_info=True)
+                    detail, status = f"{type(e).__name__}: {e}", "error"
+                await get_storage().jobs.finish_run(
+                    run_id,
+                    status,
+                    round((time.perf_counter() - started) * 1000),
+                    detail,
+                )
+                return detail
+
+        except Exception:
+            logger.error(f"Job {name} could not be run", exc_info=True)
+            return None
+        finally:
+            job["running"] = False
+
+    @classmethod
+    async def get_overview(cls) -> list[dict]:
+        """
+        Задачи для панели администратора: name, spec, next_run, running
+        и последний запуск last_run (None - запусков не было).
+        """
+        last_runs = {
+            run["job_name"]: run for run in await get_storage().jobs.get_last_runs()
+        }
+        return [
+            {
+                "name": name,
+                "spec": job["spec"].spec,
+                "next_run": job["next_run"],
+                "running": job["running"],
+                "last_run": last_runs.get(name),
+            }
+            for name, job in cls._jobs.items()
+            if job["exclusive"]
+        ]
+
+    @classmethod
+    async def purge_history(cls, days: int) -> int:
+        """Удалить историю запусков старше days дней."""
+        return await get_storage().jobs.delete_older_than(
+            datetime.datetime.now(MOSCOW_TZ) - datetime.timedelta(days=days)
+        )
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики задач для отчета о готовности."""
+        return {
+            name: {
+                "running": job["running"],
+                "next_run": job["next_run"].isoformat() if job["next_run"] else None,
+                "skipped": job["skipped"],
+            }
+            for name, job in cls._jobs.items()
+        }
@@ -0,0 +1,199 @@
+import datetime
+import re
+import time
+from typing import Awaitable, Callable
+
+from bot.dependencies import logger
+from services.calendar_service import CalendarService
+from services.seat_registry import SeatLayout, SeatRegistry
+from services.seat_watch_service import SeatWatchService
+from services.storage import get_storage
+from services.visitors_cache import VisitorsCache
+from utils.concurrency import SingleFlight
+
+# дни недели новых предпочтений битовой маской (пн - бит 0): пн-пт
+DEFAULT_WEEKDAYS = 0b0011111
+# сколько мест можно указать в предпочтениях
+MAX_PREFERRED_SEATS = 5
+
+
+class SeatAllocationService:
+    """
+    Постоянные предпочтения мест (места по убыванию предпочтения и дни недели)
+    и их пакетное распределение. Когда в окно планирования входит новая дата,
+    распределение выполняется один раз при смене суток: предпочтения на эту
+    дату читаются одним запросом, места назначаются в памяти, бронирования
+    создаются одной вставкой в одной транзакции, а сотрудники уведомляются
+    пачкой через notifier - вместо гонки за местами в полночь.
+    При спросе на одно место очередность ротируется: раньше выбирает тот,
+    кто дольше не получал место при распределении.
+    """
+
+    # корутина-функция (дата, получившие место, не получившие) - уведомление
+    _notifier: Callable[[datetime.date, list[dict], list[dict]], Awaitable] | None = (
+        None
+    )
+    _last_run: dict | None = None
+
+    @staticmethod
+    async def _get_user_id(tg_id: int) -> int:
+        user = await get_storage().users.get_by_tg_id(tg_id)
+        if user is None:
+            raise ValueError("Пользователь не зарегистрирован.")
+        return user.id
+
+    @staticmethod
+    async def get_preference(tg_id: int) -> dict | None:
+        """Предпочтения пользователя: seat_numbers, weekdays (None - не заданы)."""
+        user_id = await SeatAllocationService._get_user_id(tg_id)
+        return await get_storage().preferences.get(user_id)
+
+    @staticmethod
+    def parse_seats(text: str) -> list[str]:
+        """
+        Номера мест из текста через запятую или пробел в порядке предпочтения
+        (ValueError, если места нет среди активных или их больше MAX_PREFERRED_SEATS).
+        """
+        layout = SeatRegistry.layout()
+        active_seats = set(layout.labels_of(layout.active_mask))
+        # повторы убираются с сохранением порядка предпочтения
+        seat_numbers = list(
+            dict.fromkeys(seat for seat in re.split(r"[,;\s]+", text) if seat)
+        )
+        unknown = [seat for seat in seat_numbers if seat not in active_seats]
+        if not seat_numbers or unknown or len(seat_numbers) > MAX_PREFERRED_SEATS:
+            raise ValueError(f"Неверный список мест: {text!r}")
+        return seat_numbers
+
+    @staticmethod
+    async def save_seats(tg_id: int, seat_numbers: list[str]) -> dict:
+        """Задать места пользователя (дни недели сохраняются, для новых - пн-пт)."""
+        user_id = await SeatAllocationService._get_user_id(tg_id)
+        preference = await get_storage().preferences.get(user_id)
+        weekdays = preference["weekdays"] if preference else DEFAULT_WEEKDAYS
+        await get_storage().preferences.save(user_id, seat_numbers, weekdays)
+        return {"seat_numbers": seat_numbers, "weekdays": weekdays}
+
+    @staticmethod
+    async def toggle_weekday(tg_id: int, weekday: int) -> dict | None:
+        """Включить или выключить день недели (0 - пн) в предпочтениях пользователя."""
+        user_id = await SeatAllocationService._get_user_id(tg_id)
+        preference = await get_storage().preferences.get(user_id)
+        if preference is None:
+            return None
+        preference["weekdays"] ^= 1 << weekday
+        await get_storage().preferences.save(
+            user_id, preference["seat_numbers"], preference["weekdays"]
+        )
+        return preference
+
+    @staticmethod
+    async def delete_preference(tg_id: int) -> None:
+        """Удалить предпочтения пользователя."""
+        user_id = await SeatAllocationService._get_user_id(tg_id)
+        await get_storage().preferences.delete(user_id)
+
+    @staticmethod
+    def solve(
+        preferences: list[dict], layout: SeatLayout, occupied_mask: int
+    ) -> tuple[list[tuple[int, str]], list[dict]]:
+        """
+        Распределить места в памяти: сотрудники по очереди (раньше - кто дольше
+        не получал место, затем по user_id) берут первое свободное место из своего
+        списка. Возвращает назначения (user_id, место) и не получивших место.
+        """
+        free_mask = layout.free_mask(occupied_mask)
+        assignments, missed = [], []
+        for preference in sorted(
+            preferences,
+            key=lambda p: (p["last_allocated_on"] or datetime.date.min, p["user_id"]),
+        ):
+            for seat_number in preference["seat_numbers"]:
+                seat_bit = layout.mask_of((seat_number,))
+                if seat_bit & free_mask:
+                    free_mask &= ~seat_bit
+                    assignments.append((preference["user_id"], seat_number))
+                    break
+            else:
+                missed.append(preference)
+        return assignments, missed
+
+    @classmethod
+    def set_notifier(
+        cls, notifier: Callable[[datetime.date, list[dict], list[dict]], Awaitable]
+    ) -> None:
+        """Задать уведомление сотрудников о результатах распределения."""
+        cls._notifier = notifier
+
+    @classmethod
+    async def allocate_date(cls, booking_date: datetime.date) -> dict:
+        """
+        Распределить места на дату по предпочтениям (уже занятые и закрепленные
+        места и уже забронировавшие сотрудники не затрагиваются).
+        Возвращает отчет: date, preferences, allocated, missed, elapsed_ms.
+        """
+        started = time.perf_counter()
+        preferences = await get_storage().preferences.get_for_date(booking_date)
+        allocated, missed = [], []
+
+        if preferences:
+            layout = SeatRegistry.layout()
+            occupied_seats = await get_storage().bookings.get_occupied_seats(
+                booking_date, booking_date
+            )
+            occupied_mask = layout.mask_of(
+                seat
+                for seat_date, seat in [
+                    *occupied_seats,
+                    *SeatWatchService.held_seats(),
+                ]
+                if seat_date == booking_date
+            )
+            assignments, missed = cls.solve(preferences, layout, occupied_mask)
+
+            created = dict(
+                await get_storage().preferences.allocate(booking_date, assignments)
+            )
+            if created:
+                VisitorsCache.bump(booking_date)
+                SingleFlight.invalidate("bookings")
+            allocated = [
+                {**preference, "seat_number": created[preference["user_id"]]}
+                for preference in preferences
+                if preference["user_id"] in created
+            ]
+            # назначенное место успели занять между чтением и вставкой
+            assigned = {user_id for user_id, seat_number in assignments}
+            missed += [
+                preference
+                for preference in preferences
+                if preference["user_id"] in assigned
+                and preference["user_id"] not in created
+            ]
+
+        report = {
+            "date": booking_date.isoformat(),
+            "preferences": len(preferences),
+            "allocated": len(allocated),
+            "missed": len(missed),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        cls._last_run = report
+
+        if cls._notifier is not None and (allocated or missed):
+            await cls._notifier(booking_date, allocated, missed)
+        return report
+
+    @classmethod
+    async def allocate_new_date(cls) -> None:
+        """Хук смены суток: распределить места на только что открывшуюся дату."""
+        report = await cls.allocate_date(CalendarService.last_date())
+        logger.info(f"Seat allocation: {report}")
+
+    @classmethod
+    def stats(cls) -> dict | None:
+        """Отчет последнего распределения для отчета о готовности."""
+        return cls._last_run
+
+
+CalendarService.add_rollover_hook(SeatAllocationService.allocate_new_date)
@@ -0,0 +1,159 @@
+from array import array
+
+from sqlalchemy import select
+
+from bot.dependencies import logger
+from config.settings import settings
+from db.database import get_db_session
+from db.models import Seat
+
+
+class SeatLayout:
+    """
+    Компактное представление мест офиса. Место i соответствует биту 1 << i,
+    занятость на дату - целое число (битовая маска), поэтому "свободные места",
+    "офис заполнен" и "места в зоне" считаются битовыми операциями.
+    """
+
+    __slots__ = (
+        "labels",
+        "index",
+        "zone_names",
+        "zone_ids",
+        "floors",
+        "attributes",
+        "active_mask",
+        "zone_masks",
+    )
+
+    def __init__(self, seats: list[dict]):
+        size = max((seat["seat_index"] for seat in seats), default=-1) + 1
+        labels = [None] * size
+        zone_names = [None]  # zone_id 0 - место без зоны
+        zone_ids = array("H", [0] * size)
+        floors = array("h", [0] * size)
+        attributes = [None] * size
+        active_mask = 0
+        zone_masks = {}
+
+        for seat in seats:
+            i = seat["seat_index"]
+            labels[i] = seat["seat_number"]
+            floors[i] = seat.get("floor") or 0
+            attributes[i] = seat.get("attributes") or {}
+            zone = seat.get("zone")
+            if zone not in zone_names:
+                zone_names.append(zone)
+            zone_ids[i] = zone_names.index(zone)
+            if seat.get("is_active", True):
+                active_mask |= 1 << i
+                zone_masks[zone] = zone_masks.get(zone, 0) | (1 << i)
+
+        self.labels = tuple(labels)
+        self.index = {label: i for i, label in enumerate(labels) if label is not None}
+        self.zone_names = tuple(zone_names)
+        self.zone_ids = zone_ids
+        self.floors = floors
+        self.attributes = tuple(attributes)
+        self.active_mask = active_mask
+        self.zone_masks = zone_masks
+
+    @property
+    def capacity(self) -> int:
+        """Количество активных мест."""
+        return self.active_mask.bit_count()
+
+    def mask_of(self, seat_numbers) -> int:
+        """Битовая маска по списку номеров мест (неизвестные места игнорируются)."""
+        mask = 0
+        for seat_number in seat_numbers:
+            i = self.index.get(seat_number)
+            if i is not None:
+                mask |= 1 << i
+        return mask
+
+    def labels_of(self, mask: int) -> list[str]:
+        """Номера мест по битовой маске в порядке индексов."""
+        labels = []
+        while mask:
+            low_bit = mask & -mask
+            labels.append(self.labels[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return labels
+
+    def free_mask(self, occupied_mask: int) -> int:
+        """Маска свободных активных мест."""
+        return self.active_mask & ~occupied_mask
+
+    def is_full(self, occupied_mask: int) -> bool:
+        """Заняты ли все активные места."""
+        return not self.free_mask(occupied_mask)
+
+    def zone_of(self, seat_number: str) -> str | None:
+        """Зона места (None - место без зоны)."""
+        return self.zone_names[self.zone_ids[self.index[seat_number]]]
+
+    def free_in_zone(self, zone: str | None, occupied_mask: int) -> list[str]:
+        """Свободные места зоны."""
+        return self.labels_of(self.zone_masks.get(zone, 0) & ~occupied_mask)
+
+    def group_by_zone(self, seat_numbers: list[str]) -> dict[str | None, list[str]]:
+        """Сгруппировать номера мест по зонам (порядок зон - порядок их появления)."""
+        groups = {}
+        for seat_number in seat_numbers:
+            groups.setdefault(self.zone_of(seat_number), []).append(seat_number)
+        return groups
+
+
+class SeatRegistry:
+    """
+    Реестр мест офиса: загружается один раз из таблицы seats.
+    Пока реестр не загружен (или таблица пуста), места берутся из settings.EXISTING_SEATS_LIST.
+    """
+
+    _layout: SeatLayout | None = None
+
+    @staticmethod
+    def _layout_from_settings() -> SeatLayout:
+        return SeatLayout(
+            [
+                {
+                    "seat_index": i,
+                    "seat_number": seat_number,
+                    "zone": settings.SEAT_ZONES.get(seat_number),
+                    "attributes": settings.SEAT_COORDINATES.get(seat_number),
+                }
+                for i, seat_number in enumerate(settings.EXISTING_SEATS_LIST)
+            ]
+        )
+
+    @classmethod
+    async def load(cls) -> SeatLayout:
+        """Загрузить реестр мест из БД (при ошибке - из настроек)."""
+        try:
+            async for session in get_db_session():
+                result = await session.execute(select(Seat).order_by(Seat.seat_index))
+                seats = [
+                    {
+                        "seat_index": seat.seat_index,
+                        "seat_number": seat.seat_number,
+                        "zone": seat.zone,
+                        "floor": seat.floor,
+                        "attributes": seat.attributes,
+                        "is_active": seat.is_active,
+                    }
+                    for seat in result.scalars().all()
+                ]
+            cls._layout = SeatLayout(seats) if seats else cls._layout_from_settings()
+        except Exception:
+            logger.error("Seat registry load failed", exc_info=True)
+            cls._layout = cls._layout_from_settings()
+
+        return cls._layout
+
+    @classmethod
+    def layout(cls) -> SeatLayout:
+        """Текущее представление мест офиса."""
+        if cls._layout is None:
+            cls._layout = cls._layout_from_settings()
+        return cls._layout
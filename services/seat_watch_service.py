@@ -0,0 +1,168 @@
+import asyncio
+import datetime
+import time
+from typing import Awaitable, Callable, Iterable
+
+from bot.dependencies import logger
+from config.settings import settings
+from services.calendar_service import CalendarService
+from services.errors import BookingConflictError
+from services.storage import get_storage
+from utils.concurrency import SingleFlight
+
+# заглушка в _holds на время подготовки предложения: второе предложение того же
+# места не начинается, а истекшее время закрепления не скрывает место от других
+OFFERING = (None, 0.0)
+
+
+class SeatWatchService:
+    """
+    Ожидание свободного места на занятую дату. Сотрудник встает в очередь
+    ожидания на дату (seat_watches), и когда место на эту дату освобождается
+    (удаление брони, отвязка или удаление сотрудника), оно предлагается
+    первому в очереди: место закрепляется за ним на settings.SEAT_HOLD_SECONDS
+    (другие его не видят и не могут занять), а ему отправляется уведомление
+    с кнопкой бронирования. Если он не успел, место предлагается следующему.
+    Ожидание, по которому отправлено предложение, из очереди удаляется;
+    ожидания на прошедшие даты удаляются при смене суток.
+    """
+
+    # (дата, место) -> (user_id, время окончания закрепления по time.monotonic);
+    # OFFERING - предложение места готовится (место для других еще свободно)
+    _holds: dict[tuple[datetime.date, str], tuple[int | None, float]] = {}
+    # корутина-функция (chat_id, дата, место) - уведомление о свободном месте
+    _notifier: Callable[[int, datetime.date, str], Awaitable] | None = None
+    # ссылки на фоновые задачи предложений, чтобы их не собрал GC
+    _tasks: set = set()
+
+    _offered = 0
+    _claimed = 0
+    _expired = 0
+
+    @staticmethod
+    async def watch(tg_id: int, booking_date: datetime.date) -> bool:
+        """Поставить пользователя в очередь ожидания места на дату (False - уже в ней)."""
+        if CalendarService.index_of(booking_date) is None:
+            raise ValueError("Дата вне окна планирования.")
+        user = await get_storage().users.get_by_tg_id(tg_id)
+        if user is None:
+            raise ValueError("Пользователь не зарегистрирован.")
+        return await get_storage().watches.add(booking_date, user.id)
+
+    @classmethod
+    def set_notifier(
+        cls, notifier: Callable[[int, datetime.date, str], Awaitable]
+    ) -> None:
+        """Задать отправку уведомлений о свободном месте (без нее места не предлагаются)."""
+        cls._notifier = notifier
+
+    @classmethod
+    def held_seats(cls) -> list[tuple[datetime.date, str]]:
+        """Закрепленные сейчас места (дата, место): для остальных они заняты."""
+        now = time.monotonic()
+        return [seat for seat, hold in cls._holds.items() if hold[1] > now]
+
+    @classmethod
+    def check_hold(
+        cls, booking_date: datetime.date, seat_number: str | None, user_id: int
+    ) -> None:
+        """BookingConflictError, если место закреплено за другим сотрудником."""
+        hold = cls._holds.get((booking_date, seat_number))
+        if hold is not None and hold[0] != user_id and hold[1] > time.monotonic():
+            raise BookingConflictError
+
+    @classmethod
+    def claim(
+        cls, booking_date: datetime.date, seat_number: str | None, user_id: int
+    ) -> None:
+        """Место забронировано: закрепление за user_id больше не нужно."""
+        hold = cls._holds.get((booking_date, seat_number))
+        if hold is not None and hold[0] == user_id:
+            del cls._holds[(booking_date, seat_number)]
+            cls._claimed += 1
+
+    @classmethod
+    def seats_freed(cls, seats: Iterable[tuple[datetime.date, str | None]]) -> None:
+        """Места освободились: предложить места дат окна ожидающим (в фоне)."""
+        for booking_date, seat_number in seats:
+            if seat_number and CalendarService.index_of(booking_date) is not None:
+                cls._spawn(cls._offer(booking_date, seat_number))
+
+    @classmethod
+    def _spawn(cls, coroutine: Awaitable) -> None:
+        task = asyncio.ensure_future(coroutine)
+        cls._tasks.add(task)
+        task.add_done_callback(cls._tasks.discard)
+
+    @classmethod
+    async def _offer(cls, booking_date: datetime.date, seat_number: str) -> None:
+        """Закрепить место за первым ожидающим на дату и уведомить его."""
+        seat = (booking_date, seat_number)
+        if cls._notifier is None or seat in cls._holds:
+            return
+        # место занимается заглушкой до первого await: параллельное предложение
+        # того же места (повторное освобождение, истечение) его не предложит
+        cls._holds[seat] = OFFERING
+        try:
+            # место могли занять обычным бронированием до предложения
+            occupied = await get_storage().bookings.get_occupied_seats(
+                booking_date, booking_date
+            )
+            if seat in occupied:
+                return
+
+            watcher = await get_storage().watches.take_first(booking_date)
+            if watcher is None:
+                return
+
+            hold_seconds = settings.SEAT_HOLD_SECONDS
+            cls._holds[seat] = (
+                watcher["user_id"],
+                time.monotonic() + hold_seconds,
+            )
+            SingleFlight.invalidate("bookings")
+            asyncio.get_running_loop().call_later(
+                hold_seconds, cls._expire, booking_date, seat_number, watcher["user_id"]
+            )
+            cls._offered += 1
+            await cls._notifier(watcher["chat_id"], booking_date, seat_number)
+
+        except Exception:
+            logger.error("Seat watch offer failed", exc_info=True)
+        finally:
+            if cls._holds.get(seat) is OFFERING:
+                del cls._holds[seat]
+
+    @classmethod
+    def _expire(
+        cls, booking_date: datetime.date, seat_number: str, user_id: int
+    ) -> None:
+        """Закрепление истекло без бронирования: место предлагается следующему."""
+        hold = cls._holds.get((booking_date, seat_number))
+        if hold is None or hold[0] != user_id:
+            return
+        del cls._holds[(booking_date, seat_number)]
+        cls._expired += 1
+        SingleFlight.invalidate("bookings")
+        cls._spawn(cls._offer(booking_date, seat_number))
+
+    @classmethod
+    async def purge_past_watches(cls) -> None:
+        """Хук смены суток: ожидания и закрепления на прошедшие даты больше не нужны."""
+        today = CalendarService.today()
+        for seat in [seat for seat in cls._holds if seat[0] < today]:
+            del cls._holds[seat]
+        await get_storage().watches.delete_older_than(today)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики ожидания мест для отчета о готовности."""
+        return {
+            "holds": len(cls.held_seats()),
+            "offered": cls._offered,
+            "claimed": cls._claimed,
+            "expired": cls._expired,
+        }
+
+
+CalendarService.add_rollover_hook(SeatWatchService.purge_past_watches)
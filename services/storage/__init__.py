@@ -0,0 +1,29 @@
+from config.settings import settings
+
+from .base import *
+
+_storage: Storage | None = None
+
+
+def get_storage() -> Storage:
+    """
+    Текущее хранилище сервисов. По умолчанию выбирается по settings.STORAGE_BACKEND
+    при первом обращении (реализация импортируется только тогда).
+    """
+    global _storage
+    if _storage is None:
+        if settings.STORAGE_BACKEND == "memory":
+            from .memory import MemoryStorage
+
+            _storage = MemoryStorage()
+        else:
+            from .sql import SqlStorage
+
+            _storage = SqlStorage()
+    return _storage
+
+
+def set_storage(storage: Storage | None) -> None:
+    """Подменить хранилище (бенчмарки, проверки); None - снова выбрать по настройкам."""
+    global _storage
+    _storage = storage
@@ -0,0 +1,378 @@
+import datetime
+from abc import ABC, abstractmethod
+from typing import AsyncContextManager, AsyncIterator
+
+from db.models import Booking, User
+
+__all__ = [
+    "BookingStorage",
+    "UserStorage",
+    "DigestStorage",
+    "WatchStorage",
+    "PreferenceStorage",
+    "LotteryStorage",
+    "JobStorage",
+    "Storage",
+]
+
+
+class BookingStorage(ABC):
+    """
+    Хранилище бронирований. Любая реализация соблюдает инварианты таблицы bookings:
+    одно бронирование на место в дату, допустимые type, ФИО гостя для гостевых
+    бронирований, отсутствие места у *_candidate (иначе BookingConflictError).
+    """
+
+    @abstractmethod
+    async def get_user_booking_dates(
+        self, tg_id: int, booking_types: tuple[str, ...]
+    ) -> list[datetime.date]:
+        """Даты бронирований пользователя с tg_id указанных типов."""
+
+    @abstractmethod
+    async def get_occupied_seats(
+        self, date_from: datetime.date, date_to: datetime.date
+    ) -> list[tuple[datetime.date, str]]:
+        """Пары (дата, место) занятых мест в диапазоне дат включительно."""
+
+    @abstractmethod
+    async def create(
+        self,
+        *,
+        booking_date: datetime.date,
+        user_id: int,
+        seat_number: str | None,
+        booking_type: str,
+        guest_full_name: str | None,
+    ) -> Booking:
+        """Создать бронирование."""
+
+    @abstractmethod
+    async def delete(self, booking_id: int) -> Booking:
+        """Удалить бронирование, вернуть удаленное (ValueError, если его нет)."""
+
+    @abstractmethod
+    async def get_user_future(
+        self, user_id: int, since: datetime.date
+    ) -> list[Booking]:
+        """Бронирования пользователя начиная с даты since, по возрастанию даты."""
+
+    @abstractmethod
+    def stream_future(
+        self, since: datetime.date, batch_size: int
+    ) -> AsyncIterator[dict]:
+        """
+        Потоково отдать бронирования начиная с since (по дате и id):
+        booking_id, booking_date, full_name (гостя или владельца), seat_number, type.
+        Пачки по batch_size читаются по очереди, соединение с БД между ними
+        (пока получатель обрабатывает строки) не удерживается.
+        """
+
+    @abstractmethod
+    async def get_dates_with_bookings(
+        self, since: datetime.date
+    ) -> list[datetime.date]:
+        """Уникальные даты бронирований начиная с since, по возрастанию."""
+
+    @abstractmethod
+    async def get_visitors_by_date(self, date: datetime.date) -> list[dict]:
+        """Бронирования на дату (seat_number, type, full_name) по номеру места."""
+
+    @abstractmethod
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        """Удалить бронирования до cutoff_date, вернуть их количество."""
+
+
+class UserStorage(ABC):
+    """
+    Хранилище сотрудников. Инварианты таблицы users: full_name, username, tg_id,
+    chat_id уникальны; удаление сотрудника удаляет его бронирования.
+    """
+
+    @abstractmethod
+    async def get_by_tg_id(self, tg_id: int) -> User | None:
+        """Сотрудник по Telegram ID."""
+
+    @abstractmethod
+    async def get_by_id(self, user_id: int) -> User | None:
+        """Сотрудник по id."""
+
+    @abstractmethod
+    async def get_page(
+        self, registered: bool | None, page: int, page_size: int
+    ) -> tuple[list[User], int]:
+        """
+        Страница сотрудников по ФИО и их общее количество:
+        registered=True - с tg_id, False - без tg_id, None - все.
+        """
+
+    @abstractmethod
+    async def update(
+        self, user_id: int, username: str | None, tg_id: int | None, chat_id: int | None
+    ) -> User:
+        """Записать Telegram-данные сотрудника."""
+
+    @abstractmethod
+    async def untie(self, user_id: int) -> list[tuple[datetime.date, str]]:
+        """
+        Удалить бронирования, подписку, ожидания и предпочтения мест сотрудника,
+        обнулить его Telegram-данные. Возвращает освободившиеся места (дата, место).
+        """
+
+    @abstractmethod
+    async def delete(self, user_id: int) -> list[tuple[datetime.date, str]]:
+        """
+        Удалить сотрудника вместе с бронированиями.
+        Возвращает освободившиеся места (дата, место).
+        """
+
+    @abstractmethod
+    async def add(self, full_name: str) -> User:
+        """Добавить сотрудника (ValueError, если ФИО уже есть)."""
+
+    @abstractmethod
+    async def sync_full_names(
+        self, full_names: list[str], prune: bool, dry_run: bool
+    ) -> dict:
+        """
+        Добавить отсутствующие ФИО, при prune удалить лишних сотрудников.
+        Возвращает added, removed (отсортированные ФИО), total, dry_run
+        и freed_seats - места (дата, место) удаленных бронирований.
+        """
+
+    @abstractmethod
+    def stream_all(self, batch_size: int) -> AsyncIterator[dict]:
+        """Потоково отдать всех сотрудников по ФИО: full_name, username, tg_id."""
+
+
+class DigestStorage(ABC):
+    """
+    Хранилище подписок на утреннюю сводку. Одна подписка на сотрудника;
+    отвязка Telegram-данных и удаление сотрудника удаляют его подписку.
+    """
+
+    @abstractmethod
+    async def get_send_hour(self, user_id: int) -> int | None:
+        """Час отправки сводки сотруднику (None - не подписан)."""
+
+    @abstractmethod
+    async def subscribe(self, user_id: int, send_hour: int) -> None:
+        """Подписать сотрудника или изменить час отправки."""
+
+    @abstractmethod
+    async def unsubscribe(self, user_id: int) -> None:
+        """Отменить подписку (без ошибки, если ее нет)."""
+
+    @abstractmethod
+    async def get_subscribers(self, send_hour: int) -> list[dict]:
+        """
+        Подписчики с часом отправки send_hour, у которых есть tg_id:
+        user_id и chat_id (chat_id сотрудника, иначе tg_id).
+        """
+
+
+class WatchStorage(ABC):
+    """
+    Хранилище ожиданий свободного места на дату (очередь FIFO по дате).
+    Одно ожидание на сотрудника в дату; отвязка Telegram-данных и удаление
+    сотрудника удаляют его ожидания.
+    """
+
+    @abstractmethod
+    async def add(self, booking_date: datetime.date, user_id: int) -> bool:
+        """Встать в очередь ожидания на дату (False - сотрудник уже в ней)."""
+
+    @abstractmethod
+    async def take_first(self, booking_date: datetime.date) -> dict | None:
+        """
+        Убрать из очереди и вернуть первого ожидающего на дату, у которого есть
+        tg_id и нет персонального бронирования на эту дату: user_id и chat_id
+        (chat_id сотрудника, иначе tg_id). None - таких ожидающих нет.
+        """
+
+    @abstractmethod
+    async def positions(
+        self, booking_date: datetime.date, user_ids: list[int]
+    ) -> dict[int, int]:
+        """
+        Места сотрудников в очереди ожидания на дату (с 1, в порядке постановки):
+        user_id -> место; не стоящих в очереди в ответе нет.
+        """
+
+    @abstractmethod
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        """Удалить ожидания на даты до cutoff_date, вернуть их количество."""
+
+
+class PreferenceStorage(ABC):
+    """
+    Хранилище постоянных предпочтений мест: одно на сотрудника, места по убыванию
+    предпочтения и дни недели битовой маской (пн - бит 0). Отвязка Telegram-данных
+    и удаление сотрудника удаляют его предпочтения.
+    """
+
+    @abstractmethod
+    async def get(self, user_id: int) -> dict | None:
+        """Предпочтения сотрудника: seat_numbers, weekdays (None - не заданы)."""
+
+    @abstractmethod
+    async def save(self, user_id: int, seat_numbers: list[str], weekdays: int) -> None:
+        """Задать или заменить предпочтения сотрудника."""
+
+    @abstractmethod
+    async def delete(self, user_id: int) -> None:
+        """Удалить предпочтения (без ошибки, если их нет)."""
+
+    @abstractmethod
+    async def get_for_date(self, booking_date: datetime.date) -> list[dict]:
+        """
+        Предпочтения на день недели даты сотрудников с tg_id, у которых еще нет
+        персонального бронирования на дату: user_id, chat_id (chat_id сотрудника,
+        иначе tg_id), seat_numbers, last_allocated_on.
+        """
+
+    @abstractmethod
+    async def allocate(
+        self, booking_date: datetime.date, assignments: list[tuple[int, str]]
+    ) -> list[tuple[int, str]]:
+        """
+        Одной транзакцией создать персональные бронирования (user_id, место)
+        на дату одной вставкой и отметить дату распределения получившим место.
+        Занятые места и сотрудники, у которых уже есть персональное бронирование
+        на дату, пропускаются. Возвращает созданные пары (user_id, место).
+        """
+
+
+class LotteryStorage(ABC):
+    """
+    Хранилище жеребьевок мест на даты с повышенным спросом: дата жеребьевки
+    (окончание приема заявок, зерно, время проведения) и заявки сотрудников -
+    одна строка на сотрудника, места при приеме заявок не затрагиваются.
+    Отвязка Telegram-данных и удаление сотрудника удаляют его заявки.
+    """
+
+    @abstractmethod
+    async def open(
+        self, booking_date: datetime.date, cutoff_at: datetime.datetime, seed: int
+    ) -> bool:
+        """Объявить жеребьевку на дату (False - на дату она уже объявлена)."""
+
+    @abstractmethod
+    async def cancel(self, booking_date: datetime.date) -> bool:
+        """
+        Отменить непроведенную жеребьевку вместе с заявками
+        (False - жеребьевки нет или она уже проведена).
+        """
+
+    @abstractmethod
+    async def get_pending(self) -> list[dict]:
+        """
+        Непроведенные жеребьевки по возрастанию даты:
+        booking_date, cutoff_at, seed, requests (число заявок).
+        """
+
+    @abstractmethod
+    async def add_request(self, booking_date: datetime.date, user_id: int) -> bool:
+        """
+        Подать заявку на непроведенную жеребьевку
+        (False - заявка уже подана или жеребьевки нет).
+        """
+
+    @abstractmethod
+    async def remove_request(self, booking_date: datetime.date, user_id: int) -> bool:
+        """Отозвать заявку на непроведенную жеребьевку (False - заявки нет)."""
+
+    @abstractmethod
+    async def get_requests(
+        self, booking_date: datetime.date, attended_since: datetime.date
+    ) -> list[dict]:
+        """
+        Заявки на дату сотрудников с tg_id, у которых еще нет персонального
+        бронирования на дату: user_id, chat_id (chat_id сотрудника, иначе tg_id),
+        attended (число персональных бронирований с attended_since до даты).
+        """
+
+    @abstractmethod
+    async def draw(
+        self, booking_date: datetime.date, results: list[tuple[int, str | None]]
+    ) -> list[tuple[int, str | None]] | None:
+        """
+        Одной транзакцией провести жеребьевку по результатам (user_id, место)
+        в порядке жеребьевки: получившим место - персональные бронирования
+        (их бронирования без места на дату удаляются), остальным - бронирования
+        без места (personal_candidate) и очередь ожидания места в том же порядке;
+        заявкам проставляется порядок, жеребьевке - время проведения.
+        Занятые места и сотрудники, у которых уже есть бронирование на дату,
+        пропускаются; бронирование без места не дублируется, но его владелец
+        без выигранного места встает в очередь ожидания. Возвращает пары
+        (user_id, место) созданных бронирований и (user_id, None) вставших
+        в очередь, None - жеребьевка уже проведена или отменена.
+        """
+
+    @abstractmethod
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        """Удалить жеребьевки с заявками на даты раньше cutoff_date, вернуть их число."""
+
+
+class JobStorage(ABC):
+    """
+    Хранилище фоновых задач: блокировка задачи на все реплики на время
+    выполнения и история запусков - один запуск на срабатывание расписания.
+    """
+
+    @abstractmethod
+    def lock(self, job_name: str) -> AsyncContextManager[bool]:
+        """
+        Контекстный менеджер блокировки задачи без ожидания: внутри - True,
+        если блокировка взята (задача сейчас не выполняется нигде еще).
+        """
+
+    @abstractmethod
+    async def start_run(
+        self, job_name: str, scheduled_for: datetime.datetime
+    ) -> int | None:
+        """
+        Записать начало запуска задачи по срабатыванию расписания, вернуть id запуска
+        (None - по этому срабатыванию задача уже запускалась).
+        """
+
+    @abstractmethod
+    async def finish_run(
+        self, run_id: int, status: str, duration_ms: int, detail: str | None
+    ) -> None:
+        """Записать окончание запуска: status (ok | error), длительность и итог."""
+
+    @abstractmethod
+    async def get_last_runs(self) -> list[dict]:
+        """
+        Последний запуск каждой задачи: job_name, scheduled_for, started_at,
+        finished_at, duration_ms, status, detail.
+        """
+
+    @abstractmethod
+    async def delete_older_than(self, cutoff: datetime.datetime) -> int:
+        """Удалить запуски, начатые раньше cutoff, вернуть их число."""
+
+
+class Storage:
+    """Набор хранилищ, с которым работают сервисы."""
+
+    name = "base"
+
+    def __init__(
+        self,
+        bookings: BookingStorage,
+        users: UserStorage,
+        digests: DigestStorage,
+        watches: WatchStorage,
+        preferences: PreferenceStorage,
+        lotteries: LotteryStorage,
+        jobs: JobStorage,
+    ):
+        self.bookings = bookings
+        self.users = users
+        self.digests = digests
+        self.watches = watches
+        self.preferences = preferences
+        self.lotteries = lotteries
+        self.jobs = jobs
@@ -0,0 +1,813 @@
+import asyncio
+import bisect
+import contextlib
+import datetime
+from typing import AsyncIterator
+
+from db.models import Booking, User
+from services.errors import BookingConflictError
+from services.storage.base import (
+    BookingStorage,
+    DigestStorage,
+    JobStorage,
+    LotteryStorage,
+    PreferenceStorage,
+    Storage,
+    UserStorage,
+    WatchStorage,
+)
+
+__all__ = [
+    "MemoryBookingStorage",
+    "MemoryUserStorage",
+    "MemoryDigestStorage",
+    "MemoryWatchStorage",
+    "MemoryPreferenceStorage",
+    "MemoryLotteryStorage",
+    "MemoryJobStorage",
+    "MemoryStorage",
+]
+
+BOOKING_TYPES = ("personal", "guest", "personal_candidate", "guest_candidate")
+GUEST_TYPES = ("guest", "guest_candidate")
+CANDIDATE_TYPES = ("personal_candidate", "guest_candidate")
+
+
+class _MemoryTables:
+    """
+    Таблицы users, bookings, digest_subscriptions, seat_watches, seat_preferences,
+    lottery_dates и lottery_requests в памяти процесса с индексами по аналогии с БД:
+    словари по уникальным полям, множества id по дате и по пользователю
+    и отсортированный список дат для выборок по диапазону.
+    """
+
+    def __init__(self):
+        self.users: dict[int, User] = {}
+        self.user_ids_by_full_name: dict[str, int] = {}
+        self.user_ids_by_tg_id: dict[int, int] = {}
+        self.user_ids_by_username: dict[str, int] = {}
+        self.user_ids_by_chat_id: dict[int, int] = {}
+        self.next_user_id = 1
+
+        self.bookings: dict[int, Booking] = {}
+        # уникальный индекс uq_booking_date_seat
+        self.booking_ids_by_date_seat: dict[tuple[datetime.date, str], int] = {}
+        self.booking_ids_by_date: dict[datetime.date, set[int]] = {}
+        self.booking_ids_by_user: dict[int, set[int]] = {}
+        self.dates: list[datetime.date] = []
+        self.next_booking_id = 1
+
+        # user_id -> час отправки утренней сводки
+        self.digest_hours: dict[int, int] = {}
+
+        # дата -> user_id ожидающих место в порядке постановки в очередь
+        self.watches_by_date: dict[datetime.date, dict[int, None]] = {}
+
+        # user_id -> {"seat_numbers", "weekdays", "last_allocated_on"}
+        self.preferences: dict[int, dict] = {}
+
+        # дата -> {"cutoff_at", "seed", "drawn_at", "requests": {user_id: порядок}}
+        self.lotteries: dict[datetime.date, dict] = {}
+
+    def dates_between(
+        self, date_from: datetime.date | None, date_to: datetime.date | None = None
+    ) -> list[datetime.date]:
+        """Даты с бронированиями в диапазоне включительно (None - без границы)."""
+        start = bisect.bisect_left(self.dates, date_from) if date_from else 0
+        end = bisect.bisect_right(self.dates, date_to) if date_to else len(self.dates)
+        return self.dates[start:end]
+
+    def insert_booking(self, booking: Booking) -> None:
+        booking.id = self.next_booking_id
+        self.next_booking_id += 1
+
+        self.bookings[booking.id] = booking
+        if booking.seat_number is not None:
+            self.booking_ids_by_date_seat[
+                (booking.booking_date, booking.seat_number)
+            ] = booking.id
+        if booking.booking_date not in self.booking_ids_by_date:
+            self.booking_ids_by_date[booking.booking_date] = set()
+            bisect.insort(self.dates, booking.booking_date)
+        self.booking_ids_by_date[booking.booking_date].add(booking.id)
+        self.booking_ids_by_user.setdefault(booking.user_id, set()).add(booking.id)
+
+    def remove_booking(self, booking_id: int) -> Booking | None:
+        booking = self.bookings.pop(booking_id, None)
+        if booking is None:
+            return None
+
+        if booking.seat_number is not None:
+            del self.booking_ids_by_date_seat[
+                (booking.booking_date, booking.seat_number)
+            ]
+        date_ids = self.booking_ids_by_date[booking.booking_date]
+        date_ids.discard(booking_id)
+        if not date_ids:
+            del self.booking_ids_by_date[booking.booking_date]
+            del self.dates[bisect.bisect_left(self.dates, booking.booking_date)]
+        user_ids = self.booking_ids_by_user[booking.user_id]
+        user_ids.discard(booking_id)
+        if not user_ids:
+            del self.booking_ids_by_user[booking.user_id]
+        return booking
+
+    def remove_user_bookings(self, user_id: int) -> list[tuple[datetime.date, str]]:
+        """
+        Каскадное удаление бронирований пользователя (ON DELETE CASCADE),
+        возвращает освободившиеся места (дата, место).
+        """
+        freed_seats = []
+        for booking_id in list(self.booking_ids_by_user.get(user_id, ())):
+            booking = self.remove_booking(booking_id)
+            if booking.seat_number is not None:
+                freed_seats.append((booking.booking_date, booking.seat_number))
+        return freed_seats
+
+    def has_personal_booking(self, user_id: int, booking_date: datetime.date) -> bool:
+        return any(
+            self.bookings[booking_id].booking_date == booking_date
+            and self.bookings[booking_id].type == "personal"
+            for booking_id in self.booking_ids_by_user.get(user_id, ())
+        )
+
+    def remove_user_watches(self, user_id: int) -> None:
+        for date in [
+            date
+            for date, user_ids in self.watches_by_date.items()
+            if user_id in user_ids
+        ]:
+            del self.watches_by_date[date][user_id]
+            if not self.watches_by_date[date]:
+                del self.watches_by_date[date]
+
+    def remove_user_lottery_requests(self, user_id: int) -> None:
+        for lottery in self.lotteries.values():
+            lottery["requests"].pop(user_id, None)
+
+    def owner_name(self, booking: Booking) -> str:
+        # Берем ФИО гостя, если есть, если нет - ФИО владельца брони
+        return booking.guest_full_name or self.users[booking.user_id].full_name
+
+
+class MemoryBookingStorage(BookingStorage):
+    """Бронирования в памяти процесса (для бенчмарков и проверок без БД)."""
+
+    def __init__(self, tables: _MemoryTables):
+        self._tables = tables
+
+    async def get_user_booking_dates(
+        self, tg_id: int, booking_types: tuple[str, ...]
+    ) -> list[datetime.date]:
+        user_id = self._tables.user_ids_by_tg_id.get(tg_id)
+        return [
+            self._tables.bookings[booking_id].booking_date
+            for booking_id in self._tables.booking_ids_by_user.get(user_id, ())
+            if self._tables.bookings[booking_id].type in booking_types
+        ]
+
+    async def get_occupied_seats(
+        self, date_from: datetime.date, date_to: datetime.date
+    ) -> list[tuple[datetime.date, str]]:
+        occupied = []
+        for date in self._tables.dates_between(date_from, date_to):
+            for booking_id in self._tables.booking_ids_by_date[date]:
+                seat_number = self._tables.bookings[booking_id].seat_number
+                if seat_number is not None:
+                    occupied.append((date, seat_number))
+        return occupied
+
+    async def create(
+        self,
+        *,
+        booking_date: datetime.date,
+        user_id: int,
+        seat_number: str | None,
+        booking_type: str,
+        guest_full_name: str | None,
+    ) -> Booking:
+        # те же проверки, что и ограничения таблицы bookings
+        if (
+            booking_type not in BOOKING_TYPES
+            or (booking_type in GUEST_TYPES and guest_full_name is None)
+            or ((booking_type in CANDIDATE_TYPES) != (seat_number is None))
+            or user_id not in self._tables.users
+            or (booking_date, seat_number) in self._tables.booking_ids_by_date_seat
+        ):
+            raise BookingConflictError
+
+        booking = Booking(
+            booking_date=booking_date,
+            user_id=user_id,
+            seat_number=seat_number,
+            type=booking_type,
+            guest_full_name=guest_full_name,
+            created_at=datetime.datetime.now(datetime.timezone.utc),
+        )
+        self._tables.insert_booking(booking)
+        return booking
+
+    async def delete(self, booking_id: int) -> Booking:
+        booking = self._tables.remove_booking(booking_id)
+        if booking is None:
+            raise ValueError
+        return booking
+
+    async def get_user_future(
+        self, user_id: int, since: datetime.date
+    ) -> list[Booking]:
+        bookings = [
+            self._tables.bookings[booking_id]
+            for booking_id in self._tables.booking_ids_by_user.get(user_id, ())
+            if self._tables.bookings[booking_id].booking_date >= since
+        ]
+        return sorted(bookings, key=lambda booking: booking.booking_date)
+
+    async def stream_future(
+        self, since: datetime.date, batch_size: int
+    ) -> AsyncIterator[dict]:
+        for date in self._tables.dates_between(since):
+            for booking_id in sorted(self._tables.booking_ids_by_date.get(date, ())):
+                booking = self._tables.bookings.get(booking_id)
+                if booking is None:
+                    continue
+                yield {
+                    "booking_id": booking.id,
+                    "booking_date": booking.booking_date,
+                    "full_name": self._tables.owner_name(booking),
+                    "seat_number": booking.seat_number,
+                    "type": booking.type,
+                }
+
+    async def get_dates_with_bookings(
+        self, since: datetime.date
+    ) -> list[datetime.date]:
+        return self._tables.dates_between(since)
+
+    async def get_visitors_by_date(self, date: datetime.date) -> list[dict]:
+        bookings = [
+            self._tables.bookings[booking_id]
+            for booking_id in self._tables.booking_ids_by_date.get(date, ())
+        ]
+        # как ORDER BY seat_number в PostgreSQL: бронирования без места в конце
+        bookings.sort(
+            key=lambda booking: (booking.seat_number is None, booking.seat_number or "")
+        )
+        return [
+            {
+                "seat_number": booking.seat_number,
+                "type": booking.type,
+                "full_name": self._tables.owner_name(booking),
+            }
+            for booking in bookings
+        ]
+
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        old_ids = [
+            booking_id
+            for date in self._tables.dates_between(None, cutoff_date)
+            if date < cutoff_date
+            for booking_id in self._tables.booking_ids_by_date[date]
+        ]
+        for booking_id in old_ids:
+            self._tables.remove_booking(booking_id)
+        return len(old_ids)
+
+
+class MemoryUserStorage(UserStorage):
+    """Сотрудники в памяти процесса (для бенчмарков и проверок без БД)."""
+
+    def __init__(self, tables: _MemoryTables):
+        self._tables = tables
+
+    def _index_user(self, user: User) -> None:
+        for index, value in (
+            (self._tables.user_ids_by_full_name, user.full_name),
+            (self._tables.user_ids_by_tg_id, user.tg_id),
+            (self._tables.user_ids_by_username, user.username),
+            (self._tables.user_ids_by_chat_id, user.chat_id),
+        ):
+            if value is not None:
+                index[value] = user.id
+
+    def _unindex_user(self, user: User) -> None:
+        for index, value in (
+            (self._tables.user_ids_by_full_name, user.full_name),
+            (self._tables.user_ids_by_tg_id, user.tg_id),
+            (self._tables.user_ids_by_username, user.username),
+            (self._tables.user_ids_by_chat_id, user.chat_id),
+        ):
+            if value is not None:
+                index.pop(value, None)
+
+    def _insert_user(self, full_name: str) -> User:
+        user = User(
+            id=self._tables.next_user_id,
+            full_name=full_name,
+            username=None,
+            tg_id=None,
+            chat_id=None,
+        )
+        self._tables.next_user_id += 1
+        self._tables.users[user.id] = user
+        self._index_user(user)
+        return user
+
+    def _remove_user(self, user_id: int) -> list[tuple[datetime.date, str]]:
+        freed_seats = self._tables.remove_user_bookings(user_id)
+        self._tables.digest_hours.pop(user_id, None)
+        self._tables.remove_user_watches(user_id)
+        self._tables.preferences.pop(user_id, None)
+        self._tables.remove_user_lottery_requests(user_id)
+        self._unindex_user(self._tables.users.pop(user_id))
+        return freed_seats
+
+    async def get_by_tg_id(self, tg_id: int) -> User | None:
+        return self._tables.users.get(self._tables.user_ids_by_tg_id.get(tg_id))
+
+    async def get_by_id(self, user_id: int) -> User | None:
+        return self._tables.users.get(user_id)
+
+    async def get_page(
+        self, registered: bool | None, page: int, page_size: int
+    ) -> tuple[list[User], int]:
+        users = sorted(
+            (
+                user
+                for user in self._tables.users.values()
+                if registered is None or (user.tg_id is not None) == registered
+            ),
+            key=lambda user: user.full_name,
+        )
+        return users[page * page_size : (page + 1) * page_size], len(users)
+
+    async def update(
+        self, user_id: int, username: str | None, tg_id: int | None, chat_id: int | None
+    ) -> User:
+        user = self._tables.users.get(user_id)
+        if not user:
+            raise ValueError(
+                "Error updating user: Сбой регистрации, обратитесь в поддержку."
+            )
+
+        # уникальность username, tg_id, chat_id
+        for index, value in (
+            (self._tables.user_ids_by_tg_id, tg_id),
+            (self._tables.user_ids_by_username, username),
+            (self._tables.user_ids_by_chat_id, chat_id),
+        ):
+            if value is not None and index.get(value, user_id) != user_id:
+                raise ValueError(f"Error updating user: duplicate value {value!r}")
+
+        self._unindex_user(user)
+        user.username, user.tg_id, user.chat_id = username, tg_id, chat_id
+        self._index_user(user)
+        return user
+
+    async def untie(self, user_id: int) -> list[tuple[datetime.date, str]]:
+        freed_seats = self._tables.remove_user_bookings(user_id)
+        self._tables.digest_hours.pop(user_id, None)
+        self._tables.remove_user_watches(user_id)
+        self._tables.preferences.pop(user_id, None)
+        self._tables.remove_user_lottery_requests(user_id)
+        user = self._tables.users.get(user_id)
+        if user:
+            self._unindex_user(user)
+            user.username = user.tg_id = user.chat_id = None
+            self._index_user(user)
+        return freed_seats
+
+    async def delete(self, user_id: int) -> list[tuple[datetime.date, str]]:
+        if user_id in self._tables.users:
+            return self._remove_user(user_id)
+        return []
+
+    async def add(self, full_name: str) -> User:
+        if full_name in self._tables.user_ids_by_full_name:
+            raise ValueError(
+                f"Error adding user '{full_name}': "
+                f"User with full_name '{full_name}' already exists"
+            )
+        return self._insert_user(full_name)
+
+    async def sync_full_names(
+        self, full_names: list[str], prune: bool, dry_run: bool
+    ) -> dict:
+        wanted = set(full_names)
+        existing = self._tables.user_ids_by_full_name
+        added = sorted(wanted - existing.keys())
+        removed = sorted(existing.keys() - wanted) if prune else []
+
+        freed_seats = []
+        if not dry_run:
+            for full_name in removed:
+                freed_seats += self._remove_user(existing[full_name])
+            for full_name in added:
+                self._insert_user(full_name)
+
+        return {
+            "added": added,
+            "removed": removed,
+            "total": (
+                len(self._tables.users) + len(added) - len(removed)
+                if dry_run
+                else len(self._tables.users)
+            ),
+            "dry_run": dry_run,
+            "freed_seats": freed_seats,
+        }
+
+    async def stream_all(self, batch_size: int) -> AsyncIterator[dict]:
+        for full_name in sorted(self._tables.user_ids_by_full_name):
+            user = self._tables.users[self._tables.user_ids_by_full_name[full_name]]
+            yield {
+                "full_name": user.full_name,
+                "username": user.username,
+                "tg_id": user.tg_id,
+            }
+
+
+class MemoryDigestStorage(DigestStorage):
+    """Подписки на утреннюю сводку в памяти процесса."""
+
+    def __init__(self, tables: _MemoryTables):
+        self._tables = tables
+
+    async def get_send_hour(self, user_id: int) -> int | None:
+        return self._tables.digest_hours.get(user_id)
+
+    async def subscribe(self, user_id: int, send_hour: int) -> None:
+        # как внешний ключ на users
+        if user_id not in self._tables.users:
+            raise ValueError(
+                f"Error subscribing user to digest: user {user_id} not found"
+            )
+        self._tables.digest_hours[user_id] = send_hour
+
+    async def unsubscribe(self, user_id: int) -> None:
+        self._tables.digest_hours.pop(user_id, None)
+
+    async def get_subscribers(self, send_hour: int) -> list[dict]:
+        subscribers = []
+        for user_id in sorted(self._tables.digest_hours):
+            user = self._tables.users[user_id]
+            if self._tables.digest_hours[user_id] == send_hour and user.tg_id:
+                subscribers.append(
+                    {"user_id": user_id, "chat_id": user.chat_id or user.tg_id}
+                )
+        return subscribers
+
+
+class MemoryWatchStorage(WatchStorage):
+    """Ожидания свободного места в памяти процесса."""
+
+    def __init__(self, tables: _MemoryTables):
+        self._tables = tables
+
+    async def add(self, booking_date: datetime.date, user_id: int) -> bool:
+        # как внешний ключ на users
+        if user_id not in self._tables.users:
+            raise ValueError(f"Error adding seat watch: user {user_id} not found")
+        user_ids = self._tables.watches_by_date.setdefault(booking_date, {})
+        if user_id in user_ids:
+            return False
+        user_ids[user_id] = None
+        return True
+
+    async def take_first(self, booking_date: datetime.date) -> dict | None:
+        user_ids = self._tables.watches_by_date.get(booking_date, {})
+        for user_id in user_ids:
+            user = self._tables.users[user_id]
+            if user.tg_id and not self._tables.has_personal_booking(
+                user_id, booking_date
+            ):
+                del user_ids[user_id]
+                if not user_ids:
+                    del self._tables.watches_by_date[booking_date]
+                return {"user_id": user_id, "chat_id": user.chat_id or user.tg_id}
+        return None
+
+    async def positions(
+        self, booking_date: datetime.date, user_ids: list[int]
+    ) -> dict[int, int]:
+        wanted = set(user_ids)
+        return {
+            user_id: position
+            for position, user_id in enumerate(
+                self._tables.watches_by_date.get(booking_date, {}), start=1
+            )
+            if user_id in wanted
+        }
+
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        old_dates = [
+            date for date in self._tables.watches_by_date if date < cutoff_date
+        ]
+        return sum(len(self._tables.watches_by_date.pop(date)) for date in old_dates)
+
+
+class MemoryPreferenceStorage(PreferenceStorage):
+    """Предпочтения мест в памяти процесса."""
+
+    def __init__(self, tables: _MemoryTables):
+        self._tables = tables
+
+    async def get(self, user_id: int) -> dict | None:
+        preference = self._tables.preferences.get(user_id)
+        if preference is None:
+            return None
+        return {
+            "seat_numbers": list(preference["seat_numbers"]),
+            "weekdays": preference["weekdays"],
+        }
+
+    async def save(self, user_id: int, seat_numbers: list[str], weekdays: int) -> None:
+        # как внешний ключ на users
+        if user_id not in self._tables.users:
+            raise ValueError(f"Error saving seat preference: user {user_id} not found")
+        preference = self._tables.preferences.setdefault(
+            user_id, {"last_allocated_on": None}
+        )
+        preference["seat_numbers"] = list(seat_numbers)
+        preference["weekdays"] = weekdays
+
+    async def delete(self, user_id: int) -> None:
+        self._tables.preferences.pop(user_id, None)
+
+    async def get_for_date(self, booking_date: datetime.date) -> list[dict]:
+        preferences = []
+        for user_id, preference in self._tables.preferences.items():
+            user = self._tables.users[user_id]
+            if (
+                preference["weekdays"] & (1 << booking_date.weekday())
+                and user.tg_id
+                and not self._tables.has_personal_booking(user_id, booking_date)
+            ):
+                preferences.append(
+                    {
+                        "user_id": user_id,
+                        "chat_id": user.chat_id or user.tg_id,
+                        "seat_numbers": list(preference["seat_numbers"]),
+                        "last_allocated_on": preference["last_allocated_on"],
+                    }
+                )
+        return preferences
+
+    async def allocate(
+        self, booking_date: datetime.date, assignments: list[tuple[int, str]]
+    ) -> list[tuple[int, str]]:
+        created = []
+        for user_id, seat_number in assignments:
+            if (
+                user_id not in self._tables.users
+                or self._tables.has_personal_booking(user_id, booking_date)
+                or (booking_date, seat_number) in self._tables.booking_ids_by_date_seat
+            ):
+                continue
+            self._tables.insert_booking(
+                Booking(
+                    booking_date=booking_date,
+                    user_id=user_id,
+                    seat_number=seat_number,
+                    type="personal",
+                    guest_full_name=None,
+                    created_at=datetime.datetime.now(datetime.timezone.utc),
+                )
+            )
+            if user_id in self._tables.preferences:
+                self._tables.preferences[user_id]["last_allocated_on"] = booking_date
+            created.append((user_id, seat_number))
+        return created
+
+
+class MemoryLotteryStorage(LotteryStorage):
+    """Жеребьевки мест в памяти процесса."""
+
+    def __init__(self, tables: _MemoryTables):
+        self._tables = tables
+
+    def _pending(self, booking_date: datetime.date) -> dict | None:
+        lottery = self._tables.lotteries.get(booking_date)
+        return lottery if lottery and lottery["drawn_at"] is None else None
+
+    async def open(
+        self, booking_date: datetime.date, cutoff_at: datetime.datetime, seed: int
+    ) -> bool:
+        if booking_date in self._tables.lotteries:
+            return False
+        self._tables.lotteries[booking_date] = {
+            "cutoff_at": cutoff_at,
+            "seed": seed,
+            "drawn_at": None,
+            "requests": {},
+        }
+        return True
+
+    async def cancel(self, booking_date: datetime.date) -> bool:
+        if self._pending(booking_date) is None:
+            return False
+        del self._tables.lotteries[booking_date]
+        return True
+
+    async def get_pending(self) -> list[dict]:
+        return [
+            {
+                "booking_date": booking_date,
+                "cutoff_at": lottery["cutoff_at"],
+                "seed": lottery["seed"],
+                "requests": len(lottery["requests"]),
+            }
+            for booking_date, lottery in sorted(self._tables.lotteries.items())
+            if lottery["drawn_at"] is None
+        ]
+
+    async def add_request(self, booking_date: datetime.date, user_id: int) -> bool:
+        # как внешний ключ на users
+        if user_id not in self._tables.users:
+            raise ValueError(f"Error adding lottery request: user {user_id} not found")
+        lottery = self._pending(booking_date)
+        if lottery is None or user_id in lottery["requests"]:
+            return False
+        lottery["requests"][user_id] = None
+        return True
+
+    async def remove_request(self, booking_date: datetime.date, user_id: int) -> bool:
+        lottery = self._pending(booking_date)
+        if lottery is None or user_id not in lottery["requests"]:
+            return False
+        del lottery["requests"][user_id]
+        return True
+
+    async def get_requests(
+        self, booking_date: datetime.date, attended_since: datetime.date
+    ) -> list[dict]:
+        lottery = self._tables.lotteries.get(booking_date)
+        requests = []
+        for user_id in lottery["requests"] if lottery else ():
+            user = self._tables.users[user_id]
+            if not user.tg_id or self._tables.has_personal_booking(
+                user_id, booking_date
+            ):
+                continue
+            attended = sum(
+                1
+                for booking_id in self._tables.booking_ids_by_user.get(user_id, ())
+                if self._tables.bookings[booking_id].type == "personal"
+                and attended_since
+                <= self._tables.bookings[booking_id].booking_date
+                < booking_date
+            )
+            requests.append(
+                {
+                    "user_id": user_id,
+                    "chat_id": user.chat_id or user.tg_id,
+                    "attended": attended,
+                }
+            )
+        return requests
+
+    async def draw(
+        self, booking_date: datetime.date, results: list[tuple[int, str | None]]
+    ) -> list[tuple[int, str | None]] | None:
+        lottery = self._pending(booking_date)
+        if lottery is None:
+            return None
+
+        created = []
+        for position, (user_id, seat_number) in enumerate(results, start=1):
+            if user_id in lottery["requests"]:
+                lottery["requests"][user_id] = position
+            if user_id not in self._tables.users:
+                continue
+            if (booking_date, seat_number) in self._tables.booking_ids_by_date_seat:
+                # выигранное место успели занять: участник ждет место, как не получивший
+                seat_number = None
+            user_bookings = [
+                self._tables.bookings[booking_id]
+                for booking_id in self._tables.booking_ids_by_user.get(user_id, ())
+                if self._tables.bookings[booking_id].booking_date == booking_date
+                and self._tables.bookings[booking_id].type
+                in ("personal", "personal_candidate")
+            ]
+            if seat_number is not None:
+                # получившему место бронирование без места на дату больше не нужно
+                for booking in user_bookings:
+                    if booking.type == "personal_candidate":
+                        self._tables.remove_booking(booking.id)
+                user_bookings = [
+                    booking for booking in user_bookings if booking.type == "personal"
+                ]
+            if not user_bookings:
+                self._tables.insert_booking(
+                    Booking(
+                        booking_date=booking_date,
+                        user_id=user_id,
+                        seat_number=seat_number,
+                        type="personal" if seat_number else "personal_candidate",
+                        guest_full_name=None,
+                        created_at=datetime.datetime.now(datetime.timezone.utc),
+                    )
+                )
+            elif seat_number is not None or any(
+                booking.type == "personal" for booking in user_bookings
+            ):
+                continue
+            # уже бывшее бронирование без места не дублируется, но в очередь встает
+            if seat_number is None:
+                # не получившие место ждут его в порядке жеребьевки
+                self._tables.watches_by_date.setdefault(booking_date, {})[
+                    user_id
+                ] = None
+            created.append((user_id, seat_number))
+
+        lottery["drawn_at"] = datetime.datetime.now(datetime.timezone.utc)
+        return created
+
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        old_dates = [date for date in self._tables.lotteries if date < cutoff_date]
+        for date in old_dates:
+            del self._tables.lotteries[date]
+        return len(old_dates)
+
+
+class MemoryJobStorage(JobStorage):
+    """Фоновые задачи в памяти процесса: блокировка действует в пределах процесса."""
+
+    def __init__(self):
+        self._locks: dict[str, asyncio.Lock] = {}
+        # id запуска -> запуск; (задача, срабатывание) -> id (уникальный индекс)
+        self._runs: dict[int, dict] = {}
+        self._run_ids: dict[tuple[str, datetime.datetime], int] = {}
+        self._next_run_id = 1
+
+    @contextlib.asynccontextmanager
+    async def lock(self, job_name: str) -> AsyncIterator[bool]:
+        lock = self._locks.setdefault(job_name, asyncio.Lock())
+        if lock.locked():
+            yield False
+            return
+        async with lock:
+            yield True
+
+    async def start_run(
+        self, job_name: str, scheduled_for: datetime.datetime
+    ) -> int | None:
+        if (job_name, scheduled_for) in self._run_ids:
+            return None
+        run_id = self._next_run_id
+        self._next_run_id += 1
+        self._runs[run_id] = {
+            "job_name": job_name,
+            "scheduled_for": scheduled_for,
+            "started_at": datetime.datetime.now(datetime.timezone.utc),
+            "finished_at": None,
+            "duration_ms": None,
+            "status": "running",
+            "detail": None,
+        }
+        self._run_ids[(job_name, scheduled_for)] = run_id
+        return run_id
+
+    async def finish_run(
+        self, run_id: int, status: str, duration_ms: int, detail: str | None
+    ) -> None:
+        self._runs[run_id].update(
+            finished_at=datetime.datetime.now(datetime.timezone.utc),
+            duration_ms=duration_ms,
+            status=status,
+            detail=detail,
+        )
+
+    async def get_last_runs(self) -> list[dict]:
+        last_runs = {}
+        for run in self._runs.values():
+            if run["started_at"] >= last_runs.get(run["job_name"], run)["started_at"]:
+                last_runs[run["job_name"]] = run
+        return [dict(last_runs[name]) for name in sorted(last_runs)]
+
+    async def delete_older_than(self, cutoff: datetime.datetime) -> int:
+        old_ids = [
+            run_id for run_id, run in self._runs.items() if run["started_at"] < cutoff
+        ]
+        for run_id in old_ids:
+            run = self._runs.pop(run_id)
+            del self._run_ids[(run["job_name"], run["scheduled_for"])]
+        return len(old_ids)
+
+
+class MemoryStorage(Storage):
+    """Хранилище в памяти процесса: те же инварианты, что и у БД, без PostgreSQL."""
+
+    name = "memory"
+
+    def __init__(self):
+        tables = _MemoryTables()
+        super().__init__(
+            bookings=MemoryBookingStorage(tables),
+            users=MemoryUserStorage(tables),
+            digests=MemoryDigestStorage(tables),
+            watches=MemoryWatchStorage(tables),
+            preferences=MemoryPreferenceStorage(tables),
+            lotteries=MemoryLotteryStorage(tables),
+            jobs=MemoryJobStorage(),
+        )
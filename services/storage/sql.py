@@ -0,0 +1,1364 @@
+import contextlib
+import datetime
+import hashlib
+from typing import AsyncIterator
+
+from sqlalchemy import (
+    Date,
+    Integer,
+    String,
+    case,
+    column,
+    delete,
+    exists,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    table,
+    text,
+    true,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+from db.database import get_db_session, get_engine
+from db.models import (
+    Booking,
+    DigestSubscription,
+    JobRun,
+    LotteryDate,
+    LotteryRequest,
+    SeatPreference,
+    SeatWatch,
+    User,
+)
+from services.errors import BookingConflictError
+from services.storage.base import (
+    BookingStorage,
+    DigestStorage,
+    JobStorage,
+    LotteryStorage,
+    PreferenceStorage,
+    Storage,
+    UserStorage,
+    WatchStorage,
+)
+
+__all__ = [
+    "SqlBookingStorage",
+    "SqlUserStorage",
+    "SqlDigestStorage",
+    "SqlWatchStorage",
+    "SqlPreferenceStorage",
+    "SqlLotteryStorage",
+    "SqlJobStorage",
+    "SqlStorage",
+]
+
+
+class SqlBookingStorage(BookingStorage):
+    """Бронирования в PostgreSQL (таблица seatbook.bookings)."""
+
+    async def get_user_booking_dates(
+        self, tg_id: int, booking_types: tuple[str, ...]
+    ) -> list[datetime.date]:
+        async for session in get_db_session(read_only=True):
+            try:
+                result = await session.execute(
+                    select(Booking.booking_date)
+                    .join(User, User.id == Booking.user_id)
+                    .where(User.tg_id == tg_id)
+                    .where(Booking.type.in_(booking_types))
+                )
+                return [row[0] for row in result.all()]
+
+            except Exception:
+                await session.rollback()
+                raise ValueError
+
+    async def get_occupied_seats(
+        self, date_from: datetime.date, date_to: datetime.date
+    ) -> list[tuple[datetime.date, str]]:
+        async for session in get_db_session(read_only=True):
+            try:
+                result = await session.execute(
+                    select(Booking.booking_date, Booking.seat_number).where(
+                        Booking.booking_date >= date_from,
+                        Booking.booking_date <= date_to,
+                        Booking.seat_number.isnot(None),
+                    )
+                )
+                return [tuple(row) for row in result.all()]
+
+            except Exception:
+                await session.rollback()
+                raise ValueError
+
+    async def create(
+        self,
+        *,
+        booking_date: datetime.date,
+        user_id: int,
+        seat_number: str | None,
+        booking_type: str,
+        guest_full_name: str | None,
+    ) -> Booking:
+        async for session in get_db_session():
+            try:
+                if seat_number:
+                    # Проверка, что место на дату еще свободно
+                    existing = await session.execute(
+                        select(Booking.id).where(
+                            Booking.booking_date == booking_date,
+                            Booking.seat_number == seat_number,
+                        )
+                    )
+                    if existing.scalar_one_or_none():
+                        raise BookingConflictError
+
+                booking = Booking(
+                    booking_date=booking_date,
+                    user_id=user_id,
+                    seat_number=seat_number,
+                    type=booking_type,
+                    guest_full_name=guest_full_name,
+                )
+                session.add(booking)
+                await session.commit()
+                await session.refresh(booking)
+
+                return booking
+
+            except IntegrityError:
+                await session.rollback()
+                raise BookingConflictError
+
+    async def delete(self, booking_id: int) -> Booking:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    select(Booking).where(Booking.id == booking_id)
+                )
+                booking = result.scalar_one_or_none()
+
+                # Удаляем объект
+                await session.delete(booking)
+                await session.commit()
+
+                return booking
+
+            except Exception:
+                await session.rollback()
+                raise ValueError
+
+    async def get_user_future(
+        self, user_id: int, since: datetime.date
+    ) -> list[Booking]:
+        async for session in get_db_session(read_only=True):
+            try:
+                result = await session.execute(
+                    select(Booking)
+                    .where(Booking.user_id == user_id)
+                    .where(Booking.booking_date >= since)
+                    .order_by(Booking.booking_date)
+                )
+                return result.scalars().all()
+
+            except Exception:
+                await session.rollback()
+                raise ValueError
+
+    async def stream_future(
+        self, since: datetime.date, batch_size: int
+    ) -> AsyncIterator[dict]:
+        # пачки по ключу (дата, id), каждая в своей короткой сессии: пока
+        # получатель обрабатывает пачку (например, отправляет сообщения),
+        # соединение с БД не удерживается
+        after = None
+        while True:
+            async for session in get_db_session(read_only=True):
+                try:
+                    bookings = (
+                        select(
+                            Booking.id,
+                            Booking.booking_date,
+                            Booking.guest_full_name,
+                            User.full_name,
+                            Booking.seat_number,
+                            Booking.type,
+                        )
+                        .join(User, User.id == Booking.user_id)
+                        .where(Booking.booking_date >= since)
+                        .order_by(Booking.booking_date, Booking.id)
+                        .limit(batch_size)
+                    )
+                    if after is not None:
+                        bookings = bookings.where(
+                            tuple_(Booking.booking_date, Booking.id) > after
+                        )
+                    result = await session.execute(bookings)
+                    rows = result.all()
+
+                except Exception:
+                    await session.rollback()
+                    raise ValueError
+
+            # Берем ФИО гостя, если есть, если нет - ФИО владельца брони
+            for r in rows:
+                yield {
+                    "booking_id": r[0],
+                    "booking_date": r[1],
+                    "full_name": r[2] if r[2] else r[3],
+                    "seat_number": r[4],
+                    "type": r[5],
+                }
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1][1], rows[-1][0])
+
+    async def get_dates_with_bookings(
+        self, since: datetime.date
+    ) -> list[datetime.date]:
+        async for session in get_db_session(read_only=True):
+            try:
+                result = await session.execute(
+                    select(Booking.booking_date)
+                    .where(Booking.booking_date >= since)
+                    .distinct()
+                    .order_by(Booking.booking_date)
+                )
+                return result.scalars().all()
+
+            except Exception:
+                await session.rollback()
+                raise ValueError
+
+    async def get_visitors_by_date(self, date: datetime.date) -> list[dict]:
+        async for session in get_db_session(read_only=True):
+            try:
+                result = await session.execute(
+                    select(
+                        Booking.seat_number,
+                        Booking.type,
+                        Booking.guest_full_name,
+                        User.full_name,
+                    )
+                    .join(User, User.id == Booking.user_id)
+                    .where(Booking.booking_date == date)
+                    .order_by(Booking.seat_number)
+                )
+
+                # Берем ФИО гостя, если есть, если нет - ФИО владельца брони
+                return [
+                    {
+                        "seat_number": r[0],
+                        "type": r[1],
+                        "full_name": r[2] if r[2] else r[3],
+                    }
+                    for r in result.all()
+                ]
+
+            except Exception:
+                await session.rollback()
+                raise ValueError
+
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    delete(Booking)
+                    .where(Booking.booking_date < cutoff_date)
+                    .returning(Booking.id)
+                )
+                deleted_rows = result.fetchall()
+                await session.commit()
+                return len(deleted_rows)
+
+            except Exception:
+                await session.rollback()
+                raise
+
+
+class SqlUserStorage(UserStorage):
+    """Сотрудники в PostgreSQL (таблица seatbook.users)."""
+
+    @staticmethod
+    async def _delete_bookings(session, condition) -> list[tuple[datetime.date, str]]:
+        """Удалить бронирования по условию, вернуть освободившиеся места."""
+        result = await session.execute(
+            delete(Booking)
+            .where(condition)
+            .returning(Booking.booking_date, Booking.seat_number)
+        )
+        return [tuple(row) for row in result.all() if row[1] is not None]
+
+    async def get_by_tg_id(self, tg_id: int) -> User | None:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(select(User).where(User.tg_id == tg_id))
+                return result.scalar_one_or_none()
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting user by tg_id: {e}")
+
+    async def get_by_id(self, user_id: int) -> User | None:
+        async for session in get_db_session():
+            result = await session.execute(select(User).where(User.id == user_id))
+
+            return result.scalar_one_or_none()
+
+    async def get_page(
+        self, registered: bool | None, page: int, page_size: int
+    ) -> tuple[list[User], int]:
+        if registered is None:
+            condition = true()
+        elif registered:
+            condition = User.tg_id.is_not(None)
+        else:
+            condition = User.tg_id.is_(None)
+
+        async for session in get_db_session(read_only=True):
+            try:
+                total_count_result = await session.execute(
+                    select(func.count(User.id)).where(condition)
+                )
+                result = await session.execute(
+                    select(User)
+                    .where(condition)
+                    .order_by(User.full_name)
+                    .offset(page * page_size)
+                    .limit(page_size)
+                )
+                return list(result.scalars().all()), total_count_result.scalar()
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting users page: {e}")
+
+    async def update(
+        self, user_id: int, username: str | None, tg_id: int | None, chat_id: int | None
+    ) -> User:
+        async for session in get_db_session():
+            try:
+                # Находим пользователя по user_id
+                result = await session.execute(select(User).where(User.id == user_id))
+                user = result.scalar_one_or_none()
+
+                if not user:
+                    raise ValueError("Сбой регистрации, обратитесь в поддержку.")
+
+                # Обновляем данные пользователя
+                user.username = username
+                user.tg_id = tg_id
+                user.chat_id = chat_id
+
+                await session.commit()
+                await session.refresh(user)
+                return user
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error updating user: {e}")
+
+    async def untie(self, user_id: int) -> list[tuple[datetime.date, str]]:
+        async for session in get_db_session():
+            try:
+                # 1. Удаляем все бронирования, подписку, ожидания, предпочтения мест
+                # и заявки на жеребьевки
+                freed_seats = await self._delete_bookings(
+                    session, Booking.user_id == user_id
+                )
+                for model in (
+                    DigestSubscription,
+                    SeatWatch,
+                    SeatPreference,
+                    LotteryRequest,
+                ):
+                    await session.execute(delete(model).where(model.user_id == user_id))
+
+                # 2. Обнуляем поля в users (оставляем только full_name и id)
+                await session.execute(
+                    update(User)
+                    .where(User.id == user_id)
+                    .values(username=None, tg_id=None, chat_id=None)
+                )
+
+                await session.commit()
+                return freed_seats
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error untie user: {e}")
+
+    async def delete(self, user_id: int) -> list[tuple[datetime.date, str]]:
+        async for session in get_db_session():
+            try:
+                # 1. Удаляем все бронирования пользователя
+                freed_seats = await self._delete_bookings(
+                    session, Booking.user_id == user_id
+                )
+
+                # 2. Удаляем пользователя (подписка, ожидания, предпочтения мест
+                # и заявки на жеребьевки удаляются каскадно)
+                await session.execute(delete(User).where(User.id == user_id))
+
+                await session.commit()
+                return freed_seats
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error deleting user: {e}")
+
+    async def add(self, full_name: str) -> User:
+        async for session in get_db_session():
+            try:
+                # Проверяем, что такого ФИО еще нет
+                existing_user = await session.execute(
+                    select(User.id).where(User.full_name == full_name)
+                )
+                if existing_user.scalar_one_or_none():
+                    raise ValueError(
+                        f"User with full_name '{full_name}' already exists"
+                    )
+
+                # Создаем пользователя
+                new_user = User(full_name=full_name)
+
+                session.add(new_user)
+
+                await session.commit()
+                return new_user
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error adding user '{full_name}': {e}")
+
+    async def sync_full_names(
+        self, full_names: list[str], prune: bool, dry_run: bool
+    ) -> dict:
+        """
+        1. ФИО копируются (COPY) во временную таблицу, созданную в транзакции сессии.
+        2. Новые ФИО добавляются одним INSERT ... SELECT DISTINCT из временной
+           таблицы ... ON CONFLICT (full_name) DO NOTHING.
+        3. При prune=True бронирования сотрудников, которых нет в списке,
+           удаляются одним DELETE (с возвратом освободившихся мест), затем
+           одним DELETE удаляются сами сотрудники.
+        При dry_run=True изменения откатываются.
+        """
+        import_table = table("user_import", column("full_name"))
+
+        async for session in get_db_session():
+            try:
+                # таблица создается через сессию: это открывает транзакцию,
+                # иначе драйвер выполнит CREATE в автокоммите и ON COMMIT DROP
+                # удалит таблицу сразу, до COPY
+                await session.execute(
+                    text(
+                        "CREATE TEMP TABLE user_import (full_name text NOT NULL) "
+                        "ON COMMIT DROP"
+                    )
+                )
+                connection = await session.connection()
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    "user_import", records=[(full_name,) for full_name in full_names]
+                )
+
+                added_result = await session.execute(
+                    pg_insert(User)
+                    .from_select(
+                        [User.full_name],
+                        select(import_table.c.full_name).distinct(),
+                    )
+                    .on_conflict_do_nothing(index_elements=[User.full_name])
+                    .returning(User.full_name)
+                )
+                added = sorted(added_result.scalars().all())
+
+                removed, freed_seats = [], []
+                if prune:
+                    freed_seats = await self._delete_bookings(
+                        session,
+                        Booking.user_id.in_(
+                            select(User.id).where(
+                                User.full_name.not_in(select(import_table.c.full_name))
+                            )
+                        ),
+                    )
+                    removed_result = await session.execute(
+                        delete(User)
+                        .where(User.full_name.not_in(select(import_table.c.full_name)))
+                        .returning(User.full_name)
+                    )
+                    removed = sorted(removed_result.scalars().all())
+
+                total_result = await session.execute(select(func.count(User.id)))
+                total = total_result.scalar()
+
+                if dry_run:
+                    await session.rollback()
+                else:
+                    await session.commit()
+
+                return {
+                    "added": added,
+                    "removed": removed,
+                    "total": total,
+                    "dry_run": dry_run,
+                    "freed_seats": freed_seats,
+                }
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error syncing users: {e}")
+
+    async def stream_all(self, batch_size: int) -> AsyncIterator[dict]:
+        async for session in get_db_session(read_only=True):
+            try:
+                result = await session.stream(
+                    select(User.full_name, User.username, User.tg_id)
+                    .order_by(User.full_name)
+                    .execution_options(yield_per=batch_size)
+                )
+                async for row in result:
+                    yield {
+                        "full_name": row.full_name,
+                        "username": row.username,
+                        "tg_id": row.tg_id,
+                    }
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error streaming users: {e}")
+
+
+class SqlDigestStorage(DigestStorage):
+    """Подписки на утреннюю сводку в PostgreSQL (таблица seatbook.digest_subscriptions)."""
+
+    async def get_send_hour(self, user_id: int) -> int | None:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    select(DigestSubscription.send_hour).where(
+                        DigestSubscription.user_id == user_id
+                    )
+                )
+                return result.scalar_one_or_none()
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting digest subscription: {e}")
+
+    async def subscribe(self, user_id: int, send_hour: int) -> None:
+        async for session in get_db_session():
+            try:
+                await session.execute(
+                    pg_insert(DigestSubscription)
+                    .values(user_id=user_id, send_hour=send_hour)
+                    .on_conflict_do_update(
+                        index_elements=[DigestSubscription.user_id],
+                        set_={"send_hour": send_hour},
+                    )
+                )
+                await session.commit()
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error subscribing user to digest: {e}")
+
+    async def unsubscribe(self, user_id: int) -> None:
+        async for session in get_db_session():
+            try:
+                await session.execute(
+                    delete(DigestSubscription).where(
+                        DigestSubscription.user_id == user_id
+                    )
+                )
+                await session.commit()
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error unsubscribing user from digest: {e}")
+
+    async def get_subscribers(self, send_hour: int) -> list[dict]:
+        async for session in get_db_session(read_only=True):
+            try:
+                # выборка по индексу ix_digest_subscriptions_send_hour
+                result = await session.execute(
+                    select(
+                        DigestSubscription.user_id,
+                        func.coalesce(User.chat_id, User.tg_id),
+                    )
+                    .join(User, User.id == DigestSubscription.user_id)
+                    .where(DigestSubscription.send_hour == send_hour)
+                    .where(User.tg_id.is_not(None))
+                    .order_by(DigestSubscription.user_id)
+                )
+                return [{"user_id": r[0], "chat_id": r[1]} for r in result.all()]
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting digest subscribers: {e}")
+
+
+class SqlWatchStorage(WatchStorage):
+    """Ожидания свободного места в PostgreSQL (таблица seatbook.seat_watches)."""
+
+    async def add(self, booking_date: datetime.date, user_id: int) -> bool:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    pg_insert(SeatWatch)
+                    .values(booking_date=booking_date, user_id=user_id)
+                    .on_conflict_do_nothing(
+                        index_elements=[SeatWatch.booking_date, SeatWatch.user_id]
+                    )
+                    .returning(SeatWatch.id)
+                )
+                added = result.scalar_one_or_none() is not None
+                await session.commit()
+                return added
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error adding seat watch: {e}")
+
+    async def take_first(self, booking_date: datetime.date) -> dict | None:
+        async for session in get_db_session():
+            try:
+                # первый в очереди; уже взятые параллельно строки пропускаются
+                first_watch = (
+                    select(SeatWatch.id)
+                    .join(User, User.id == SeatWatch.user_id)
+                    .where(SeatWatch.booking_date == booking_date)
+                    .where(User.tg_id.is_not(None))
+                    .where(
+                        ~exists().where(
+                            Booking.user_id == SeatWatch.user_id,
+                            Booking.booking_date == booking_date,
+                            Booking.type == "personal",
+                        )
+                    )
+                    .order_by(SeatWatch.id)
+                    .limit(1)
+                    .with_for_update(of=SeatWatch, skip_locked=True)
+                    .scalar_subquery()
+                )
+                result = await session.execute(
+                    delete(SeatWatch)
+                    .where(SeatWatch.id == first_watch)
+                    .returning(SeatWatch.user_id)
+                )
+                user_id = result.scalar_one_or_none()
+                if user_id is None:
+                    await session.commit()
+                    return None
+
+                chat_result = await session.execute(
+                    select(func.coalesce(User.chat_id, User.tg_id)).where(
+                        User.id == user_id
+                    )
+                )
+                chat_id = chat_result.scalar_one()
+                await session.commit()
+                return {"user_id": user_id, "chat_id": chat_id}
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error taking seat watch: {e}")
+
+    async def positions(
+        self, booking_date: datetime.date, user_ids: list[int]
+    ) -> dict[int, int]:
+        # с основной базы: очередь читается сразу после записи в нее
+        async for session in get_db_session():
+            try:
+                # очередь FIFO по id, как в take_first
+                queue = (
+                    select(
+                        SeatWatch.user_id,
+                        func.row_number().over(order_by=SeatWatch.id).label("position"),
+                    )
+                    .where(SeatWatch.booking_date == booking_date)
+                    .subquery()
+                )
+                result = await session.execute(
+                    select(queue.c.user_id, queue.c.position).where(
+                        queue.c.user_id.in_(user_ids)
+                    )
+                )
+                return dict(result.all())
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting seat watch positions: {e}")
+
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    delete(SeatWatch)
+                    .where(SeatWatch.booking_date < cutoff_date)
+                    .returning(SeatWatch.id)
+                )
+                deleted_rows = result.fetchall()
+                await session.commit()
+                return len(deleted_rows)
+
+            except Exception:
+                await session.rollback()
+                raise
+
+
+class SqlPreferenceStorage(PreferenceStorage):
+    """Предпочтения мест в PostgreSQL (таблица seatbook.seat_preferences)."""
+
+    async def get(self, user_id: int) -> dict | None:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    select(SeatPreference.seat_numbers, SeatPreference.weekdays).where(
+                        SeatPreference.user_id == user_id
+                    )
+                )
+                row = result.one_or_none()
+                if row is None:
+                    return None
+                return {"seat_numbers": list(row[0]), "weekdays": row[1]}
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting seat preference: {e}")
+
+    async def save(self, user_id: int, seat_numbers: list[str], weekdays: int) -> None:
+        async for session in get_db_session():
+            try:
+                await session.execute(
+                    pg_insert(SeatPreference)
+                    .values(
+                        user_id=user_id, seat_numbers=seat_numbers, weekdays=weekdays
+                    )
+                    .on_conflict_do_update(
+                        index_elements=[SeatPreference.user_id],
+                        set_={"seat_numbers": seat_numbers, "weekdays": weekdays},
+                    )
+                )
+                await session.commit()
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error saving seat preference: {e}")
+
+    async def delete(self, user_id: int) -> None:
+        async for session in get_db_session():
+            try:
+                await session.execute(
+                    delete(SeatPreference).where(SeatPreference.user_id == user_id)
+                )
+                await session.commit()
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error deleting seat preference: {e}")
+
+    async def get_for_date(self, booking_date: datetime.date) -> list[dict]:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    select(
+                        SeatPreference.user_id,
+                        func.coalesce(User.chat_id, User.tg_id),
+                        SeatPreference.seat_numbers,
+                        SeatPreference.last_allocated_on,
+                    )
+                    .join(User, User.id == SeatPreference.user_id)
+                    .where(
+                        SeatPreference.weekdays.op("&")(1 << booking_date.weekday())
+                        != 0
+                    )
+                    .where(User.tg_id.is_not(None))
+                    .where(
+                        ~exists().where(
+                            Booking.user_id == SeatPreference.user_id,
+                            Booking.booking_date == booking_date,
+                            Booking.type == "personal",
+                        )
+                    )
+                )
+                return [
+                    {
+                        "user_id": r[0],
+                        "chat_id": r[1],
+                        "seat_numbers": list(r[2]),
+                        "last_allocated_on": r[3],
+                    }
+                    for r in result.all()
+                ]
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting seat preferences: {e}")
+
+    async def allocate(
+        self, booking_date: datetime.date, assignments: list[tuple[int, str]]
+    ) -> list[tuple[int, str]]:
+        if not assignments:
+            return []
+
+        allocation = values(
+            column("user_id", Integer), column("seat_number", String), name="allocation"
+        ).data(assignments)
+
+        async for session in get_db_session():
+            try:
+                # 1. Все бронирования одной вставкой: занятые места пропускает
+                # ON CONFLICT, уже забронировавших на дату - NOT EXISTS
+                result = await session.execute(
+                    pg_insert(Booking)
+                    .from_select(
+                        ["booking_date", "user_id", "seat_number", "type"],
+                        select(
+                            literal(booking_date, Date),
+                            allocation.c.user_id,
+                            allocation.c.seat_number,
+                            literal("personal", String),
+                        ).where(
+                            ~exists().where(
+                                Booking.user_id == allocation.c.user_id,
+                                Booking.booking_date == booking_date,
+                                Booking.type == "personal",
+                            )
+                        ),
+                    )
+                    .on_conflict_do_nothing(
+                        index_elements=[Booking.booking_date, Booking.seat_number],
+                        index_where=Booking.seat_number.isnot(None),
+                    )
+                    .returning(Booking.user_id, Booking.seat_number)
+                )
+                created = [tuple(row) for row in result.all()]
+
+                # 2. Очередность при спросе: получившие место идут позже
+                if created:
+                    await session.execute(
+                        update(SeatPreference)
+                        .where(
+                            SeatPreference.user_id.in_(
+                                [user_id for user_id, _ in created]
+                            )
+                        )
+                        .values(last_allocated_on=booking_date)
+                    )
+
+                await session.commit()
+                return created
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error allocating seats: {e}")
+
+
+class SqlLotteryStorage(LotteryStorage):
+    """
+    Жеребьевки мест в PostgreSQL (таблицы seatbook.lottery_dates
+    и seatbook.lottery_requests).
+    """
+
+    async def open(
+        self, booking_date: datetime.date, cutoff_at: datetime.datetime, seed: int
+    ) -> bool:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    pg_insert(LotteryDate)
+                    .values(booking_date=booking_date, cutoff_at=cutoff_at, seed=seed)
+                    .on_conflict_do_nothing(index_elements=[LotteryDate.booking_date])
+                    .returning(LotteryDate.booking_date)
+                )
+                opened = result.scalar_one_or_none() is not None
+                await session.commit()
+                return opened
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error opening lottery: {e}")
+
+    async def cancel(self, booking_date: datetime.date) -> bool:
+        async for session in get_db_session():
+            try:
+                # заявки удаляются каскадно
+                result = await session.execute(
+                    delete(LotteryDate)
+                    .where(LotteryDate.booking_date == booking_date)
+                    .where(LotteryDate.drawn_at.is_(None))
+                    .returning(LotteryDate.booking_date)
+                )
+                cancelled = result.scalar_one_or_none() is not None
+                await session.commit()
+                return cancelled
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error cancelling lottery: {e}")
+
+    async def get_pending(self) -> list[dict]:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    select(
+                        LotteryDate.booking_date,
+                        LotteryDate.cutoff_at,
+                        LotteryDate.seed,
+                        func.count(LotteryRequest.user_id),
+                    )
+                    .outerjoin(
+                        LotteryRequest,
+                        LotteryRequest.booking_date == LotteryDate.booking_date,
+                    )
+                    .where(LotteryDate.drawn_at.is_(None))
+                    .group_by(LotteryDate.booking_date)
+                    .order_by(LotteryDate.booking_date)
+                )
+                return [
+                    {
+                        "booking_date": r[0],
+                        "cutoff_at": r[1],
+                        "seed": r[2],
+                        "requests": r[3],
+                    }
+                    for r in result.all()
+                ]
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting pending lotteries: {e}")
+
+    async def add_request(self, booking_date: datetime.date, user_id: int) -> bool:
+        async for session in get_db_session():
+            try:
+                # заявка принимается, только пока жеребьевка не проведена
+                result = await session.execute(
+                    pg_insert(LotteryRequest)
+                    .from_select(
+                        ["booking_date", "user_id"],
+                        select(
+                            LotteryDate.booking_date, literal(user_id, Integer)
+                        ).where(
+                            LotteryDate.booking_date == booking_date,
+                            LotteryDate.drawn_at.is_(None),
+                        ),
+                    )
+                    .on_conflict_do_nothing(
+                        index_elements=[
+                            LotteryRequest.booking_date,
+                            LotteryRequest.user_id,
+                        ]
+                    )
+                    .returning(LotteryRequest.user_id)
+                )
+                added = result.scalar_one_or_none() is not None
+                await session.commit()
+                return added
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error adding lottery request: {e}")
+
+    async def remove_request(self, booking_date: datetime.date, user_id: int) -> bool:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    delete(LotteryRequest)
+                    .where(LotteryRequest.booking_date == booking_date)
+                    .where(LotteryRequest.user_id == user_id)
+                    .where(
+                        exists().where(
+                            LotteryDate.booking_date == booking_date,
+                            LotteryDate.drawn_at.is_(None),
+                        )
+                    )
+                    .returning(LotteryRequest.user_id)
+                )
+                removed = result.scalar_one_or_none() is not None
+                await session.commit()
+                return removed
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error removing lottery request: {e}")
+
+    async def get_requests(
+        self, booking_date: datetime.date, attended_since: datetime.date
+    ) -> list[dict]:
+        # посещения за период считаются одним коррелированным подзапросом
+        attended = (
+            select(func.count(Booking.id))
+            .where(Booking.user_id == LotteryRequest.user_id)
+            .where(Booking.type == "personal")
+            .where(Booking.booking_date >= attended_since)
+            .where(Booking.booking_date < booking_date)
+            .scalar_subquery()
+        )
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    select(
+                        LotteryRequest.user_id,
+                        func.coalesce(User.chat_id, User.tg_id),
+                        attended,
+                    )
+                    .join(User, User.id == LotteryRequest.user_id)
+                    .where(LotteryRequest.booking_date == booking_date)
+                    .where(User.tg_id.is_not(None))
+                    .where(
+                        ~exists().where(
+                            Booking.user_id == LotteryRequest.user_id,
+                            Booking.booking_date == booking_date,
+                            Booking.type == "personal",
+                        )
+                    )
+                )
+                return [
+                    {"user_id": r[0], "chat_id": r[1], "attended": r[2]}
+                    for r in result.all()
+                ]
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting lottery requests: {e}")
+
+    async def draw(
+        self, booking_date: datetime.date, results: list[tuple[int, str | None]]
+    ) -> list[tuple[int, str | None]] | None:
+        async for session in get_db_session():
+            try:
+                # 1. Отмечаем проведение: строка жеребьевки блокируется до конца
+                # транзакции, параллельное проведение увидит drawn_at и выйдет
+                result = await session.execute(
+                    update(LotteryDate)
+                    .where(LotteryDate.booking_date == booking_date)
+                    .where(LotteryDate.drawn_at.is_(None))
+                    .values(drawn_at=func.now())
+                    .returning(LotteryDate.booking_date)
+                )
+                if result.scalar_one_or_none() is None:
+                    await session.commit()
+                    return None
+
+                created = []
+                if results:
+                    draw_results = values(
+                        column("position", Integer),
+                        column("user_id", Integer),
+                        column("seat_number", String),
+                        name="draw_results",
+                    ).data(
+                        [
+                            (position, user_id, seat_number)
+                            for position, (user_id, seat_number) in enumerate(
+                                results, start=1
+                            )
+                        ]
+                    )
+
+                    # 2. Порядок жеребьевки в заявках
+                    await session.execute(
+                        update(LotteryRequest)
+                        .where(LotteryRequest.booking_date == booking_date)
+                        .where(LotteryRequest.user_id == draw_results.c.user_id)
+                        .values(draw_position=draw_results.c.position)
+                    )
+
+                    # 3. Получившим свободное место бронирование без места
+                    # на дату больше не нужно
+                    seat_booking = aliased(Booking)
+                    await session.execute(
+                        delete(Booking)
+                        .where(Booking.booking_date == booking_date)
+                        .where(Booking.type == "personal_candidate")
+                        .where(Booking.user_id == draw_results.c.user_id)
+                        .where(draw_results.c.seat_number.is_not(None))
+                        .where(
+                            ~exists().where(
+                                seat_booking.booking_date == booking_date,
+                                seat_booking.seat_number == draw_results.c.seat_number,
+                            )
+                        )
+                    )
+
+                    # 4. Все бронирования одной вставкой: занятые места пропускает
+                    # ON CONFLICT, уже забронировавших на дату - NOT EXISTS (их
+                    # бронирования без места не дублируются, очередь - в шаге 5)
+                    result = await session.execute(
+                        pg_insert(Booking)
+                        .from_select(
+                            ["booking_date", "user_id", "seat_number", "type"],
+                            select(
+                                literal(booking_date, Date),
+                                draw_results.c.user_id,
+                                draw_results.c.seat_number,
+                                case(
+                                    (
+                                        draw_results.c.seat_number.is_(None),
+                                        "personal_candidate",
+                                    ),
+                                    else_="personal",
+                                ),
+                            )
+                            .where(
+                                ~exists().where(
+                                    Booking.user_id == draw_results.c.user_id,
+                                    Booking.booking_date == booking_date,
+                                    Booking.type.in_(
+                                        ("personal", "personal_candidate")
+                                    ),
+                                )
+                            )
+                            .order_by(draw_results.c.position),
+                        )
+                        .on_conflict_do_nothing(
+                            index_elements=[Booking.booking_date, Booking.seat_number],
+                            index_where=Booking.seat_number.isnot(None),
+                        )
+                        .returning(Booking.user_id, Booking.seat_number)
+                    )
+                    created = [
+                        (user_id, seat_number)
+                        for user_id, seat_number in result.all()
+                        if seat_number is not None
+                    ]
+
+                    # 4a. Выигранное место успели занять (ON CONFLICT): такой
+                    # участник записывается без места, как не получивший его
+                    seated = {user_id for user_id, seat_number in created}
+                    demoted = [
+                        user_id
+                        for user_id, seat_number in results
+                        if seat_number is not None and user_id not in seated
+                    ]
+                    if demoted:
+                        await session.execute(
+                            pg_insert(Booking).from_select(
+                                ["booking_date", "user_id", "seat_number", "type"],
+                                select(
+                                    literal(booking_date, Date),
+                                    draw_results.c.user_id,
+                                    null(),
+                                    literal("personal_candidate"),
+                                )
+                                .where(draw_results.c.user_id.in_(demoted))
+                                .where(
+                                    ~exists().where(
+                                        Booking.user_id == draw_results.c.user_id,
+                                        Booking.booking_date == booking_date,
+                                        Booking.type.in_(
+                                            ("personal", "personal_candidate")
+                                        ),
+                                    )
+                                ),
+                            )
+                        )
+
+                    # 5. Не получившие место - и новые бронирования без места, и уже
+                    # бывшие до жеребьевки - ждут место в порядке жеребьевки
+                    result = await session.execute(
+                        select(draw_results.c.user_id)
+                        .where(
+                            or_(
+                                draw_results.c.seat_number.is_(None),
+                                draw_results.c.user_id.in_(demoted),
+                            )
+                        )
+                        .where(
+                            exists().where(
+                                Booking.user_id == draw_results.c.user_id,
+                                Booking.booking_date == booking_date,
+                                Booking.type == "personal_candidate",
+                            )
+                        )
+                    )
+                    candidates = set(result.scalars().all())
+                    waiting = [
+                        {"booking_date": booking_date, "user_id": user_id}
+                        for user_id, seat_number in results
+                        if user_id in candidates
+                    ]
+                    created += [(watch["user_id"], None) for watch in waiting]
+                    if waiting:
+                        await session.execute(
+                            pg_insert(SeatWatch)
+                            .values(waiting)
+                            .on_conflict_do_nothing(
+                                index_elements=[
+                                    SeatWatch.booking_date,
+                                    SeatWatch.user_id,
+                                ]
+                            )
+                        )
+
+                await session.commit()
+                return created
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error drawing lottery: {e}")
+
+    async def delete_older_than(self, cutoff_date: datetime.date) -> int:
+        async for session in get_db_session():
+            try:
+                # заявки удаляются каскадно
+                result = await session.execute(
+                    delete(LotteryDate)
+                    .where(LotteryDate.booking_date < cutoff_date)
+                    .returning(LotteryDate.booking_date)
+                )
+                deleted_rows = result.fetchall()
+                await session.commit()
+                return len(deleted_rows)
+
+            except Exception:
+                await session.rollback()
+                raise
+
+
+class SqlJobStorage(JobStorage):
+    """
+    Фоновые задачи в PostgreSQL: блокировка - advisory lock уровня сессии,
+    история запусков - таблица seatbook.job_runs.
+    """
+
+    @staticmethod
+    def _lock_key(job_name: str) -> int:
+        """Ключ advisory lock задачи: стабильный 64-битный хэш имени."""
+        digest = hashlib.blake2b(job_name.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big", signed=True)
+
+    @contextlib.asynccontextmanager
+    async def lock(self, job_name: str) -> AsyncIterator[bool]:
+        key = self._lock_key(job_name)
+        # блокировка держится соединением, поэтому оно занято до конца задачи;
+        # после commit соединение простаивает вне транзакции
+        async with get_engine().connect() as conn:
+            result = await conn.execute(select(func.pg_try_advisory_lock(key)))
+            acquired = result.scalar_one()
+            await conn.commit()
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    await conn.execute(select(func.pg_advisory_unlock(key)))
+                    await conn.commit()
+
+    async def start_run(
+        self, job_name: str, scheduled_for: datetime.datetime
+    ) -> int | None:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    pg_insert(JobRun)
+                    .values(job_name=job_name, scheduled_for=scheduled_for)
+                    .on_conflict_do_nothing(
+                        index_elements=[JobRun.job_name, JobRun.scheduled_for]
+                    )
+                    .returning(JobRun.id)
+                )
+                run_id = result.scalar_one_or_none()
+                await session.commit()
+                return run_id
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error starting job run: {e}")
+
+    async def finish_run(
+        self, run_id: int, status: str, duration_ms: int, detail: str | None
+    ) -> None:
+        async for session in get_db_session():
+            try:
+                await session.execute(
+                    update(JobRun)
+                    .where(JobRun.id == run_id)
+                    .values(
+                        finished_at=func.now(),
+                        duration_ms=duration_ms,
+                        status=status,
+                        detail=detail,
+                    )
+                )
+                await session.commit()
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error finishing job run: {e}")
+
+    async def get_last_runs(self) -> list[dict]:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    select(
+                        JobRun.job_name,
+                        JobRun.scheduled_for,
+                        JobRun.started_at,
+                        JobRun.finished_at,
+                        JobRun.duration_ms,
+                        JobRun.status,
+                        JobRun.detail,
+                    )
+                    .distinct(JobRun.job_name)
+                    .order_by(JobRun.job_name, JobRun.started_at.desc())
+                )
+                return [
+                    {
+                        "job_name": r[0],
+                        "scheduled_for": r[1],
+                        "started_at": r[2],
+                        "finished_at": r[3],
+                        "duration_ms": r[4],
+                        "status": r[5],
+                        "detail": r[6],
+                    }
+                    for r in result.all()
+                ]
+
+            except Exception as e:
+                await session.rollback()
+                raise ValueError(f"Error getting job runs: {e}")
+
+    async def delete_older_than(self, cutoff: datetime.datetime) -> int:
+        async for session in get_db_session():
+            try:
+                result = await session.execute(
+                    delete(JobRun)
+                    .where(JobRun.started_at < cutoff)
+                    .returning(JobRun.id)
+                )
+                deleted_rows = result.fetchall()
+                await session.commit()
+                return len(deleted_rows)
+
+            except Exception:
+                await session.rollback()
+                raise
+
+
+class SqlStorage(Storage):
+    """Хранилище в PostgreSQL (по умолчанию)."""
+
+    name = "sql"
+
+    def __init__(self):
+        super().__init__(
+            bookings=SqlBookingStorage(),
+            users=SqlUserStorage(),
+            digests=SqlDigestStorage(),
+            watches=SqlWatchStorage(),
+            preferences=SqlPreferenceStorage(),
+            lotteries=SqlLotteryStorage(),
+            jobs=SqlJobStorage(),
+        )
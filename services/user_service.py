@@ -1,135 +1,59 @@
-# services/user_service.py
-import datetime
+from typing import AsyncIterator
 
-from sqlalchemy import delete, func, insert, select, update
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import AsyncSession
-
-from db.database import get_db_session
-from db.models import Booking, User
+from db.models import User
+from services.seat_watch_service import SeatWatchService
+from services.storage import get_storage
+from services.visitors_cache import VisitorsCache
+from utils.concurrency import SingleFlight
 
 
 class UserService:
 
+    # размер страницы списков сотрудников в панели администратора
+    PAGE_SIZE = 10
+
+    @staticmethod
+    async def _get_page(registered: bool | None, page: int) -> dict:
+        """Страница списка сотрудников с пагинацией по PAGE_SIZE."""
+        page_size = UserService.PAGE_SIZE
+        users, total_count = await get_storage().users.get_page(
+            registered, page, page_size
+        )
+        return {
+            "users": users,
+            "page": page,
+            "page_size": page_size,
+            "total_pages": (
+                (total_count + page_size - 1) // page_size if total_count > 0 else 0
+            ),
+        }
+
     @staticmethod
     async def get_user_by_tg_id(tg_id: int) -> User | None:
         """Получить пользователя по Telegram ID."""
-        async for session in get_db_session():
-            try:
-                result = await session.execute(select(User).where(User.tg_id == tg_id))
-                return result.scalar_one_or_none()
-            except Exception as e:
-                await session.rollback()
-                raise ValueError(f"Error getting user by tg_id: {e}")
+        return await get_storage().users.get_by_tg_id(tg_id)
 
     @staticmethod
     async def get_users_wo_tg_id(page: int = 0) -> dict | None:
         """Получить список пользователей, у которых tg_id is NULL с пагинацией по 10"""
-        async for session in get_db_session():
-            try:
-                # Получаем общее количество пользователей без tg_id
-                total_count_result = await session.execute(
-                    select(func.count(User.id)).where(User.tg_id.is_(None))
-                )
-                total_count = total_count_result.scalar()
-
-                # Получаем пользователей для текущей страницы
-                page_size = 10
-                result = await session.execute(
-                    select(User)
-                    .where(User.tg_id.is_(None))
-                    .order_by(User.full_name)
-                    .offset(page * page_size)
-                    .limit(page_size)
-                )
-                users = result.scalars().all()
-
-                return {
-                    "users": list(users) if users else [],
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": (
-                        (total_count + page_size - 1) // page_size
-                        if total_count > 0
-                        else 0
-                    ),
-                }
-
-            except Exception:
-                await session.rollback()
-                raise ValueError
+        return await UserService._get_page(registered=False, page=page)
 
     @staticmethod
     async def get_users_w_tg_id(page: int = 0) -> dict | None:
         """Получить список пользователей, у которых tg_id is not NULL с пагинацией по 10"""
-        async for session in get_db_session():
-            try:
-                # Получаем общее количество пользователей c tg_id
-                total_count_result = await session.execute(
-                    select(func.count(User.id)).where(User.tg_id.is_not(None))
-                )
-                total_count = total_count_result.scalar()
-
-                # Получаем пользователей для текущей страницы
-                page_size = 10
-                result = await session.execute(
-                    select(User)
-                    .where(User.tg_id.is_not(None))
-                    .order_by(User.full_name)
-                    .offset(page * page_size)
-                    .limit(page_size)
-                )
-                users = result.scalars().all()
-
-                return {
-                    "users": list(users) if users else [],
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": (
-                        (total_count + page_size - 1) // page_size
-                        if total_count > 0
-                        else 0
-                    ),
-                }
-
-            except Exception as e:
-                await session.rollback()
-                raise ValueError(f"Error getting users with tg_id: {e}")
+        return await UserService._get_page(registered=True, page=page)
 
     @staticmethod
     async def get_user_by_user_id(user_id: int) -> User | None:
         """Получить данные пользователя по id из таблицы users."""
-        async for session in get_db_session():
-            result = await session.execute(select(User).where(User.id == user_id))
-
-            return result.scalar_one_or_none()
+        return await get_storage().users.get_by_id(user_id)
 
     @staticmethod
     async def update_user(
         user_id: int, username: str | None, tg_id: int | None, chat_id: int | None
     ) -> User:
         """Обновить существующего пользователя с указанным user_id."""
-        async for session in get_db_session():
-            try:
-                # Находим пользователя по user_id
-                result = await session.execute(select(User).where(User.id == user_id))
-                user = result.scalar_one_or_none()
-
-                if not user:
-                    raise ValueError(f"Сбой регистрации, обратитесь в поддержку.")
-
-                # Обновляем данные пользователя
-                user.username = username
-                user.tg_id = tg_id
-                user.chat_id = chat_id
-
-                await session.commit()
-                await session.refresh(user)
-                return user
-
-            except Exception as e:
-                await session.rollback()
-                raise ValueError(f"Error updating user: {e}")
+        return await get_storage().users.update(user_id, username, tg_id, chat_id)
 
     @staticmethod
     async def untie_user_tg_id(user_id: int) -> None:
@@ -137,62 +61,19 @@ class UserService:
         Отвязать tg_id от ФИО:
         1. Удалить все бронирования пользователя (любого типа).
         2. В таблице users для user_id обнулить все поля, кроме full_name и id.
+        Освободившиеся места предлагаются ожидающим.
         """
-        async for session in get_db_session():
-            try:
-                # 1. Удаляем все бронирования пользователя
-                await session.execute(delete(Booking).where(Booking.user_id == user_id))
-
-                # 2. Обнуляем поля в users (оставляем только full_name и id)
-                await session.execute(
-                    update(User)
-                    .where(User.id == user_id)
-                    .values(username=None, tg_id=None, chat_id=None)
-                )
-
-                await session.commit()
-
-            except Exception as e:
-                await session.rollback()
-                raise ValueError(f"Error untie user: {e}")
+        freed_seats = await get_storage().users.untie(user_id)
+        VisitorsCache.bump_all()
+        SingleFlight.invalidate("bookings")
+        SeatWatchService.seats_freed(freed_seats)
 
     @staticmethod
     async def get_all_fullnames(page: int = 0) -> dict:
         """
         Получить список всех ФИО из таблицы users.
         """
-        async for session in get_db_session():
-            try:
-                # Получаем общее количество пользователей без tg_id
-                total_count_result = await session.execute(select(func.count(User.id)))
-
-                total_count = (
-                    total_count_result.scalar()
-                )  # Получаем пользователей для текущей страницы
-                page_size = 10
-
-                result = await session.execute(
-                    select(User)
-                    .order_by(User.full_name)
-                    .offset(page * page_size)
-                    .limit(page_size)
-                )
-                users = result.scalars().all()
-
-                return {
-                    "users": list(users) if users else [],
-                    "page": page,
-                    "page_size": page_size,
-                    "total_pages": (
-                        (total_count + page_size - 1) // page_size
-                        if total_count > 0
-                        else 0
-                    ),
-                }
-
-            except Exception as e:
-                await session.rollback()
-                raise ValueError(f"Error getting free users: {e}")
+        return await UserService._get_page(registered=None, page=page)
 
     @staticmethod
     async def delete_user(user_id: int) -> None:
@@ -200,20 +81,12 @@ class UserService:
         Удалить сотрудника:
         1. Удалить все бронирования пользователя (любого типа).
         2. В таблице users удалить запись для user_id (ФИО станет недоступно для регистрации).
+        Освободившиеся места предлагаются ожидающим.
         """
-        async for session in get_db_session():
-            try:
-                # 1. Удаляем все бронирования пользователя
-                await session.execute(delete(Booking).where(Booking.user_id == user_id))
-
-                # 2. Удаляем пользователя
-                await session.execute(delete(User).where(User.id == user_id))
-
-                await session.commit()
-
-            except Exception as e:
-                await session.rollback()
-                raise ValueError(f"Error deleting user: {e}")
+        freed_seats = await get_storage().users.delete(user_id)
+        VisitorsCache.bump_all()
+        SingleFlight.invalidate("bookings")
+        SeatWatchService.seats_freed(freed_seats)
 
     @staticmethod
     async def add_user(full_name: str) -> User:
@@ -222,25 +95,30 @@ class UserService:
         - full_name = переданное ФИО
         - остальные поля = NULL
         """
-        async for session in get_db_session():
-            try:
-                # Проверяем, что такого ФИО еще нет
-                existing_user = await session.execute(
-                    select(User.id).where(User.full_name == full_name)
-                )
-                if existing_user.scalar_one_or_none():
-                    raise ValueError(
-                        f"User with full_name '{full_name}' already exists"
-                    )
-
-                # Создаем пользователя
-                new_user = User(full_name=full_name)
-
-                session.add(new_user)
-
-                await session.commit()
-                return new_user
-
-            except Exception as e:
-                await session.rollback()
-                raise ValueError(f"Error adding user '{full_name}': {e}")
+        return await get_storage().users.add(full_name)
+
+    @staticmethod
+    async def sync_full_names(
+        full_names: list[str], prune: bool = False, dry_run: bool = False
+    ) -> dict:
+        """
+        Привести список сотрудников к переданному списку ФИО одним набором запросов:
+        новые ФИО добавляются, при prune=True сотрудники, которых нет в списке,
+        удаляются вместе с бронированиями. При dry_run=True изменения откатываются,
+        возвращается только отчет (added, removed, total, dry_run).
+        """
+        report = await get_storage().users.sync_full_names(full_names, prune, dry_run)
+        freed_seats = report.pop("freed_seats")
+        if report["removed"] and not dry_run:
+            VisitorsCache.bump_all()
+            SingleFlight.invalidate("bookings")
+            SeatWatchService.seats_freed(freed_seats)
+        return report
+
+    @staticmethod
+    async def stream_all_users(batch_size: int = 500) -> AsyncIterator[dict]:
+        """
+        Потоково отдает всех сотрудников по ФИО (пачками по batch_size).
+        """
+        async for user in get_storage().users.stream_all(batch_size):
+            yield user
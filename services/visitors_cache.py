@@ -0,0 +1,107 @@
+import datetime
+import time
+from collections import OrderedDict
+
+from config.settings import settings
+from services.calendar_service import CalendarService
+
+
+class VisitorsCache:
+    """
+    Кэш "кто придет в офис в дату X" с версией на каждую дату.
+    Любое изменение бронирований на дату повышает ее версию (bump), изменения
+    сотрудников (отвязка, удаление) - общую эпоху (bump_all). Запись кэша
+    действительна, пока версия даты и эпоха не изменились, поэтому читатели
+    получают список посетителей и уже отрисованный текст без запроса к БД.
+    Размер ограничен settings.VISITORS_CACHE_SIZE дат (вытесняется давно не читанная).
+    """
+
+    _epoch = 0
+    _versions: dict[datetime.date, int] = {}
+    # время (time.monotonic) последнего изменения даты
+    _bumped_at: dict[datetime.date, float] = {}
+    # дата -> {"version", "visitors", "rendered"}
+    _entries: OrderedDict = OrderedDict()
+
+    _hits = 0
+    _misses = 0
+    _evictions = 0
+
+    @classmethod
+    def version(cls, date: datetime.date) -> tuple[int, int]:
+        """Текущая версия даты (снимается до чтения из БД, см. put)."""
+        return cls._epoch, cls._versions.get(date, 0)
+
+    @classmethod
+    def bump(cls, date: datetime.date) -> None:
+        """Бронирования на дату изменились."""
+        cls._versions[date] = cls._versions.get(date, 0) + 1
+        cls._bumped_at[date] = time.monotonic()
+        cls._entries.pop(date, None)
+
+    @classmethod
+    def bump_all(cls) -> None:
+        """Изменились бронирования на неизвестные даты (каскадные удаления)."""
+        cls._epoch += 1
+        cls._entries.clear()
+
+    @classmethod
+    def get(cls, date: datetime.date) -> dict | None:
+        """Действительная запись кэша на дату или None (промах)."""
+        entry = cls._entries.get(date)
+        if entry is None or entry["version"] != cls.version(date):
+            cls._misses += 1
+            return None
+
+        cls._entries.move_to_end(date)
+        cls._hits += 1
+        return entry
+
+    @classmethod
+    def put(
+        cls, date: datetime.date, version: tuple[int, int], visitors: list[dict]
+    ) -> dict:
+        """
+        Сохранить посетителей, прочитанных при версии version. Если за время
+        чтения дата изменилась, запись сразу будет недействительной и не отдастся.
+        Сразу после изменения даты (пока реплика для чтения может отставать)
+        запись не сохраняется.
+        """
+        entry = {"version": version, "visitors": visitors, "rendered": {}}
+        bumped_at = cls._bumped_at.get(date)
+        if (
+            settings.DATABASE_READ_URL
+            and bumped_at is not None
+            and time.monotonic() - bumped_at < settings.DB_READ_STICKY_SECONDS
+        ):
+            return entry
+
+        cls._entries[date] = entry
+        cls._entries.move_to_end(date)
+        while len(cls._entries) > settings.VISITORS_CACHE_SIZE:
+            cls._entries.popitem(last=False)
+            cls._evictions += 1
+        return entry
+
+    @classmethod
+    async def forget_past_dates(cls) -> None:
+        """Хук смены суток: прошедшие даты больше не читаются, их версии не нужны."""
+        today = CalendarService.today()
+        for store in (cls._versions, cls._bumped_at, cls._entries):
+            for date in [date for date in store if date < today]:
+                del store[date]
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики кэша для отчета о готовности."""
+        lookups = cls._hits + cls._misses
+        return {
+            "size": len(cls._entries),
+            "hits": cls._hits,
+            "misses": cls._misses,
+            "evictions": cls._evictions,
+            "hit_ratio": round(cls._hits / lookups, 3) if lookups else None,
+        }
+
+
+CalendarService.add_rollover_hook(VisitorsCache.forget_past_dates)
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# настройки читаются при импорте модулей бота: токен-заглушка, хранилище в памяти
+os.environ.setdefault("BOT_TOKEN", "1:test")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+# Добавляем корневую директорию в путь для импортов
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from utils.concurrency import SingleFlight, single_flight
+
+
+@pytest.fixture(autouse=True)
+def reset_single_flight():
+    SingleFlight._in_flight.clear()
+    SingleFlight._generations.clear()
+    SingleFlight._stats.clear()
+
+
+def make_read(calls: list):
+    @single_flight("test")
+    async def read(value):
+        calls.append(value)
+        number = len(calls)
+        await asyncio.sleep(0.01)
+        return [value, number]
+
+    return read
+
+
+def test_concurrent_calls_share_one_request():
+    calls = []
+    read = make_read(calls)
+
+    async def scenario():
+        return await asyncio.gather(read(1), read(1), read(2))
+
+    first, second, other = asyncio.run(scenario())
+    assert calls == [1, 2]
+    assert first is second
+    assert other == [2, 2]
+    assert SingleFlight.stats()["in_flight"] == 0
+
+
+def test_calls_after_invalidate_start_a_new_request():
+    calls = []
+    read = make_read(calls)
+
+    async def scenario():
+        before = asyncio.ensure_future(read(1))
+        await asyncio.sleep(0)
+        SingleFlight.invalidate("test")
+        after = asyncio.ensure_future(read(1))
+        joined = asyncio.ensure_future(read(1))
+        return await asyncio.gather(before, after, joined)
+
+    before, after, joined = asyncio.run(scenario())
+    assert calls == [1, 1]
+    assert before == [1, 1]
+    assert after is joined and after == [1, 2]
+    assert SingleFlight.stats()["in_flight"] == 0
+
+
+def test_invalidate_does_not_affect_other_groups():
+    calls = []
+    read = make_read(calls)
+
+    async def scenario():
+        first = asyncio.ensure_future(read(1))
+        await asyncio.sleep(0)
+        SingleFlight.invalidate("bookings")
+        return await asyncio.gather(first, read(1))
+
+    first, second = asyncio.run(scenario())
+    assert calls == [1]
+    assert first is second
+
+
+def test_sequential_calls_are_not_cached():
+    calls = []
+    read = make_read(calls)
+
+    async def scenario():
+        return [await read(1), await read(1)]
+
+    assert asyncio.run(scenario()) == [[1, 1], [1, 2]]
+
+
+def test_cancelled_waiter_does_not_cancel_shared_request():
+    calls = []
+    read = make_read(calls)
+
+    async def scenario():
+        waiter = asyncio.ensure_future(read(1))
+        other = asyncio.ensure_future(read(1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        return await other
+
+    assert asyncio.run(scenario()) == [1, 1]
+    assert calls == [1]
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from services import error_digest
+from services.error_digest import ErrorDigest
+
+
+def record(message: str) -> str:
+    return f"2025-01-01 10:00:00 | ERROR | seatbook | {message}\n"
+
+
+def write(path, *messages: str) -> None:
+    with open(path, "a", encoding="utf-8") as log_file:
+        log_file.writelines(record(message) for message in messages)
+
+
+def rotate(log_path, day: str) -> None:
+    # как TimedRotatingFileHandler: файл переименовывается, новый создается заново
+    os.rename(log_path, f"{log_path}.2025-01-{day}")
+    open(log_path, "w").close()
+
+
+def read_messages() -> list[str]:
+    data, checkpoint = ErrorDigest.read_new()
+    ErrorDigest.save_checkpoint(checkpoint)
+    return [record["message"] for record in ErrorDigest.parse_records(data)]
+
+
+@pytest.fixture
+def log_path(tmp_path, monkeypatch):
+    path = tmp_path / "errors.log"
+    monkeypatch.setattr(error_digest, "ERRORS_LOG_PATH", path)
+    monkeypatch.setattr(
+        error_digest, "CHECKPOINT_PATH", tmp_path / ".error_digest_checkpoint.json"
+    )
+    return path
+
+
+def test_each_record_read_once(log_path):
+    write(log_path, "a", "b")
+    assert read_messages() == ["a", "b"]
+    write(log_path, "c")
+    assert read_messages() == ["c"]
+    assert read_messages() == []
+
+
+def test_several_rotations_between_digests(log_path):
+    write(log_path, "a")
+    assert read_messages() == ["a"]
+    write(log_path, "b")
+    rotate(log_path, "02")
+    write(log_path, "c")
+    rotate(log_path, "03")
+    write(log_path, "d")
+    assert read_messages() == ["b", "c", "d"]
+
+
+def test_checkpoint_file_removed_by_backup_count(log_path):
+    write(log_path, "a")
+    assert read_messages() == ["a"]
+    rotate(log_path, "02")
+    write(log_path, "b")
+    rotate(log_path, "03")
+    os.remove(f"{log_path}.2025-01-02")
+    write(log_path, "c")
+    assert read_messages() == ["b", "c"]
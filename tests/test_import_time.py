@@ -0,0 +1,12 @@
+import pytest
+
+from scripts.startup_report import ENTRYPOINTS, measure_import
+
+
+@pytest.mark.parametrize("module, forbidden", ENTRYPOINTS.items(), ids=ENTRYPOINTS)
+def test_entrypoint_does_not_import_heavy_modules(module, forbidden):
+    # python -X importtime в отдельном интерпретаторе: модули, уже загруженные тестами, не мешают
+    report = measure_import(module)
+    assert report["returncode"] == 0, report["stderr"][-2000:]
+    assert report["stdout"] == ""
+    assert [package for package in forbidden if package in report["timings"]] == []
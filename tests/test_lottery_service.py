@@ -0,0 +1,46 @@
+from collections import Counter
+
+from services.lottery_service import LotteryService
+
+
+def make_requests(attended: dict[int, int]) -> list[dict]:
+    return [
+        {"user_id": user_id, "chat_id": user_id, "attended": count}
+        for user_id, count in attended.items()
+    ]
+
+
+def test_same_seed_same_order_regardless_of_input_order():
+    requests = make_requests({user_id: user_id % 3 for user_id in range(1, 21)})
+    order = LotteryService.draw_order(requests, seed=7)
+    shuffled = LotteryService.draw_order(list(reversed(requests)), seed=7)
+    assert [r["user_id"] for r in order] == [r["user_id"] for r in shuffled]
+
+
+def test_order_is_a_permutation_of_requests():
+    requests = make_requests({user_id: 0 for user_id in range(1, 11)})
+    order = LotteryService.draw_order(requests, seed=1)
+    assert sorted(r["user_id"] for r in order) == list(range(1, 11))
+    assert all(request in requests for request in order)
+
+
+def test_different_seeds_give_different_orders():
+    requests = make_requests({user_id: 0 for user_id in range(1, 11)})
+    orders = {
+        tuple(r["user_id"] for r in LotteryService.draw_order(requests, seed))
+        for seed in range(5)
+    }
+    assert len(orders) > 1
+
+
+def test_fewer_attendances_win_more_often():
+    # вес 1 / (1 + attended): ни разу не приходивший первым чаще частого посетителя
+    requests = make_requests({1: 0, 2: 4})
+    winners = Counter(
+        LotteryService.draw_order(requests, seed)[0]["user_id"] for seed in range(2000)
+    )
+    assert winners[1] > winners[2] * 3
+
+
+def test_no_requests():
+    assert LotteryService.draw_order([], seed=1) == []
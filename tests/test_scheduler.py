@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+
+from services.calendar_service import MOSCOW_TZ
+from services.scheduler import CronSpec
+
+
+def moscow(*args) -> datetime.datetime:
+    return datetime.datetime(*args, tzinfo=MOSCOW_TZ)
+
+
+@pytest.mark.parametrize(
+    "spec, moment, expected",
+    [
+        # строго после: ровно в срабатывание - следующее
+        ("0 3 * * *", moscow(2030, 1, 1, 3, 0), moscow(2030, 1, 2, 3, 0)),
+        ("0 3 * * *", moscow(2030, 1, 1, 2, 59, 30), moscow(2030, 1, 1, 3, 0)),
+        ("*/15 * * * *", moscow(2030, 1, 1, 10, 7), moscow(2030, 1, 1, 10, 15)),
+        ("5-10/5 8 * * *", moscow(2030, 1, 1, 8, 6), moscow(2030, 1, 1, 8, 10)),
+        ("0 9,18 * * *", moscow(2030, 1, 1, 9, 0), moscow(2030, 1, 1, 18, 0)),
+        # переход через месяц и год
+        ("0 0 1 * *", moscow(2030, 1, 31, 12, 0), moscow(2030, 2, 1, 0, 0)),
+        ("30 23 31 12 *", moscow(2030, 12, 31, 23, 30), moscow(2031, 12, 31, 23, 30)),
+        # 29 февраля - в ближайший високосный год
+        ("0 0 29 2 *", moscow(2030, 3, 1, 0, 0), moscow(2032, 2, 29, 0, 0)),
+        # дни недели: 1-5 - пн-пт, 0 и 7 - воскресенье (2030-01-05 - суббота)
+        ("0 9 * * 1-5", moscow(2030, 1, 4, 9, 0), moscow(2030, 1, 7, 9, 0)),
+        ("0 9 * * 0", moscow(2030, 1, 5, 12, 0), moscow(2030, 1, 6, 9, 0)),
+        ("0 9 * * 7", moscow(2030, 1, 5, 12, 0), moscow(2030, 1, 6, 9, 0)),
+        # заданы и дни месяца, и дни недели - подходит любой (как в cron)
+        ("0 0 10 * 1", moscow(2030, 1, 1, 0, 0), moscow(2030, 1, 7, 0, 0)),
+        ("0 0 3 * 1", moscow(2030, 1, 1, 0, 0), moscow(2030, 1, 3, 0, 0)),
+    ],
+)
+def test_next_after(spec, moment, expected):
+    assert CronSpec(spec).next_after(moment) == expected
+
+
+def test_next_after_converts_to_moscow_time():
+    moment = datetime.datetime(2030, 1, 1, 23, 30, tzinfo=datetime.timezone.utc)
+    # 23:30 UTC - уже 02:30 2 января по Москве
+    assert CronSpec("0 3 * * *").next_after(moment) == moscow(2030, 1, 2, 3, 0)
+
+
+@pytest.mark.parametrize(
+    "spec",
+    ["* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "* * * 13 *", "5-1 * * * *"],
+)
+def test_invalid_spec(spec):
+    with pytest.raises(ValueError):
+        CronSpec(spec)
+
+
+def test_never_firing_spec():
+    with pytest.raises(ValueError):
+        CronSpec("0 0 31 2 *").next_after(moscow(2030, 1, 1))
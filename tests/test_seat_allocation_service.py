@@ -0,0 +1,65 @@
+import datetime
+
+from services.seat_allocation_service import SeatAllocationService
+from services.seat_registry import SeatLayout
+
+
+def make_layout(count: int = 4) -> SeatLayout:
+    return SeatLayout(
+        [{"seat_index": i, "seat_number": str(i + 1)} for i in range(count)]
+    )
+
+
+def preference(user_id, seat_numbers, last_allocated_on=None) -> dict:
+    return {
+        "user_id": user_id,
+        "chat_id": user_id,
+        "seat_numbers": seat_numbers,
+        "last_allocated_on": last_allocated_on,
+    }
+
+
+def test_first_free_seat_from_own_list():
+    layout = make_layout()
+    assignments, missed = SeatAllocationService.solve(
+        [preference(1, ["1", "2"]), preference(2, ["1", "3"])],
+        layout,
+        layout.mask_of(["1"]),
+    )
+    assert assignments == [(1, "2"), (2, "3")]
+    assert missed == []
+
+
+def test_longest_without_seat_goes_first_then_user_id():
+    layout = make_layout()
+    recently = preference(1, ["1"], datetime.date(2030, 1, 10))
+    long_ago = preference(2, ["1"], datetime.date(2030, 1, 1))
+    never = preference(3, ["1", "2"])
+    tie = preference(4, ["2"])
+    assignments, missed = SeatAllocationService.solve(
+        [recently, long_ago, tie, never], layout, 0
+    )
+    assert assignments == [(3, "1"), (4, "2")]
+    assert missed == [long_ago, recently]
+
+
+def test_occupied_inactive_and_unknown_seats_are_skipped():
+    layout = SeatLayout(
+        [
+            {"seat_index": 0, "seat_number": "1"},
+            {"seat_index": 1, "seat_number": "2", "is_active": False},
+            {"seat_index": 2, "seat_number": "3"},
+        ]
+    )
+    occupied = layout.mask_of(["3"])
+    assignments, missed = SeatAllocationService.solve(
+        [preference(1, ["9", "2", "3"]), preference(2, ["9", "2", "3", "1"])],
+        layout,
+        occupied,
+    )
+    assert assignments == [(2, "1")]
+    assert [p["user_id"] for p in missed] == [1]
+
+
+def test_no_preferences():
+    assert SeatAllocationService.solve([], make_layout(), 0) == ([], [])
@@ -0,0 +1,476 @@
+"""
+Контракт хранилищ (services/storage): одни и те же проверки инвариантов
+(уникальность места на дату, ограничения типов бронирований, каскадное удаление)
+на memory и на sql. Каждое хранилище проверяется отдельно и на своих данных.
+
+sql проверяется в проверочной схеме contract_<tag>, которая удаляется после
+проверки: реальные данные schema seatbook не затрагиваются. Без доступной
+PostgreSQL (DB_* из окружения) проверки sql пропускаются.
+"""
+
+import asyncio
+import contextlib
+import datetime
+import functools
+import uuid
+
+import pytest
+
+from services.errors import BookingConflictError
+from services.storage import Storage
+from services.storage.memory import MemoryStorage
+
+FUTURE_DATE = datetime.date(2999, 1, 1)
+PAST_DATE = datetime.date(1901, 1, 1)
+
+
+async def _expect_error(error_type, coroutine, description: str) -> None:
+    try:
+        await coroutine
+    except error_type:
+        return
+    raise AssertionError(f"{description}: ожидалась ошибка {error_type.__name__}")
+
+
+def _full_name(tag: str, index: int) -> str:
+    return f"Контракт-{tag} Проверка {index}"
+
+
+@contextlib.asynccontextmanager
+async def _contract_users(storage: Storage):
+    """
+    Два проверочных сотрудника: первый с Telegram-данными, второй без них.
+    Отдает (tag, список id, tg_id первого); сотрудники из списка, оставшиеся
+    после проверки, удаляются вместе с их данными.
+    """
+    users = storage.users
+    tag = uuid.uuid4().hex[:8]
+    user_ids = []
+    try:
+        for index in range(2):
+            user_ids.append((await users.add(_full_name(tag, index))).id)
+        tg_id = int(uuid.uuid4().int % 10**12) + 10**12
+        await users.update(user_ids[0], f"contract_{tag}", tg_id, tg_id)
+        yield tag, user_ids, tg_id
+    finally:
+        for user_id in user_ids:
+            if await users.get_by_id(user_id) is not None:
+                await users.delete(user_id)
+
+
+async def _create_personal(
+    storage: Storage, booking_date: datetime.date, user_id: int, seat_number: str
+):
+    return await storage.bookings.create(
+        booking_date=booking_date,
+        user_id=user_id,
+        seat_number=seat_number,
+        booking_type="personal",
+        guest_full_name=None,
+    )
+
+
+async def check_users(storage: Storage) -> None:
+    """Сотрудники: уникальность ФИО и Telegram-данных, каскадное удаление, синхронизация."""
+    users, bookings = storage.users, storage.bookings
+    async with _contract_users(storage) as (tag, user_ids, tg_id):
+        first_id, second_id = user_ids
+        names = [_full_name(tag, index) for index in range(3)]
+        await _expect_error(ValueError, users.add(names[0]), "повтор ФИО")
+        assert (await users.get_by_tg_id(tg_id)).id == first_id
+        assert (await users.get_by_id(second_id)).full_name == names[1]
+        await _expect_error(
+            ValueError, users.update(second_id, None, tg_id, None), "повтор tg_id"
+        )
+
+        # untie и delete каскадно удаляют бронирования, подписки, ожидания и предпочтения
+        await _create_personal(storage, FUTURE_DATE, first_id, "1")
+        await storage.digests.subscribe(first_id, 25 + int(tag, 16) % 1000)
+        await storage.watches.add(FUTURE_DATE + datetime.timedelta(1), first_id)
+        await storage.preferences.save(first_id, ["1"], 0b1111111)
+        assert await users.untie(first_id) == [(FUTURE_DATE, "1")]
+        assert await users.get_by_tg_id(tg_id) is None
+        assert await storage.digests.get_send_hour(first_id) is None
+        assert await storage.preferences.get(first_id) is None
+        assert await bookings.get_user_future(first_id, FUTURE_DATE) == []
+        await users.update(first_id, f"contract_{tag}", tg_id, tg_id)
+        # ожидание удалено
+        assert (
+            await storage.watches.take_first(FUTURE_DATE + datetime.timedelta(1))
+            is None
+        )
+
+        await _create_personal(storage, FUTURE_DATE, second_id, "1")
+        await _create_personal(storage, PAST_DATE, second_id, "2")
+        assert sorted(await users.delete(second_id)) == [
+            (PAST_DATE, "2"),
+            (FUTURE_DATE, "1"),
+        ]
+        assert await users.get_by_id(second_id) is None
+        assert await bookings.get_visitors_by_date(FUTURE_DATE) == []
+
+        # синхронизация списка ФИО
+        report = await users.sync_full_names(
+            names + names[:1], prune=False, dry_run=False
+        )
+        assert sorted(report["added"]) == names[1:], report
+        user_ids += [
+            user.id
+            for user in (await users.get_page(None, 0, 10**6))[0]
+            if user.full_name in names[1:]
+        ]
+        assert await users.sync_full_names(names, prune=False, dry_run=False) == {
+            **report,
+            "added": [],
+        }
+
+        page, total = await users.get_page(True, 0, 10**6)
+        assert total >= 1 and names[0] in {user.full_name for user in page}
+        page, total = await users.get_page(False, 0, 10**6)
+        assert total >= 2 and {names[1], names[2]} <= {user.full_name for user in page}
+        exported = [row["full_name"] async for row in users.stream_all(1)]
+        assert set(names) <= set(exported)
+
+        # prune удаляет только отсутствующих в списке (остальные данные хранилища
+        # остаются в списке), с их бронированиями; dry_run ничего не меняет
+        await _create_personal(storage, FUTURE_DATE, user_ids[-1], "3")
+        keep = [name for name in exported if name not in names[1:]]
+        report = await users.sync_full_names(keep, prune=True, dry_run=True)
+        assert report["removed"] == names[1:] and report["dry_run"], report
+        assert await users.get_by_id(user_ids[-1]) is not None
+        report = await users.sync_full_names(keep, prune=True, dry_run=False)
+        assert (report["added"], report["removed"]) == ([], names[1:]), report
+        assert report["freed_seats"] == [(FUTURE_DATE, "3")], report
+        assert await users.get_by_id(user_ids[-1]) is None
+        assert (await users.get_by_id(first_id)).full_name == names[0]
+        assert await bookings.get_visitors_by_date(FUTURE_DATE) == []
+
+
+async def check_bookings(storage: Storage) -> None:
+    """Бронирования: уникальность места на дату, ограничения типов, выборки, удаление."""
+    bookings = storage.bookings
+    async with _contract_users(storage) as (tag, (first_id, second_id), tg_id):
+        booking = await _create_personal(storage, FUTURE_DATE, first_id, "1")
+        for kwargs, description in (
+            ({"seat_number": "1", "booking_type": "guest"}, "место уже занято"),
+            ({"seat_number": "2", "booking_type": "guest"}, "гость без ФИО"),
+            ({"seat_number": "2", "booking_type": "personal_candidate"}, "кандидат"),
+            ({"seat_number": None, "booking_type": "personal"}, "без места"),
+            ({"seat_number": "2", "booking_type": "unknown"}, "неизвестный тип"),
+        ):
+            await _expect_error(
+                BookingConflictError,
+                bookings.create(
+                    booking_date=FUTURE_DATE,
+                    user_id=second_id,
+                    guest_full_name=None,
+                    **kwargs,
+                ),
+                description,
+            )
+        await bookings.create(
+            booking_date=FUTURE_DATE,
+            user_id=second_id,
+            seat_number=None,
+            booking_type="guest_candidate",
+            guest_full_name="Гость Контракт",
+        )
+        await _create_personal(storage, PAST_DATE, second_id, "1")
+
+        # выборки
+        assert (FUTURE_DATE, "1") in await bookings.get_occupied_seats(
+            FUTURE_DATE, FUTURE_DATE
+        )
+        assert await bookings.get_user_booking_dates(tg_id, ("personal",)) == [
+            FUTURE_DATE
+        ]
+        visitors = await bookings.get_visitors_by_date(FUTURE_DATE)
+        assert [v["seat_number"] for v in visitors][-2:] == ["1", None], visitors
+        assert visitors[-1]["full_name"] == "Гость Контракт"
+        assert FUTURE_DATE in await bookings.get_dates_with_bookings(FUTURE_DATE)
+        # пачками по одной строке - те же строки в том же порядке, без повторов
+        streamed = [row async for row in bookings.stream_future(FUTURE_DATE, 1)]
+        assert streamed == [
+            row async for row in bookings.stream_future(FUTURE_DATE, 500)
+        ]
+        streamed_ids = [row["booking_id"] for row in streamed]
+        assert booking.id in streamed_ids and len(streamed_ids) >= 2
+        assert streamed_ids == sorted(set(streamed_ids))
+        assert [
+            b.id for b in await bookings.get_user_future(first_id, FUTURE_DATE)
+        ] == [booking.id]
+
+        # удаление бронирования и старых бронирований
+        assert (await bookings.delete(booking.id)).id == booking.id
+        await _expect_error(ValueError, bookings.delete(booking.id), "повтор удаления")
+        assert await bookings.delete_older_than(PAST_DATE + datetime.timedelta(1)) >= 1
+
+
+async def check_digests(storage: Storage) -> None:
+    """Подписки на сводку: одна на сотрудника, только с tg_id."""
+    digests = storage.digests
+    async with _contract_users(storage) as (tag, (first_id, second_id), tg_id):
+        hour = 25 + int(tag, 16) % 1000
+        await digests.subscribe(first_id, hour - 1)
+        await digests.subscribe(first_id, hour)
+        await digests.subscribe(second_id, hour)
+        assert await digests.get_send_hour(first_id) == hour
+        assert await digests.get_subscribers(hour) == [
+            {"user_id": first_id, "chat_id": tg_id}
+        ]
+        assert await digests.get_subscribers(hour - 1) == []
+        await digests.unsubscribe(second_id)
+        await digests.unsubscribe(second_id)
+        assert await digests.get_send_hour(second_id) is None
+
+
+async def check_watches(storage: Storage) -> None:
+    """
+    Ожидания мест: очередь FIFO по дате, ожидающие без tg_id и уже
+    забронировавшие место на дату пропускаются.
+    """
+    watches = storage.watches
+    async with _contract_users(storage) as (tag, (first_id, second_id), tg_id):
+        booking = await _create_personal(storage, FUTURE_DATE, first_id, "1")
+        assert await watches.add(FUTURE_DATE, second_id)
+        assert await watches.add(FUTURE_DATE, first_id)
+        assert not await watches.add(FUTURE_DATE, first_id)
+        assert await watches.positions(FUTURE_DATE, [first_id, second_id]) == {
+            second_id: 1,
+            first_id: 2,
+        }
+        assert await watches.take_first(FUTURE_DATE) is None
+        await storage.bookings.delete(booking.id)
+        assert await watches.take_first(FUTURE_DATE) == {
+            "user_id": first_id,
+            "chat_id": tg_id,
+        }
+        assert await watches.take_first(FUTURE_DATE) is None
+        await watches.add(PAST_DATE, first_id)
+        assert await watches.delete_older_than(PAST_DATE + datetime.timedelta(1)) == 1
+
+
+async def check_preferences(storage: Storage) -> None:
+    """
+    Предпочтения мест: на дату берутся сотрудники с этим днем недели, tg_id
+    и без брони; allocate пропускает занятые места и уже забронировавших
+    и запоминает дату распределения.
+    """
+    preferences = storage.preferences
+    async with _contract_users(storage) as (tag, (first_id, second_id), tg_id):
+        weekday_bit = 1 << FUTURE_DATE.weekday()
+        await preferences.save(first_id, ["1", "2"], weekday_bit)
+        await preferences.save(second_id, ["2"], weekday_bit)
+        assert await preferences.get(first_id) == {
+            "seat_numbers": ["1", "2"],
+            "weekdays": weekday_bit,
+        }
+
+        async def own_preferences(booking_date: datetime.date) -> list[dict]:
+            return [
+                preference
+                for preference in await preferences.get_for_date(booking_date)
+                if preference["user_id"] in (first_id, second_id)
+            ]
+
+        assert await own_preferences(FUTURE_DATE) == [
+            {
+                "user_id": first_id,
+                "chat_id": tg_id,
+                "seat_numbers": ["1", "2"],
+                "last_allocated_on": None,
+            }
+        ]
+        assert await own_preferences(FUTURE_DATE + datetime.timedelta(1)) == []
+        await _create_personal(storage, FUTURE_DATE, second_id, "1")
+        assert await preferences.allocate(FUTURE_DATE, [(first_id, "1")]) == []
+        assert await preferences.allocate(FUTURE_DATE, [(first_id, "2")]) == [
+            (first_id, "2")
+        ]
+        assert await preferences.allocate(FUTURE_DATE, [(first_id, "3")]) == []
+        assert await own_preferences(FUTURE_DATE) == []
+        await preferences.save(first_id, ["1", "2"], 0b1111111)
+        next_day = await own_preferences(FUTURE_DATE + datetime.timedelta(1))
+        assert [p["last_allocated_on"] for p in next_day] == [FUTURE_DATE]
+
+
+async def check_lotteries(storage: Storage) -> None:
+    """
+    Жеребьевки: заявки принимаются до проведения, проведение - одно,
+    не получившие место и те, чье место успели занять, записываются без места
+    и в конец очереди ожидания (даты в прошлом: проверочные жеребьевки затем
+    удаляются по дате).
+    """
+    lotteries = storage.lotteries
+    async with _contract_users(storage) as (tag, (first_id, second_id), tg_id):
+        lottery_date = PAST_DATE + datetime.timedelta(2)
+        cutoff_at = datetime.datetime(1901, 1, 2, 15, tzinfo=datetime.timezone.utc)
+        assert await lotteries.open(lottery_date, cutoff_at, 42)
+        assert not await lotteries.open(lottery_date, cutoff_at, 42)
+        assert await lotteries.open(lottery_date + datetime.timedelta(1), cutoff_at, 7)
+        assert await lotteries.cancel(lottery_date + datetime.timedelta(1))
+        assert await lotteries.add_request(lottery_date, first_id)
+        assert await lotteries.add_request(lottery_date, second_id)
+        assert not await lotteries.add_request(lottery_date, first_id)
+        assert not await lotteries.add_request(PAST_DATE, first_id)
+        assert [
+            lottery
+            for lottery in await lotteries.get_pending()
+            if lottery["booking_date"] >= lottery_date
+        ] == [
+            {
+                "booking_date": lottery_date,
+                "cutoff_at": cutoff_at,
+                "seed": 42,
+                "requests": 2,
+            }
+        ]
+        # сотрудник без tg_id не участвует, посещения считаются до даты
+        assert await lotteries.get_requests(lottery_date, PAST_DATE) == [
+            {"user_id": first_id, "chat_id": tg_id, "attended": 0}
+        ]
+        assert await lotteries.remove_request(lottery_date, second_id)
+        assert not await lotteries.remove_request(lottery_date, second_id)
+        await lotteries.add_request(lottery_date, second_id)
+        # уже бывшее бронирование без места не мешает встать в очередь ожидания
+        await storage.bookings.create(
+            booking_date=lottery_date,
+            user_id=first_id,
+            seat_number=None,
+            booking_type="personal_candidate",
+            guest_full_name=None,
+        )
+        # выигранное место занято до проведения; первый уже стоял в очереди
+        await storage.bookings.create(
+            booking_date=lottery_date,
+            user_id=first_id,
+            seat_number="5",
+            booking_type="guest",
+            guest_full_name=f"Гость {tag}",
+        )
+        await storage.watches.add(lottery_date, first_id)
+        results = [(second_id, "5"), (first_id, None)]
+        assert sorted(await lotteries.draw(lottery_date, results)) == sorted(
+            [(second_id, None), (first_id, None)]
+        )
+        assert await lotteries.draw(lottery_date, results) is None
+        assert not await lotteries.add_request(lottery_date, first_id)
+        assert not await lotteries.cancel(lottery_date)
+        assert await storage.watches.positions(lottery_date, [first_id, second_id]) == {
+            first_id: 1,
+            second_id: 2,
+        }
+        second_bookings = await storage.bookings.get_user_future(
+            second_id, lottery_date
+        )
+        assert [(booking.seat_number, booking.type) for booking in second_bookings] == [
+            (None, "personal_candidate")
+        ]
+        assert await storage.watches.take_first(lottery_date) == {
+            "user_id": first_id,
+            "chat_id": tg_id,
+        }
+        assert (
+            await lotteries.delete_older_than(lottery_date + datetime.timedelta(1)) == 1
+        )
+
+
+async def check_jobs(storage: Storage) -> None:
+    """Фоновые задачи: блокировка задачи исключительная, запуск по срабатыванию - один."""
+    jobs = storage.jobs
+    job_name = f"contract_{uuid.uuid4().hex[:8]}"
+    scheduled_for = datetime.datetime(1901, 1, 1, tzinfo=datetime.timezone.utc)
+    async with jobs.lock(job_name) as acquired:
+        assert acquired
+        async with jobs.lock(job_name) as acquired_again:
+            assert not acquired_again
+        run_id = await jobs.start_run(job_name, scheduled_for)
+        assert run_id is not None
+        assert await jobs.start_run(job_name, scheduled_for) is None
+        await jobs.finish_run(run_id, "ok", 15, "проверка")
+    async with jobs.lock(job_name) as acquired:
+        assert acquired
+    last_run = {run["job_name"]: run for run in await jobs.get_last_runs()}[job_name]
+    assert last_run["scheduled_for"] == scheduled_for
+    assert (last_run["status"], last_run["duration_ms"]) == ("ok", 15)
+    assert last_run["detail"] == "проверка" and last_run["finished_at"]
+    assert await jobs.delete_older_than(scheduled_for) == 0
+
+
+# имя -> проверка одного хранилища (каждая создает и удаляет свои данные)
+CHECKS = {
+    "users": check_users,
+    "bookings": check_bookings,
+    "digests": check_digests,
+    "watches": check_watches,
+    "preferences": check_preferences,
+    "lotteries": check_lotteries,
+    "jobs": check_jobs,
+}
+
+
+@functools.cache
+def _sql_unavailable() -> str | None:
+    """Причина, по которой PostgreSQL недоступна (None - доступна)."""
+    from db.database import get_engine
+
+    async def connect() -> None:
+        engine = get_engine()
+        try:
+            async with engine.connect():
+                pass
+        finally:
+            await engine.dispose()
+
+    try:
+        asyncio.run(asyncio.wait_for(connect(), timeout=5))
+    except Exception as e:
+        return f"PostgreSQL недоступна: {e!r}"
+    return None
+
+
+@contextlib.asynccontextmanager
+async def _throwaway_schema():
+    """
+    Проверочная схема contract_<tag> с таблицами моделей: на время проверки
+    запросы к seatbook уходят в нее (schema_translate_map движка), затем
+    схема удаляется вместе с данными.
+    """
+    from sqlalchemy import text
+
+    from db.database import get_engine
+    from db.models import Base  # вместе с таблицами моделей
+
+    schema = f"contract_{uuid.uuid4().hex[:8]}"
+    engine = get_engine()
+    engine.sync_engine.update_execution_options(
+        schema_translate_map={"seatbook": schema}
+    )
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+            await conn.run_sync(Base.metadata.create_all)
+        yield
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+        await engine.dispose()
+
+
+async def _check_sql(check) -> None:
+    from services.storage.sql import SqlStorage
+
+    async with _throwaway_schema():
+        await check(SqlStorage())
+
+
+@pytest.mark.parametrize("check", CHECKS.values(), ids=CHECKS.keys())
+@pytest.mark.parametrize("backend", ["memory", "sql"])
+def test_storage_contract(backend, check):
+    if backend == "memory":
+        asyncio.run(check(MemoryStorage()))
+        return
+    reason = _sql_unavailable()
+    if reason:
+        pytest.skip(reason)
+    asyncio.run(_check_sql(check))
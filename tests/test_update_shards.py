@@ -0,0 +1,199 @@
+import asyncio
+
+import pytest
+from telebot.types import Update
+
+from bot.admission import ADMITTED_ATTR, Admission
+from bot.update_shards import ShardedTeleBot, shard_key
+from config.settings import settings
+
+
+def callback_update(update_id: int, chat_id: int, data: str) -> Update:
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Тест"},
+                "chat_instance": "test",
+                "data": data,
+                "message": {
+                    "message_id": 1,
+                    "date": 0,
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": "экран",
+                },
+            },
+        }
+    )
+
+
+def message_update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private"},
+                "text": "привет",
+            },
+        }
+    )
+
+
+def test_shard_key():
+    assert shard_key(message_update(1, 10)) == 10
+    assert shard_key(callback_update(2, 20, "x")) == 20
+    inline = Update.de_json(
+        {
+            "update_id": 3,
+            "inline_query": {
+                "id": "1",
+                "from": {"id": 30, "is_bot": False, "first_name": "Тест"},
+                "query": "",
+                "offset": "",
+            },
+        }
+    )
+    assert shard_key(inline) == 30
+    assert shard_key(Update.de_json({"update_id": 4})) == -4
+
+
+@pytest.fixture
+def make_bot(monkeypatch):
+    def factory(workers: int, slots: int = 12, class_slots=None, queue_seconds=None):
+        monkeypatch.setattr(settings, "UPDATE_WORKERS", workers)
+        monkeypatch.setattr(settings, "ADMISSION_SLOTS", slots)
+        monkeypatch.setattr(
+            settings, "ADMISSION_CLASS_SLOTS", class_slots or {"write": 12}
+        )
+        monkeypatch.setattr(settings, "ADMISSION_QUEUE_SECONDS", queue_seconds or {})
+        bot = ShardedTeleBot("1:test")
+        log, active = [], {"now": 0, "max": 0, "admitted": {}}
+
+        @bot.callback_query_handler(func=lambda query: True)
+        async def handle(query):
+            active["admitted"][query.data] = getattr(query, ADMITTED_ATTR, "нет")
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            log.append(("start", query.message.chat.id, query.data))
+            await asyncio.sleep(0.02)
+            log.append(("end", query.message.chat.id, query.data))
+            active["now"] -= 1
+
+        @bot.message_handler(func=lambda message: True)
+        async def fail(message):
+            raise RuntimeError("сбой обработчика")
+
+        return bot, log, active
+
+    return factory
+
+
+def test_one_chat_serial_different_chats_parallel(make_bot):
+    bot, log, active = make_bot(workers=3)
+
+    async def scenario():
+        await bot.process_new_updates(
+            [
+                callback_update(1, 10, "a1"),
+                callback_update(2, 10, "a2"),
+                callback_update(3, 20, "b1"),
+                callback_update(4, 10, "a3"),
+                callback_update(5, 30, "c1"),
+                callback_update(6, 40, "d1"),
+                message_update(7, 50),
+            ]
+        )
+        await asyncio.sleep(0.3)
+
+    asyncio.run(scenario())
+    assert [entry for entry in log if entry[1] == 10] == [
+        ("start", 10, "a1"),
+        ("end", 10, "a1"),
+        ("start", 10, "a2"),
+        ("end", 10, "a2"),
+        ("start", 10, "a3"),
+        ("end", 10, "a3"),
+    ]
+    assert active["max"] == 3
+    # сбой обработчика не останавливает очередь, пустые очереди удаляются
+    assert bot.shard_stats() == {
+        "workers": 3,
+        "busy": 0,
+        "shards": 0,
+        "queued": 0,
+        "processed": 7,
+        "max_depth": 3,
+    }
+
+
+def test_ready_chats_are_picked_by_admission_priority(make_bot):
+    bot, log, active = make_bot(workers=1)
+
+    async def scenario():
+        await bot.process_new_updates(
+            [callback_update(i, 100 + i, f"browse{i}") for i in range(3)]
+            + [callback_update(10, 200, "book_date_seat: 01.01.2030 1")]
+        )
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    started = [data for event, chat_id, data in log if event == "start"]
+    assert started == ["book_date_seat: 01.01.2030 1", "browse0", "browse1", "browse2"]
+
+
+def test_class_limit_does_not_hold_workers(make_bot):
+    # админке один слот: остальные админские апдейты ждут в очереди,
+    # а не занимают обработчики, и запись получает свободный слот сразу
+    bot, log, active = make_bot(
+        workers=3, slots=3, class_slots={"admin": 1, "browse": 3, "write": 3}
+    )
+
+    async def scenario():
+        await bot.process_new_updates(
+            [callback_update(i, 100 + i, "admin_options") for i in range(4)]
+        )
+        await asyncio.sleep(0.005)
+        await bot.process_new_updates(
+            [callback_update(10, 200, "book_date_seat: 01.01.2030 1")]
+        )
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    started = [(chat_id, data) for event, chat_id, data in log if event == "start"]
+    assert started[:2] == [
+        (100, "admin_options"),
+        (200, "book_date_seat: 01.01.2030 1"),
+    ]
+    assert len(started) == 5
+    admin_running = 0
+    for event, chat_id, data in log:
+        if data == "admin_options":
+            admin_running += 1 if event == "start" else -1
+            assert admin_running <= 1
+    assert Admission.stats()["in_flight"] == 0
+
+
+def test_update_waiting_past_limit_is_shed(make_bot):
+    bot, log, active = make_bot(
+        workers=2, slots=2, class_slots={"admin": 1}, queue_seconds={"admin": 0.01}
+    )
+    shed_before = Admission.stats()["classes"]["admin"]["shed"]
+
+    async def scenario():
+        await bot.process_new_updates(
+            [
+                callback_update(1, 100, "admin_options"),
+                callback_update(2, 101, "jobs_admin"),
+            ]
+        )
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+    # отклоненный апдейт передается дальше с решением None: ответ "попробуйте
+    # еще раз" отправляет AdmissionMiddleware
+    assert active["admitted"] == {"admin_options": "admin", "jobs_admin": None}
+    assert Admission.stats()["classes"]["admin"]["shed"] == shed_before + 1
+    assert Admission.stats()["in_flight"] == 0
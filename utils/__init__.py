@@ -1,3 +1,16 @@
+import importlib
+
+from .concurrency import *
 from .dates import *
-from .safe_actions import *
+from .screen_tracker import *
 from .tools import *
+
+
+def __getattr__(name):
+    # safe_actions тянет telebot и бота, поэтому импортируется
+    # только при первом обращении к его именам (см. scripts/startup_report.py)
+    if not name.startswith("__"):
+        safe_actions = importlib.import_module(f"{__name__}.safe_actions")
+        if hasattr(safe_actions, name):
+            return getattr(safe_actions, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,119 @@
+import asyncio
+import functools
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+
+async def run_concurrently(*aws: Awaitable) -> list[Any]:
+    """
+    Выполняет независимые шаги хэндлера (ответ на коллбек, запросы к сервисам,
+    отправку и удаление сообщений) одновременно и возвращает их результаты
+    в порядке передачи. При первой ошибке остальные шаги отменяются, а ошибка
+    пробрасывается как есть (не ExceptionGroup), чтобы работали обычные except
+    в хэндлерах и декораторы error_*_handler. Отмена самого вызова отменяет все шаги.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in tasks:
+            if task.done() and task.exception() is not None:
+                raise task.exception()
+        return [task.result() for task in tasks]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных чтений: пока запрос с ключом
+    (функция + аргументы) выполняется, остальные вызовы с тем же ключом ждут
+    его результат (или ошибку), а не выполняют такой же запрос сами.
+    Результат не кэшируется: следующий вызов после завершения запроса выполняет
+    новый. После изменения данных группа сбрасывается (invalidate) - вызовы,
+    пришедшие после изменения, не присоединяются к начатому до него запросу.
+    Результат общий для всех присоединившихся - не изменять.
+    """
+
+    # ключ -> [поколение группы, задача запроса, число ждущих]
+    _in_flight: dict[tuple, list] = {}
+    _generations: dict[str, int] = {}
+    # "функция(аргументы)" -> {"calls", "shared", "max_waiters"}, недавние ключи
+    _stats: OrderedDict = OrderedDict()
+    STATS_SIZE = 128
+
+    @classmethod
+    def invalidate(cls, group: str) -> None:
+        """Данные группы изменились: начатые запросы больше не разделяются."""
+        cls._generations[group] = cls._generations.get(group, 0) + 1
+
+    @classmethod
+    def _key_stats(cls, key: tuple) -> dict:
+        arguments = [*map(repr, key[2]), *(f"{k}={v!r}" for k, v in key[3])]
+        name = f"{key[1]}({', '.join(arguments)})"
+        stats = cls._stats.get(name)
+        if stats is None:
+            stats = cls._stats[name] = {"calls": 0, "shared": 0, "max_waiters": 0}
+            while len(cls._stats) > cls.STATS_SIZE:
+                cls._stats.popitem(last=False)
+        cls._stats.move_to_end(name)
+        return stats
+
+    @classmethod
+    async def run(cls, group: str, key: tuple, factory: Callable[[], Awaitable]):
+        generation = cls._generations.get(group, 0)
+        stats = cls._key_stats(key)
+        stats["calls"] += 1
+
+        in_flight = cls._in_flight.get(key)
+        if in_flight is not None and in_flight[0] == generation:
+            task = in_flight[1]
+            in_flight[2] += 1
+            stats["shared"] += 1
+            stats["max_waiters"] = max(stats["max_waiters"], in_flight[2])
+        else:
+            task = asyncio.ensure_future(factory())
+            cls._in_flight[key] = [generation, task, 1]
+
+            def _done(_, key=key, task=task):
+                in_flight = cls._in_flight.get(key)
+                if in_flight is not None and in_flight[1] is task:
+                    del cls._in_flight[key]
+
+            task.add_done_callback(_done)
+
+        # отмена одного из ждущих не отменяет общий запрос
+        return await asyncio.shield(task)
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики объединения запросов по ключам для отчета о готовности."""
+        return {"in_flight": len(cls._in_flight), "keys": dict(cls._stats)}
+
+
+def single_flight(group: str, context: Callable[[], Any] = None):
+    """
+    Декоратор асинхронного чтения: одинаковые одновременные вызовы
+    выполняют один запрос (см. SingleFlight). group - группа данных,
+    которую сбрасывает SingleFlight.invalidate при изменениях;
+    context - функция, результат которой тоже входит в ключ (например,
+    читает ли текущий пользователь из основной БД или с реплики).
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (
+                group,
+                func.__qualname__,
+                args,
+                tuple(sorted(kwargs.items())),
+                context() if context else None,
+            )
+            return await SingleFlight.run(group, key, lambda: func(*args, **kwargs))
+
+        return wrapper
+
+    return decorator
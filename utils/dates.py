@@ -1,9 +1,6 @@
 import datetime
-from datetime import timedelta
 from zoneinfo import ZoneInfo
 
-from config.settings import settings
-
 # Русские названия месяцев
 months_ru = {
     1: "января",
@@ -31,31 +28,15 @@ weekdays_ru = {
     6: "воскресенье",
 }
 
+# Короткие названия дней недели (индекс - datetime.date.weekday())
+weekdays_short_ru = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
 
-async def generate_upcoming_dates() -> list[dict]:
-    """Генерирует список дат на количество дней планирования вперед от сегодняшней даты включительно."""
-    today = datetime.date.today()
-    dates_list = []
-    planning_days = settings.PLANNING_DAYS
-
-    for i in range(planning_days):
-        current_date = today + timedelta(days=i)
-        day = current_date.day
-        month = months_ru[current_date.month]
-        weekday = weekdays_ru[current_date.weekday()]
-
-        formatted_date = f"{day} {month}, {weekday}"
-        timestamp = current_date.isoformat()  # Формат: YYYY-MM-DD
 
-        dates_list.append(
-            {
-                "formatted": formatted_date,
-                "timestamp": str(timestamp),
-                "date_obj": current_date,
-            }
-        )
-
-    return dates_list
+def format_weekdays(weekdays: int) -> str:
+    """Дни недели из битовой маски (пн - бит 0) вида "Пн, Ср, Пт"."""
+    return ", ".join(
+        name for i, name in enumerate(weekdays_short_ru) if weekdays & (1 << i)
+    )
 
 
 def get_current_timestamp() -> str:
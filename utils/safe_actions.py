@@ -1,11 +1,20 @@
+import asyncio
 from enum import Enum
 from typing import Optional, Union
 
-from telebot.types import CallbackQuery, InlineKeyboardMarkup, Message
+from telebot.asyncio_helper import ApiTelegramException
+from telebot.types import (
+    CallbackQuery,
+    InlineKeyboardMarkup,
+    InputMediaPhoto,
+    Message,
+)
 
 import messages
-from bot import bot
-from scripts.preload_images import preloaded_images
+from bot import bot, logger
+from config.settings import settings
+from scripts.preload_images import get_photo
+from utils.screen_tracker import CAPTION_LIMIT, ScreenTracker, TrackedMessage
 
 
 class MessageContentType(str, Enum):
@@ -13,15 +22,61 @@ class MessageContentType(str, Enum):
     MEDIA = "media"
 
 
+async def _retire_message(chat_id: int, screen: TrackedMessage) -> None:
+    """
+    Убрать старое сообщение одним вызовом по известному состоянию: удалить,
+    если ему меньше 48 часов, иначе (только сообщения бота) заменить текст
+    или подпись на "устарело" и убрать кнопки.
+    """
+    ScreenTracker.forget(chat_id, screen.message_id)
+    try:
+        if not screen.is_outdated:
+            await bot.delete_message(chat_id, screen.message_id)
+        elif screen.from_bot and screen.is_media:
+            await bot.edit_message_caption(
+                chat_id=chat_id,
+                message_id=screen.message_id,
+                caption=messages.outdated_message_text,
+                reply_markup=None,
+            )
+        elif screen.from_bot:
+            await bot.edit_message_text(
+                chat_id=chat_id,
+                message_id=screen.message_id,
+                text=messages.outdated_message_text,
+                reply_markup=None,
+            )
+    except Exception:
+        pass
+
+
+async def safely_answer_query(query: CallbackQuery, text: str | None = None) -> None:
+    """
+    Ответить на нажатие кнопки, не прерывая хэндлер: ответ на коллбек только
+    убирает "часики" на кнопке, поэтому его ошибка ("query is too old",
+    таймаут) логируется и не отменяет одновременные с ним шаги хэндлера.
+    """
+    try:
+        await bot.answer_callback_query(callback_query_id=query.id, text=text)
+    except Exception:
+        logger.warning("Callback query answer failed", exc_info=True)
+
+
 async def safely_delete_message(chat_id: int, message_id: int) -> None:
     """
-    "Безопасно" удаляет сообщение: пытается удалить с таймаутом секунда,
+    "Безопасно" удаляет сообщение. Если это известный экран чата (см. ScreenTracker),
+    сразу выполняется нужное действие. Иначе пытается удалить с коротким таймаутом,
     если не удалось - меняет текст сообщения и удаляет кнопки. Если не получилось,
     то пытается сделать тоже самое с подписью под фото. Если не получилось, то ничего не делает.
     Функция существует для обхода ограничения Телеграм на удаление сообщений страше 48 часов.
     """
+    screen = ScreenTracker.lookup(chat_id, message_id)
+    if screen is not None:
+        await _retire_message(chat_id, screen)
+        return
+
     try:
-        await bot.delete_message(chat_id, message_id, timeout=1)
+        await bot.delete_message(chat_id, message_id)
     except Exception:
         try:
             await bot.edit_message_text(
@@ -42,131 +97,166 @@ async def safely_delete_message(chat_id: int, message_id: int) -> None:
                 pass
 
 
+async def _edit_screen(
+    chat_id: int,
+    screen: TrackedMessage,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup],
+    photo,
+    as_media: bool,
+    render: tuple,
+) -> Union[Message, bool, None]:
+    """
+    Отредактировать экран на месте одним вызовом, выбранным по типу его контента
+    и отличию от уже отрисованного (render): если текст и фото те же, меняются
+    только кнопки, а если совпадает все - вызова нет (возвращается True).
+    None - правкой нужный вид не получить (текст нельзя превратить в фото и наоборот).
+    """
+    if as_media != screen.is_media:
+        return None
+
+    if screen.has_content(render):
+        if screen.markup_hash == render[1]:
+            ScreenTracker.mark_skipped_edit()
+            return True
+        ScreenTracker.mark_markup_edit()
+        return await bot.edit_message_reply_markup(
+            chat_id=chat_id,
+            message_id=screen.message_id,
+            reply_markup=reply_markup,
+        )
+
+    if not as_media:
+        return await bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=screen.message_id,
+            text=text,
+            reply_markup=reply_markup,
+        )
+
+    if photo:
+        return await bot.edit_message_media(
+            media=InputMediaPhoto(photo, caption=text, parse_mode="HTML"),
+            chat_id=chat_id,
+            message_id=screen.message_id,
+            reply_markup=reply_markup,
+        )
+    return await bot.edit_message_caption(
+        chat_id=chat_id,
+        message_id=screen.message_id,
+        caption=text,
+        reply_markup=reply_markup,
+    )
+
+
+async def _send_screen(
+    chat_id: int,
+    text: str,
+    reply_markup: Optional[InlineKeyboardMarkup],
+    photo,
+    as_media: bool,
+    render: tuple,
+) -> Message:
+    """Отправить новый экран и запомнить его вместе с отпечатком отрисовки."""
+    if as_media:
+        sent_message = await bot.send_photo(
+            chat_id,
+            photo if photo else get_photo("office_map"),
+            caption=text,
+            reply_markup=reply_markup,
+        )
+    else:
+        sent_message = await bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_markup=reply_markup,
+        )
+    ScreenTracker.remember(sent_message, render=render)
+    return sent_message
+
+
 async def safely_replace_message(
     source: Union[Message, CallbackQuery],
     *,
     new_message_type: MessageContentType,
     new_text: Optional[str],
     new_reply_markup: Optional[InlineKeyboardMarkup] = None,
-    new_photo_file_id: Optional[str] = None,
-) -> None:
+    new_photo_file_id: Optional[Union[str, bytes]] = None,
+) -> Optional[Message]:
     """
-    Заменяет текст сообщения или само сообщение: определяет "желаемый тип нового сообщения"
-    и "тип обрабатываемого сообщения" и в зависимости от контекста применяет то или
-    иное действие к сообщению.
+    Заменяет текст сообщения или само сообщение. Состояние заменяемого сообщения
+    (тип контента, возраст, автор) берется из ScreenTracker, поэтому сразу
+    выбирается подходящее действие: правка текста, подписи или фото на месте,
+    либо отправка нового сообщения и после нее удаление старого.
+    Сообщения пользователя (команды) бот редактировать не может - они удаляются.
+    В режиме постоянного экрана (settings.DASHBOARD_MODE) правится единственный
+    экран чата, а экраны, подпись которых помещается под фото, показываются с картой офиса.
+    С new_photo_file_id (file_id или содержимое картинки) заменяется и фото.
+    Возвращает итоговое сообщение (из него берется file_id загруженного фото).
     """
 
     # Унификация входных данных
-    if isinstance(source, CallbackQuery):
-        message = source.message
-        chat_id = source.message.chat.id
-    else:
-        message = source
-        chat_id = source.chat.id
+    message = source.message if isinstance(source, CallbackQuery) else source
+    chat_id = message.chat.id
 
-    message_id = message.message_id
-    current_type = message.content_type
-    # в зависимости от типа контента обрабатываемого сообщения
-    # и типа контента ожидаемого сообщения выбирается действие
     try:
         # в текущем решении всегда меняется текст
-        if new_text is None:
-            raise TypeError(f"new_text must be str, got {type(new_text)}")
-        # для отлдаки: всегда ожидается строка
-        if new_text is not None and not isinstance(new_text, str):
+        if new_text is None or not isinstance(new_text, str):
             raise TypeError(f"new_text must be str, got {type(new_text)}")
-        # когда нужно заменить только текст
-        if new_text and not new_photo_file_id:
-            # при замене текста на текст
-            if new_message_type == MessageContentType.TEXT and current_type == "text":
-                try:
-                    await bot.edit_message_text(
-                        chat_id=chat_id,
-                        message_id=message_id,
-                        text=new_text,
-                        reply_markup=new_reply_markup,
-                    )
-
-                    return
-                except:
-                    # если не получилось поменять текст текстового сообщения,
-                    # то пытаемся удалить и отправляем новое
-                    await bot.send_message(
-                        chat_id=chat_id,
-                        text=new_text,
-                        reply_markup=new_reply_markup,
-                    )
-                    await safely_delete_message(chat_id, message_id)
-
-                    return
-            # при замене подписи под фото на подпись под фото
-            if new_message_type == MessageContentType.MEDIA and current_type in {
-                "photo",
-                "video",
-                "document",
-            }:
-                try:
-                    await bot.edit_message_caption(
-                        chat_id=chat_id,
-                        message_id=message_id,
-                        caption=new_text,
-                        reply_markup=new_reply_markup,
-                    )
-                    return
-                except:
-                    file_id = (
-                        new_photo_file_id
-                        if new_photo_file_id
-                        else preloaded_images.get("office_map")
-                    )
-                    # если не получилось поменять подпись под фото,
-                    # то пытаемся удалить и отправляем новое фото
-                    await bot.send_photo(
-                        chat_id,
-                        file_id,
-                        caption=new_text,
-                        reply_markup=new_reply_markup,
-                    )
-                    await safely_delete_message(chat_id, message_id)
-                    return
-
-            # если новое сообщение это текстовое сообщение,
-            # а методом исключения текущее это "сообщение с фото",
-            # то исправить сообщение нельзя, можно только удалить и отправить новое
-            if new_message_type == MessageContentType.TEXT:
-                await bot.send_message(
-                    chat_id=chat_id,
-                    text=new_text,
-                    reply_markup=new_reply_markup,
-                )
-                await safely_delete_message(chat_id, message_id)
-
-                return
-
-            # если новое сообщение это "сообщение с фото",
-            # а методом исключения текущее это текстовое сообщение,
-            # то исправить сообщение нельзя, можно только удалить и отправить новое
-            if new_message_type == MessageContentType.MEDIA:
-                file_id = (
-                    new_photo_file_id
-                    if new_photo_file_id
-                    else preloaded_images.get("office_map")
-                )
-                await bot.send_photo(
-                    chat_id,
-                    file_id,
-                    caption=new_text,
-                    reply_markup=new_reply_markup,
-                )
-                await safely_delete_message(chat_id, message_id)
 
-                return
-        # все прочие сценарии текущая версия сервиса не поддерживает
-        # TO DO: реализовать в будущем логику с new_photo_file_id и вызов edit_message_media(),
-        # сейчас это не нужно т.к. нет сценария корректировки изображения в сообщении
-        # TO DO: реализовать в будущем логику с edit_message_reply_markup()
+        current = ScreenTracker.resolve(chat_id, message)
+        if current.from_bot:
+            target = current
         else:
-            return
+            # вместо команды пользователя правится экран чата (если режим включен)
+            target = ScreenTracker.get(chat_id) if settings.DASHBOARD_MODE else None
+
+        as_media = (
+            new_message_type == MessageContentType.MEDIA
+            or bool(new_photo_file_id)
+            or (settings.DASHBOARD_MODE and len(new_text) <= CAPTION_LIMIT)
+        )
+        photo = new_photo_file_id
+        if not photo and as_media and settings.DASHBOARD_MODE:
+            photo = get_photo("office_map")
+
+        render = ScreenTracker.fingerprint(new_text, new_reply_markup, photo)
+        if target is not None:
+            try:
+                edited = await _edit_screen(
+                    chat_id, target, new_text, new_reply_markup, photo, as_media, render
+                )
+            except ApiTelegramException as e:
+                # экран уже отрисован так же (например, после рестарта отпечаток неизвестен)
+                if "message is not modified" in str(e.description):
+                    ScreenTracker.track(chat_id, target, render)
+                    edited = True
+                else:
+                    ScreenTracker.mark_failed_edit()
+                    edited = None
+            except Exception:
+                ScreenTracker.mark_failed_edit()
+                edited = None
+
+            if edited is not None:
+                if isinstance(edited, Message):
+                    ScreenTracker.remember(edited, edited=True, render=render)
+                if target is not current:
+                    await _retire_message(chat_id, current)
+                # без правки итоговое сообщение - сам экран (из него берется file_id фото)
+                if isinstance(edited, Message):
+                    return edited
+                return message if target is current else None
+
+        # правкой не обойтись: сначала отправляется новое сообщение, и только после
+        # успешной отправки убираются старые (при сбое отправки у пользователя
+        # остается прежний рабочий экран); старые убираются одновременно
+        stale = [current] if target in (None, current) else [current, target]
+        sent_message = await _send_screen(
+            chat_id, new_text, new_reply_markup, photo, as_media, render
+        )
+        await asyncio.gather(*(_retire_message(chat_id, screen) for screen in stale))
+        return sent_message
 
     except Exception:
 
@@ -0,0 +1,206 @@
+import time
+from collections import OrderedDict
+
+from config.settings import settings
+
+# Telegram позволяет удалять сообщения моложе 48 часов (берем с запасом)
+DELETE_WINDOW_SECONDS = 48 * 3600 - 300
+# максимальная длина подписи под фото
+CAPTION_LIMIT = 1024
+MEDIA_CONTENT_TYPES = {"photo", "video", "document", "animation"}
+
+
+class TrackedMessage:
+    """
+    Состояние сообщения в чате: id, тип контента, время отправки и автор.
+    Для экранов, отрисованных ботом, - отпечаток содержимого (см. ScreenTracker.fingerprint).
+    """
+
+    __slots__ = (
+        "message_id",
+        "content_type",
+        "sent_at",
+        "from_bot",
+        "text_hash",
+        "markup_hash",
+        "photo_key",
+    )
+
+    def __init__(
+        self, message_id: int, content_type: str, sent_at: float, from_bot: bool
+    ):
+        self.message_id = message_id
+        self.content_type = content_type
+        self.sent_at = sent_at
+        self.from_bot = from_bot
+        self.text_hash = None
+        self.markup_hash = None
+        self.photo_key = None
+
+    @classmethod
+    def from_message(cls, message) -> "TrackedMessage":
+        from_user = getattr(message, "from_user", None)
+        return cls(
+            message.message_id,
+            message.content_type,
+            message.date or time.time(),
+            bool(from_user and from_user.is_bot),
+        )
+
+    @property
+    def is_media(self) -> bool:
+        return self.content_type in MEDIA_CONTENT_TYPES
+
+    @property
+    def is_outdated(self) -> bool:
+        """Старше 48 часов: удалить нельзя, можно только отредактировать."""
+        return time.time() - self.sent_at >= DELETE_WINDOW_SECONDS
+
+    def has_content(self, render: tuple) -> bool:
+        """
+        Совпадает ли текст (и фото, если оно меняется) с отпечатком render.
+        Для сообщений с неизвестным отпечатком (например, после рестарта) - нет.
+        """
+        text_hash, _, photo_key = render
+        return (
+            self.text_hash is not None
+            and self.text_hash == text_hash
+            and (photo_key is None or photo_key == self.photo_key)
+        )
+
+
+class ScreenTracker:
+    """
+    Текущий "экран" бота в каждом чате - последнее отправленное или
+    отредактированное ботом сообщение с кнопками. По известному типу контента
+    и возрасту сообщения safe_actions сразу выбирает нужный вызов Bot API
+    (редактирование текста, подписи или фото, удаление или пометка "устарело")
+    вместо перебора вызовов до первого успешного. По отпечатку отрисовки
+    (текст, кнопки, фото) повторная отрисовка того же экрана не вызывает Bot API,
+    а при смене только кнопок правятся только кнопки.
+    В режиме постоянного экрана (settings.DASHBOARD_MODE) экран в чате один:
+    он всегда редактируется на месте, а команды пользователя удаляются.
+    Размер ограничен settings.SCREEN_TRACKER_SIZE чатов (вытесняется давно неактивный).
+    """
+
+    # chat_id -> TrackedMessage
+    _screens: OrderedDict = OrderedDict()
+
+    _edits = 0
+    _sends = 0
+    _failed_edits = 0
+    _markup_edits = 0
+    _skipped_edits = 0
+
+    @staticmethod
+    def fingerprint(text: str, reply_markup, photo) -> tuple:
+        """
+        Отпечаток отрисовки экрана: (хэш текста, хэш кнопок, ключ фото).
+        Ключ фото - file_id или хэш содержимого; None - фото не меняется.
+        Хэши живут только в памяти процесса, поэтому достаточно встроенного hash().
+        """
+        if photo is None or isinstance(photo, str):
+            photo_key = photo
+        elif isinstance(photo, bytes):
+            photo_key = hash(photo)
+        else:
+            # InputFile с картой офиса, пока она не предзагружена
+            photo_key = getattr(photo, "file_name", None) or repr(photo)
+        return (
+            hash(text),
+            hash(reply_markup.to_json()) if reply_markup is not None else None,
+            photo_key,
+        )
+
+    @classmethod
+    def get(cls, chat_id: int) -> TrackedMessage | None:
+        """Текущий экран чата или None, если бот его не знает (например, после рестарта)."""
+        return cls._screens.get(chat_id)
+
+    @classmethod
+    def resolve(cls, chat_id: int, message) -> TrackedMessage:
+        """
+        Состояние сообщения: сохраненное, если это текущий экран чата
+        (тип контента мог измениться после правки), иначе из самого сообщения.
+        """
+        screen = cls._screens.get(chat_id)
+        if screen is not None and screen.message_id == message.message_id:
+            return screen
+        return TrackedMessage.from_message(message)
+
+    @classmethod
+    def lookup(cls, chat_id: int, message_id: int) -> TrackedMessage | None:
+        """Состояние сообщения по id, если это текущий экран чата."""
+        screen = cls._screens.get(chat_id)
+        if screen is not None and screen.message_id == message_id:
+            return screen
+        return None
+
+    @classmethod
+    def remember(cls, message, edited: bool = False, render: tuple = None) -> None:
+        """
+        Запомнить отправленное или отредактированное ботом сообщение как экран чата
+        вместе с отпечатком того, что в нем отрисовано.
+        """
+        if not hasattr(message, "message_id"):
+            # edit_* для inline-сообщений возвращает True вместо сообщения
+            return
+        if edited:
+            cls._edits += 1
+        else:
+            cls._sends += 1
+
+        screen = TrackedMessage.from_message(message)
+        screen.from_bot = True
+        previous = cls.lookup(message.chat.id, screen.message_id)
+        if previous is not None:
+            # правка не меняет время отправки, от которого считаются 48 часов
+            screen.sent_at = previous.sent_at
+        cls.track(message.chat.id, screen, render)
+
+    @classmethod
+    def track(cls, chat_id: int, screen: TrackedMessage, render: tuple = None) -> None:
+        """Сделать сообщение экраном чата; render - его отпечаток, если известен."""
+        if render is not None:
+            previous = cls.lookup(chat_id, screen.message_id)
+            screen.text_hash, screen.markup_hash, photo_key = render
+            if photo_key is None and previous is not None:
+                # правилась только подпись - фото осталось прежним
+                photo_key = previous.photo_key
+            screen.photo_key = photo_key
+
+        cls._screens[chat_id] = screen
+        cls._screens.move_to_end(chat_id)
+        while len(cls._screens) > settings.SCREEN_TRACKER_SIZE:
+            cls._screens.popitem(last=False)
+
+    @classmethod
+    def forget(cls, chat_id: int, message_id: int) -> None:
+        """Сообщение удалено или помечено устаревшим - экраном чата оно больше не является."""
+        if cls.lookup(chat_id, message_id) is not None:
+            del cls._screens[chat_id]
+
+    @classmethod
+    def mark_failed_edit(cls) -> None:
+        cls._failed_edits += 1
+
+    @classmethod
+    def mark_markup_edit(cls) -> None:
+        cls._markup_edits += 1
+
+    @classmethod
+    def mark_skipped_edit(cls) -> None:
+        cls._skipped_edits += 1
+
+    @classmethod
+    def stats(cls) -> dict:
+        """Метрики экранов для отчета о готовности."""
+        return {
+            "chats": len(cls._screens),
+            "dashboard_mode": settings.DASHBOARD_MODE,
+            "edits": cls._edits,
+            "sends": cls._sends,
+            "failed_edits": cls._failed_edits,
+            "markup_edits": cls._markup_edits,
+            "skipped_edits": cls._skipped_edits,
+        }
@@ -1,4 +1,7 @@
+import csv
+import io
 import re
+from typing import AsyncIterator, Iterator
 
 
 def is_full_name(s: str) -> bool:
@@ -14,6 +17,70 @@ def is_full_name(s: str) -> bool:
     return bool(re.match(pattern, s))
 
 
+# заголовки первой колонки, которые не считаются ФИО при импорте
+ROSTER_HEADERS = {"фио", "full_name", "name"}
+
+
+def _iter_roster_lines(data: bytes, encoding: str) -> Iterator[tuple[int, str]]:
+    """Построчно декодирует файл и отдает (номер строки, первая колонка)."""
+    with io.TextIOWrapper(io.BytesIO(data), encoding=encoding, newline="") as stream:
+        for line_no, line in enumerate(stream, start=1):
+            yield line_no, re.split(r"[;,\t]", line, maxsplit=1)[0].strip(' "\r\n')
+
+
+def parse_roster_file(data: bytes) -> dict:
+    """
+    Построчно разбирает CSV/TXT со списком сотрудников: ФИО берется из первой колонки.
+    Файл читается как UTF-8, при ошибке декодирования - как CP1251 (выгрузка из Excel).
+    Возвращает уникальные валидные ФИО в порядке файла, невалидные строки
+    (номер, текст) и количество повторов.
+    """
+    for encoding in ("utf-8-sig", "cp1251"):
+        full_names, invalid, duplicates = {}, [], 0
+        try:
+            for line_no, value in _iter_roster_lines(data, encoding):
+                if not value or (line_no == 1 and value.lower() in ROSTER_HEADERS):
+                    continue
+
+                full_name = " ".join(value.split())
+                if not is_full_name(full_name):
+                    invalid.append((line_no, value))
+                elif full_name in full_names:
+                    duplicates += 1
+                else:
+                    full_names[full_name] = None
+            break
+        except UnicodeDecodeError:
+            continue
+
+    return {
+        "full_names": list(full_names),
+        "invalid": invalid,
+        "duplicates": duplicates,
+    }
+
+
+async def render_roster_csv(users: AsyncIterator[dict]) -> bytes:
+    """
+    Собирает CSV со списком сотрудников (ФИО в первой колонке, чтобы
+    выгрузку можно было загрузить обратно) из потока строк UserService.stream_all_users.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+    writer.writerow(["full_name", "username", "registered"])
+    async for user in users:
+        writer.writerow(
+            [
+                user["full_name"],
+                user["username"] or "",
+                "yes" if user["tg_id"] else "no",
+            ]
+        )
+
+    # BOM нужен, чтобы Excel открыл кириллицу без ручного выбора кодировки
+    return buffer.getvalue().encode("utf-8-sig")
+
+
 def get_booking_type_name(booking_type: str) -> str:
     """Преобразует внутреннее имя типа бронирования в человекочитаемое."""
     type_mapping = {
@@ -25,47 +92,27 @@ def get_booking_type_name(booking_type: str) -> str:
     return type_mapping.get(booking_type, "Неизвестный тип")
 
 
-def split_bookings_html_by_b_tags(
-    text: str, bookings_ids: list[int], max_len: int = 4096
-) -> list[dict]:
+async def chunk_bookings_html(
+    items: AsyncIterator[tuple[int, str]], *, header: str = "", max_len: int = 4096
+) -> AsyncIterator[dict]:
     """
-    Делит HTML-текст на чанки, не разрывая <b>...</b> блоки.
-    Каждый чанк имеет список номеров бронирований для селектора.
+    Инкрементально собирает HTML-текст из элементов (booking_id, html)
+    в чанки не длиннее max_len, не разрывая элементы. Чанк отдается сразу
+    после заполнения, вместе со списком номеров бронирований для селектора.
+    Заголовок добавляется только в первый чанк.
     """
-    if len(text) < 4096:
-        return [{"text_part": text, "bookings_ids": bookings_ids}]
-    else:
-        parts = []
-        current = ""
-        first_position = 0
-        last_position = 0
-
-        # Разбиваем по закрывающему тегу
-        blocks = text.split("</b>")
-
-        for block in blocks:
-
-            last_position += 1
-            if block.strip():
-                block = block + "</b>"  # возвращаем закрывающий тег
-
-            if len(current) + len(block) <= max_len:
-                current += block
-            else:
-                parts.append(
-                    {
-                        "text_part": current,
-                        "bookings_ids": bookings_ids[
-                            first_position : last_position - 1
-                        ],
-                    }
-                )
-                first_position = last_position - 1
-                current = block
-
-        if current:
-            parts.append(
-                {"text_part": current, "bookings_ids": bookings_ids[first_position:]}
-            )
-
-        return parts
+    parts = [header] if header else []
+    length = len(header)
+    bookings_ids = []
+
+    async for booking_id, item in items:
+        if bookings_ids and length + len(item) > max_len:
+            yield {"text_part": "".join(parts), "bookings_ids": bookings_ids}
+            parts, length, bookings_ids = [], 0, []
+
+        parts.append(item)
+        length += len(item)
+        bookings_ids.append(booking_id)
+
+    if bookings_ids:
+        yield {"text_part": "".join(parts), "bookings_ids": bookings_ids}